@@ -0,0 +1,212 @@
+"""
+Spectrum analysis front end for the band visualizers.
+
+Most visualizers only look at the bottom 1-2 kHz of the spectrum but
+compute a full 44.1 kHz FFT and throw the rest away. Analyzer returns
+the magnitudes of just the bins a visualizer needs and picks the
+cheapest of three paths for its configuration:
+
+  fft       - windowed scipy.fftpack FFT, sliced to the needed bins
+  sparse    - direct DFT of the needed bins only (a Goertzel bank written
+              as one matrix product, with the window folded into the basis)
+  decimated - polyphase decimation to the smallest rate covering f_max,
+              then a short FFT over the same block duration
+
+Which one wins depends on the bin count, f_max and the machine (BLAS,
+cache sizes), so 'auto' times each usable path once and keeps the
+fastest. Sparse and decimated keep the bin spacing (frequency
+resolution) of the original block.
+"""
+
+import time
+
+import numpy as np
+import scipy.fftpack as fftpack
+
+from decimate import Decimator, decimation_factor
+from peak import bin_range
+
+MODES = ('fft', 'sparse', 'decimated')
+MAX_SPARSE_BASIS_BYTES = 16 << 20   # Larger bases aren't worth timing
+
+# === Sparse DFT (Goertzel bank) ===
+def sparse_dft_basis(n_fft, bins, window=None):
+    """Precompute the real/imaginary DFT rows for the given bins.
+
+    bins may be fractional to target frequencies between FFT bins. The
+    returned (2 * len(bins), n_fft) matrix gives [re; im] in one product.
+    """
+    bins = np.asarray(bins, dtype=np.float64)
+    phase = 2 * np.pi * np.outer(bins, np.arange(n_fft)) / n_fft
+    basis = np.vstack([np.cos(phase), -np.sin(phase)])
+    if window is not None:
+        basis *= window
+    return basis
+
+def sparse_dft_magnitude(basis, block):
+    n = basis.shape[0] // 2
+    spectrum = basis @ block
+    return np.hypot(spectrum[:n], spectrum[n:])
+
+# === Analyzer ===
+class Analyzer:
+    """Magnitude spectrum of bins 0..f_max for fixed-size audio blocks.
+
+    Calling the analyzer with a mono block returns a fresh magnitude
+    array (callers may modify it), matching
+    np.abs(fftpack.fft(block * window)[:len(freqs)]). The frequency of
+    each bin is in .freqs.
+
+    In decimated mode the magnitudes are rescaled by the decimation
+    factor so all modes report comparable levels, and the analyzer keeps
+    filter state between calls, so blocks must be fed in stream order.
+
+    With a noise_floor (see noisefloor.py, learned with this analyzer)
+    the profile is subtracted from each result in place and .quiet
+    tells whether the block was only room noise. With mode='auto' the
+    analyzer takes the mode the profile was learned in instead of
+    timing the paths; a profile from another mode than the one asked
+    for, or with the wrong number of bins, is ignored (.noise_floor is
+    None).
+    """
+
+    def __init__(self, blocksize, samplerate, f_max, window=True, mode='auto',
+                 noise_floor=None):
+        self.blocksize = blocksize
+        self.samplerate = samplerate
+        self.f_max = f_max
+        self.use_window = window
+        self.noise_floor = noise_floor
+        self.quiet = False
+
+        self._basis = None
+        self._decimator = None
+        profile_mode = getattr(noise_floor, 'mode', None)
+        if mode == 'auto':
+            mode = profile_mode if profile_mode in MODES else self._calibrate()
+        elif mode not in MODES:
+            raise ValueError(f"Unknown analysis mode {mode!r}, expected one of {MODES}")
+        self._set_mode(mode)
+        if profile_mode is not None and profile_mode != mode:
+            print(f"Ignoring the noise profile learned in {profile_mode} mode: analysis "
+                  f"is {mode}, re-run noisefloor.py for this visualizer")
+            self.noise_floor = None
+        elif noise_floor is not None and noise_floor.n_bins != self.n_bins:
+            # Learned for another block size or f_max; recalibrating has to
+            # be able to import the script, so don't fail here
+            print(f"Ignoring the {noise_floor.n_bins}-bin noise profile: analysis has "
+                  f"{self.n_bins} bins, re-run noisefloor.py for this visualizer")
+            self.noise_floor = None
+
+    def set_mode(self, mode):
+        """Switch paths after construction, e.g. pin 'fft' so output
+        doesn't depend on what calibration picked on this machine."""
+        if mode not in MODES:
+            raise ValueError(f"Unknown analysis mode {mode!r}, expected one of {MODES}")
+        if self.noise_floor is not None and mode != self.mode:
+            print(f"Dropping the noise profile learned in {self.mode} mode: analysis "
+                  f"is now {mode}")
+            self.noise_floor = None
+        self._set_mode(mode)
+
+    def set_blocksize(self, blocksize):
+        """Analyze blocksize samples per call from now on, in the same mode.
+
+        Fewer samples mean coarser bins, so .freqs changes and anything
+        laid out on it must be rebuilt (see qos.smaller_fft). Not allowed
+        with a noise profile, which only fits the original bins.
+        """
+        if blocksize == self.blocksize:
+            return
+        if self.noise_floor is not None:
+            raise ValueError("the noise profile only fits the original block size")
+        self.blocksize = blocksize
+        self._basis = None
+        self._decimator = None
+        self._set_mode(self.mode)
+
+    def _set_mode(self, mode):
+        self.mode = mode
+        n_fft, rate = self.blocksize, self.samplerate
+        if mode == 'decimated':
+            if self._decimator is None:
+                factor = decimation_factor(self.samplerate, self.f_max,
+                                           blocksize=self.blocksize)
+                self._decimator = Decimator(factor, self.samplerate, self.f_max)
+            self._decimator.reset()
+            n_fft = self.blocksize // self._decimator.factor
+            rate = self._decimator.out_rate
+            self._recent = np.zeros(n_fft)
+
+        _, self.n_bins = bin_range(n_fft, rate, 0.0, self.f_max)
+        self.freqs = np.arange(self.n_bins) * rate / n_fft
+        self.window = np.hanning(n_fft) if self.use_window else None
+
+        if mode == 'sparse':
+            if self._basis is None:
+                self._basis = sparse_dft_basis(self.blocksize, np.arange(self.n_bins), self.window)
+            self._analyze = self._sparse
+        elif mode == 'decimated':
+            self._analyze = self._decimated
+        else:
+            self._analyze = self._fft
+
+    def _fft(self, block):
+        if self.window is not None:
+            block = block * self.window
+        fft_data = fftpack.fft(block)
+        return np.abs(fft_data[:self.n_bins])
+
+    def _sparse(self, block):
+        return sparse_dft_magnitude(self._basis, block)
+
+    def _decimated(self, block):
+        # Slide the newest decimated samples into a window spanning one
+        # block duration; its length doesn't depend on block phase
+        out = self._decimator.process(block)
+        recent = self._recent
+        n = min(len(out), len(recent))
+        if n:
+            recent[:-n] = recent[n:]
+            recent[-n:] = out[-n:]
+        return self._fft(recent) * self._decimator.factor
+
+    def usable_modes(self):
+        """The paths worth trying for this configuration, 'fft' first."""
+        modes = ['fft']
+        n_bins = bin_range(self.blocksize, self.samplerate, 0.0, self.f_max)[1]
+        # Let timing decide; only skip bases too large to keep around
+        if 2 * n_bins * self.blocksize * 8 <= MAX_SPARSE_BASIS_BYTES:
+            modes.append('sparse')
+        if decimation_factor(self.samplerate, self.f_max, blocksize=self.blocksize) > 1:
+            modes.append('decimated')
+        return modes
+
+    def _calibrate(self, repeats=20):
+        """Time each usable path on a dummy block and keep the fastest."""
+        candidates = self.usable_modes()
+        if len(candidates) == 1:
+            return 'fft'
+
+        block = np.random.default_rng(0).standard_normal(self.blocksize)
+        timings = {}
+        for mode in candidates:
+            self._set_mode(mode)
+            self._analyze(block)
+            start = time.perf_counter()
+            for _ in range(repeats):
+                self._analyze(block)
+            timings[mode] = time.perf_counter() - start
+        return min(timings, key=timings.get)
+
+    def describe(self):
+        text = f"{self.mode} analysis, {self.n_bins} bins up to {self.freqs[-1]:.0f} Hz"
+        if self.mode == 'decimated':
+            text += f" at {self._decimator.out_rate:.0f} Hz"
+        return text
+
+    def __call__(self, block):
+        magnitude = self._analyze(block)
+        if self.noise_floor is not None:
+            self.quiet = not self.noise_floor.subtract(magnitude)
+        return magnitude
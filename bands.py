@@ -0,0 +1,140 @@
+"""
+Band means from a prefix-sum table, for strips of any length.
+
+The scripts compute each LED's level as np.mean(magnitude[mask]) with a
+full-spectrum mask per LED, and even band_means() (effects.py) still
+runs one Python-level reduction per band, which adds up at 600 LEDs.
+BandEngine instead takes one cumulative sum over the spectrum per block
+and gets every band's sum as the difference of two table lookups, so a
+block costs O(bins + bands) however many bands there are and however
+wide they are.
+
+By default edges snap to whole bins exactly like the masks, (freqs >=
+lo) & (freqs < hi), so results match band_means() to rounding and the
+existing visualizers are unchanged. Bands narrower than one FFT bin
+are then empty (dark). For long strips where that matters, opt in to
+fractional bins: bin i is treated as covering [i - 0.5, i + 0.5) and
+the table is interpolated linearly inside it, so a narrow band takes
+the value of the bin(s) under it, weighted by overlap.
+"""
+
+import numpy as np
+
+class BandEngine:
+    """Mean magnitude of every band between consecutive edges (Hz).
+
+    freqs are the evenly spaced bin frequencies of the spectra to come.
+    interpolate turns on fractional-bin edges; None uses them only when
+    some band is narrower than a bin. The default keeps whole bins.
+    """
+
+    def __init__(self, freqs, edges, interpolate=False):
+        self.freqs = np.asarray(freqs, dtype=np.float64)
+        self.interpolate = interpolate
+        self._grouped = {}
+        self.rebuild(edges)
+
+    def rebuild(self, edges):
+        """Recompute the lookup positions, e.g. after retuning max_freq."""
+        self.edges = np.asarray(edges, dtype=np.float64)
+        n_bins = len(self.freqs)
+        bin_hz = self.freqs[1] - self.freqs[0] if n_bins > 1 else 1.0
+        interpolate = self.interpolate
+        if interpolate is None:
+            interpolate = bool(np.any(np.diff(self.edges) < bin_hz))
+        self.interpolating = interpolate
+
+        if interpolate:
+            pos = np.clip((self.edges - self.freqs[0]) / bin_hz + 0.5, 0.0, n_bins)
+            self._idx = np.minimum(pos.astype(np.intp), n_bins - 1)
+            self._frac = pos - self._idx
+            width = np.diff(pos)
+        else:
+            self._idx = np.searchsorted(self.freqs, self.edges, side='left')
+            self._frac = None
+            width = np.diff(self._idx)
+        # Empty bands have a zero sum; dividing it by 1 keeps them at 0
+        self._width = np.where(width > 0, width, 1).astype(np.float64)
+        self.n_bands = len(self.edges) - 1
+
+        self._table = np.zeros(n_bins + 1)
+        self._at = np.empty(len(self.edges))
+        self._part = np.empty(len(self.edges))
+        self._grouped.clear()
+
+    def means(self, magnitude, out=None, step=1):
+        """Band means of one spectrum into out (allocated if None).
+
+        With step > 1 every step adjacent bands share one mean over
+        their combined range: fewer bands when time is short (qos.py).
+        """
+        if out is None:
+            out = np.empty(self.n_bands)
+        if step > 1:
+            return self._means_grouped(magnitude, out, step)
+
+        table, at = self._table, self._at
+        np.cumsum(magnitude, out=table[1:])
+        np.take(table, self._idx, out=at)
+        if self._frac is not None:
+            np.take(magnitude, self._idx, out=self._part)
+            self._part *= self._frac
+            at += self._part
+        np.subtract(at[1:], at[:-1], out=out)
+        out /= self._width
+        return out
+
+    def _means_grouped(self, magnitude, out, step):
+        grouped = self._grouped.get(step)
+        if grouped is None:
+            edges = np.append(self.edges[:-1:step], self.edges[-1])
+            grouped = self._grouped[step] = BandEngine(self.freqs, edges, self.interpolating)
+        out[:] = np.repeat(grouped.means(magnitude), step)[:self.n_bands]
+        return out
+
+    def batch_means(self, magnitudes):
+        """Band means of a (blocks, bins) matrix, shape (blocks, bands).
+
+        Same operations as means() row by row, so offline rendering
+        (offline.py) matches streaming exactly.
+        """
+        table = np.zeros((len(magnitudes), magnitudes.shape[1] + 1))
+        np.cumsum(magnitudes, axis=1, out=table[:, 1:])
+        at = table[:, self._idx]
+        if self._frac is not None:
+            at += magnitudes[:, self._idx] * self._frac
+        out = at[:, 1:] - at[:, :-1]
+        out /= self._width
+        return out
+
+def benchmark(led_counts=(32, 144, 600, 2400), blocks=200, blocksize=2205, samplerate=44100,
+              max_freq=2000):
+    """Per-block cost of band means: band_means() loop vs BandEngine."""
+    import time
+
+    from effects import band_means, band_slices
+
+    rng = np.random.default_rng(0)
+    freqs = np.fft.fftfreq(blocksize, 1.0 / samplerate)[:blocksize // 2]
+    spectra = np.abs(rng.normal(size=(blocks, blocksize // 2)))
+    print(f"{'bands':>6} {'loop us':>10} {'table us':>10}  mode")
+    for n in led_counts:
+        edges = np.linspace(0, max_freq, n + 1)
+        slices = band_slices(freqs, edges)
+        engine = BandEngine(freqs, edges, interpolate=None)
+        out = np.empty(n)
+
+        start = time.perf_counter()
+        for magnitude in spectra:
+            band_means(magnitude, slices, out)
+        loop_us = (time.perf_counter() - start) / blocks * 1e6
+
+        start = time.perf_counter()
+        for magnitude in spectra:
+            engine.means(magnitude, out)
+        table_us = (time.perf_counter() - start) / blocks * 1e6
+        mode = 'interpolated' if engine.interpolating else 'whole bins'
+        print(f"{n:>6} {loop_us:>10.1f} {table_us:>10.1f}  {mode}")
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,185 @@
+"""
+Layered effects.
+
+Effects used to be whole scripts, so mc4.py's peak sparkles could not sit
+on top of rainbox_cascade.py's background or spectled.py's bars. Here
+each effect renders into its own float32 (N, 3) layer and the layers are
+blended bottom to top into one float frame, with one array operation per
+layer:
+
+  add      - out + opacity * layer
+  max      - maximum(out, opacity * layer)
+  alpha    - layer over out with coverage opacity where the layer is lit,
+             so dark pixels let lower layers through
+  multiply - out scaled by the layer (255 = unchanged), mixed by opacity
+
+Each layer has its own update interval. A layer that is not due keeps
+its last buffer, so a cheap background stepping at 10 Hz is not
+recomputed for every audio block. The result is in 0-255 float units,
+ready for DitheredOutput (see render.py) or truncation to a frame.
+
+Run directly for spectled.py's bars over a dimmed rainbow cascade, with
+mc4.py's peak sparkles on top.
+"""
+
+import time
+
+import numpy as np
+import scipy.fftpack as fftpack
+
+from effects import CascadeEffect, PeakTrailEffect, SpectrumEffect
+from frame import clear
+from render import DitheredOutput
+
+BLEND_MODES = ('add', 'max', 'alpha', 'multiply')
+
+class Layer:
+    """One effect's float32 buffer and how it is blended.
+
+    render(magnitude) returns a (N, 3) frame (uint8 or float, 0-255) or
+    None to keep the previous contents, as the effects in effects.py do
+    for silent blocks. interval is the minimum time in seconds between
+    renders (0 renders on every frame).
+    """
+
+    def __init__(self, name, render, num_leds, mode='add', opacity=1.0, interval=0.0):
+        if mode not in BLEND_MODES:
+            raise ValueError(f"unknown blend mode {mode!r}, expected one of {BLEND_MODES}")
+        self.name = name
+        self.render = render
+        self.mode = mode
+        self.opacity = opacity
+        self.interval = interval
+        self.enabled = True
+
+        self.buffer = np.zeros((num_leds, 3), dtype=np.float32)
+        self.last_update = None
+        self.updates = 0
+
+    def update(self, magnitude, now):
+        """Re-render if the interval has passed; returns True if it did."""
+        if self.last_update is not None and now - self.last_update < self.interval:
+            return False
+        self.last_update = now
+        frame = self.render(magnitude)
+        if frame is not None:
+            np.copyto(self.buffer, frame, casting='unsafe')
+        self.updates += 1
+        return True
+
+class Compositor:
+    """Blend layers bottom to top into one float frame per audio block."""
+
+    def __init__(self, num_leds, layers=(), clock=time.monotonic):
+        self.num_leds = num_leds
+        self.layers = []
+        self.clock = clock
+        self.frame = np.zeros((num_leds, 3), dtype=np.float32)
+        self._scratch = np.zeros((num_leds, 3), dtype=np.float32)
+        self._coverage = np.zeros((num_leds, 1), dtype=np.float32)
+        for layer in layers:
+            self.add(layer)
+
+    def add(self, layer):
+        """Add a layer on top; returns it."""
+        self.layers.append(layer)
+        return layer
+
+    def layer(self, name):
+        for layer in self.layers:
+            if layer.name == name:
+                return layer
+        raise KeyError(name)
+
+    def _blend(self, layer):
+        out, tmp = self.frame, self._scratch
+        opacity = np.float32(layer.opacity)
+        if layer.mode == 'add':
+            np.multiply(layer.buffer, opacity, out=tmp)
+            out += tmp
+        elif layer.mode == 'max':
+            np.multiply(layer.buffer, opacity, out=tmp)
+            np.maximum(out, tmp, out=out)
+        elif layer.mode == 'alpha':
+            # out += coverage * (layer - out), coverage = opacity where lit
+            cov = self._coverage
+            np.greater(layer.buffer.max(axis=1, keepdims=True), 0, out=cov, casting='unsafe')
+            cov *= opacity
+            np.subtract(layer.buffer, out, out=tmp)
+            tmp *= cov
+            out += tmp
+        else:  # multiply
+            np.multiply(layer.buffer, opacity / 255.0, out=tmp)
+            tmp += 1 - opacity
+            out *= tmp
+
+    def render(self, magnitude):
+        """Update due layers from one spectrum and return the blended frame."""
+        now = self.clock()
+        self.frame.fill(0)
+        for layer in self.layers:
+            if not layer.enabled:
+                continue
+            layer.update(magnitude, now)
+            self._blend(layer)
+        np.clip(self.frame, 0, 255, out=self.frame)
+        return self.frame
+
+    def stats(self):
+        return {f"layer_{layer.name}_updates": layer.updates for layer in self.layers}
+
+# === Demo: spectrum bars + cascade background + peak sparkles ===
+LED_COUNT = 32
+LED_PIN = 18
+LED_FREQ_HZ = 800000
+LED_DMA = 10
+LED_BRIGHTNESS = 50
+LED_INVERT = False
+
+samplerate = 44100
+block_duration = 0.05
+blocksize = int(samplerate * block_duration)
+
+def main():
+    from rpi_ws281x import Adafruit_NeoPixel
+    from runtime import Runtime
+
+    strip = Adafruit_NeoPixel(LED_COUNT, LED_PIN, LED_FREQ_HZ,
+                              LED_DMA, LED_INVERT, LED_BRIGHTNESS)
+    strip.begin()
+    output = DitheredOutput(strip, LED_BRIGHTNESS)
+
+    freqs = fftpack.fftfreq(blocksize, 1.0 / samplerate)[:blocksize // 2]
+    bars = SpectrumEffect(LED_COUNT, freqs)
+    sparkles = PeakTrailEffect(LED_COUNT, freqs)
+
+    def render_bars(magnitude):
+        # Blend the untruncated levels rather than the uint8 frame
+        return None if bars.render(magnitude) is None else bars.frame_hdr
+
+    compositor = Compositor(LED_COUNT, [
+        Layer('cascade', CascadeEffect(LED_COUNT).render, LED_COUNT,
+              mode='add', opacity=0.15, interval=0.1),
+        Layer('bars', render_bars, LED_COUNT, mode='max'),
+        Layer('sparkles', sparkles.render, LED_COUNT, mode='add'),
+    ])
+
+    def process_block(block):
+        audio_data = block * np.hanning(len(block))
+        magnitude = np.abs(fftpack.fft(audio_data)[:len(block) // 2])
+        return compositor.render(magnitude)
+
+    print("Layered visualizer (cascade + bars + sparkles). Ctrl+C to stop.")
+    runtime = Runtime(process_block, output.submit, samplerate, blocksize,
+                      stats_sources=[compositor.stats])
+    output.start()
+    try:
+        runtime.run()
+    except KeyboardInterrupt:
+        print("\nShutting down...")
+    finally:
+        output.stop()
+        clear(strip)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Live parameter tuning without restarting a visualizer.
+
+Params holds the tunable values (FADE_DECAY, INTENSITY_SCALE, ...).
+Changes from the control server are staged and applied all at once at
+the start of the next frame, and only the rebuild hooks registered for
+the changed names run, so the audio stream, the strip's DMA channel and
+envelope state all survive a retune.
+
+ControlServer is a small asyncio server bound to localhost (TCP or a
+Unix socket) speaking one JSON object per line:
+
+    {"get": null}                      -> {"ok": true, "params": {...}}
+    {"set": {"FADE_DECAY": 0.6}}       -> {"ok": true, "params": {...}}
+    {"stats": null}                    -> {"ok": true, "stats": {...}}
+
+e.g.  echo '{"set": {"MAX_BRIGHTNESS": 60}}' | nc -q1 localhost 7777
+"""
+
+import asyncio
+import json
+import math
+import os
+import threading
+
+CONTROL_HOST = '127.0.0.1'
+CONTROL_PORT = 7777
+
+# === Tunable parameters ===
+class Params:
+    """Named parameters that are changed atomically between frames."""
+
+    def __init__(self, **values):
+        self._values = dict(values)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._hooks = []
+        self._bounds = {}
+
+    def __getitem__(self, name):
+        return self._values[name]
+
+    def snapshot(self):
+        with self._lock:
+            values = dict(self._values)
+            values.update(self._pending)
+        return values
+
+    def on_change(self, names, hook):
+        """Call hook(params) after an apply() that changed any of names."""
+        self._hooks.append((frozenset(names), hook))
+
+    def bounds(self, **ranges):
+        """Set inclusive (low, high) limits per name; None leaves a side open.
+
+        e.g. params.bounds(FADE_DECAY=(0.0, 1.0), MAX_FREQ=(1, None))
+        """
+        for name, (low, high) in ranges.items():
+            if name not in self._values:
+                raise KeyError(f"Unknown parameter {name!r}")
+            self._bounds[name] = (low, high)
+
+    def set(self, **changes):
+        """Stage changes for the next apply(); safe from any thread.
+
+        Values are coerced to the type of the current value and checked
+        against its bounds (NaN and infinities are never accepted), and
+        unknown names or bad values raise before anything is staged.
+        """
+        staged = {}
+        for name, value in changes.items():
+            if name not in self._values:
+                raise KeyError(f"Unknown parameter {name!r}")
+            kind = type(self._values[name])
+            if kind is bool and not isinstance(value, bool):
+                raise ValueError(f"{name} expects true/false, got {value!r}")
+            try:
+                staged[name] = kind(value)
+            except (TypeError, ValueError, OverflowError):
+                raise ValueError(f"{name} expects {kind.__name__}, got {value!r}") from None
+            value = staged[name]
+            if isinstance(value, float) and not math.isfinite(value):
+                raise ValueError(f"{name} must be finite, got {value!r}")
+            low, high = self._bounds.get(name, (None, None))
+            if (low is not None and value < low) or (high is not None and value > high):
+                raise ValueError(f"{name} must be in [{'-inf' if low is None else low}, "
+                                 f"{'inf' if high is None else high}], got {value!r}")
+        with self._lock:
+            self._pending.update(staged)
+
+    def apply(self):
+        """Apply staged changes; call from the frame loop between frames.
+
+        Returns the dict of changed values (empty on the fast path).
+        """
+        if not self._pending:
+            return {}
+        with self._lock:
+            changes, self._pending = self._pending, {}
+        changes = {k: v for k, v in changes.items() if self._values[k] != v}
+        self._values.update(changes)
+        for names, hook in self._hooks:
+            if names.intersection(changes):
+                hook(self)
+        return changes
+
+# === Control server ===
+class ControlServer:
+    """JSON-lines control endpoint for a Params instance.
+
+    stats is an optional callable returning a JSON-serializable dict of
+    live statistics for the "stats" command.
+    """
+
+    def __init__(self, params, stats=None, host=CONTROL_HOST, port=CONTROL_PORT, path=None):
+        self.params = params
+        self.stats = stats
+        self.host = host
+        self.port = port
+        self.path = path
+
+    def handle(self, request):
+        if not isinstance(request, dict):
+            raise ValueError("Request must be a JSON object")
+        if 'set' in request:
+            self.params.set(**request['set'])
+            return {'ok': True, 'params': self.params.snapshot()}
+        if 'get' in request:
+            return {'ok': True, 'params': self.params.snapshot()}
+        if 'stats' in request:
+            return {'ok': True, 'stats': self.stats() if self.stats else {}}
+        raise ValueError("Expected one of: get, set, stats")
+
+    async def _client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    reply = self.handle(json.loads(line))
+                except (ValueError, KeyError, TypeError) as e:
+                    reply = {'ok': False, 'error': str(e)}
+                writer.write(json.dumps(reply).encode() + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self):
+        """Start listening on the running event loop; returns the server."""
+        if self.path:
+            return await asyncio.start_unix_server(self._client, path=self.path)
+        return await asyncio.start_server(self._client, self.host, self.port)
+
+    async def stop(self, server):
+        """Close a server from start() and release its port or socket file."""
+        server.close()
+        await server.wait_closed()
+        if self.path and os.path.exists(self.path):
+            os.unlink(self.path)
+
+    async def serve_forever(self):
+        server = await self.start()
+        async with server:
+            await server.serve_forever()
+
+    def run_in_thread(self):
+        """Serve from a daemon thread with its own event loop."""
+        thread = threading.Thread(target=asyncio.run, args=(self.serve_forever(),),
+                                  name='control', daemon=True)
+        thread.start()
+        return thread
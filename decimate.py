@@ -0,0 +1,81 @@
+"""
+Anti-aliased sample-rate decimation for low-bandwidth visualizers.
+
+Everything captures at 44.1 kHz even when the display tops out at
+1-4 kHz. A Decimator sits between sd.InputStream and the analyzer and
+turns each block into the smallest sample rate that still covers the
+visualizer's bandwidth. It is a polyphase FIR: only the kept output
+samples are computed, and the filter history and phase carry over from
+block to block so there are no seams at block boundaries.
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+import scipy.signal as signal
+
+# === Rate selection ===
+def decimation_factor(samplerate, bandwidth, margin=1.25, blocksize=None):
+    """Largest integer factor whose output Nyquist still covers bandwidth.
+
+    margin leaves room above bandwidth for the anti-alias transition band.
+    With blocksize, only factors that divide it are considered, so a
+    block decimates to a whole number of samples and an FFT over them
+    keeps the bin spacing (samplerate / blocksize) of the full block.
+    """
+    factor = max(1, int((samplerate / 2) // (bandwidth * margin)))
+    if blocksize is not None:
+        while blocksize % factor:
+            factor -= 1
+    return factor
+
+# === Polyphase decimator ===
+class Decimator:
+    """Stateful low-pass + downsample by an integer factor.
+
+    Feed consecutive blocks of any length to process(); the output is the
+    decimated signal at samplerate / factor. Output length varies by one
+    sample between blocks when the block size isn't a multiple of factor.
+    """
+
+    def __init__(self, factor, samplerate, bandwidth=None, taps_per_phase=16):
+        self.factor = factor
+        self.samplerate = samplerate
+        self.out_rate = samplerate / factor
+
+        if factor == 1:
+            self.taps = np.ones(1)
+        else:
+            nyquist_out = self.out_rate / 2
+            if bandwidth is None:
+                bandwidth = nyquist_out * 0.8
+            # -6 dB point halfway between the passband edge and the new Nyquist
+            cutoff = (min(bandwidth, nyquist_out) + nyquist_out) / 2
+            self.taps = signal.firwin(taps_per_phase * factor, cutoff, fs=samplerate)
+        # Reversed so a sliding window dot product is the convolution
+        self._taps_rev = self.taps[::-1].copy()
+        self._buf = np.zeros(len(self.taps) - 1)
+        self.reset()
+
+    def reset(self):
+        self._history = len(self.taps) - 1
+        self._buf[:self._history] = 0.0
+        self._phase = 0  # offset into the next block of the next kept sample
+
+    def process(self, block):
+        n = len(block)
+        hist = self._history
+        if len(self._buf) < hist + n:
+            buf = np.zeros(hist + n)
+            buf[:hist] = self._buf[:hist]
+            self._buf = buf
+        buf = self._buf
+        buf[hist:hist + n] = block
+
+        # Window i covers buf[i:i + len(taps)] and ends at block[i]
+        windows = sliding_window_view(buf[:hist + n], len(self.taps))
+        out = windows[self._phase::self.factor] @ self._taps_rev
+
+        # Keep the newest samples as history for the next block
+        buf[:hist] = buf[n:hist + n]
+        self._phase = (self._phase - n) % self.factor
+        return out
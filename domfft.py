@@ -2,6 +2,7 @@ import sounddevice as sd
 import numpy as np
 import scipy.fftpack as fftpack
 from rpi_ws281x import Adafruit_NeoPixel, Color
+from peak import PeakTracker
 
 # === LED Setup ===
 LED_COUNT = 32
@@ -20,6 +21,9 @@ samplerate = 44100
 block_duration = 0.05
 blocksize = int(samplerate * block_duration)
 
+# === Peak tracking (sub-bin, smoothed) ===
+tracker = PeakTracker(blocksize, samplerate)
+
 # === Color helper ===
 def wheel(pos):
     pos = 255 - pos
@@ -32,19 +36,15 @@ def wheel(pos):
     return Color(pos * 3, 255 - pos * 3, 0)
 
 # === LED update: only dominant frequency ===
-def update_led_dominant(magnitude, freqs):
+def update_led_dominant(magnitude):
     num_leds = strip.numPixels()
     max_freq = 2000  # Hz, top frequency mapped to last LED
 
-    # Normalize
-    if np.max(magnitude) == 0:
+    # Find interpolated peak frequency and its relative intensity
+    peak = tracker.update(magnitude)
+    if peak is None:
         return
-    magnitude /= np.max(magnitude)
-
-    # Find peak frequency and its intensity
-    peak_idx = np.argmax(magnitude)
-    peak_freq = freqs[peak_idx]
-    intensity = magnitude[peak_idx]
+    peak_freq, intensity = peak
 
     # Map frequency to LED index
     led_idx = int((peak_freq / max_freq) * num_leds)
@@ -70,11 +70,9 @@ def update_led_dominant(magnitude, freqs):
 def audio_callback(indata, frames, time, status):
     audio_data = indata[:, 0] * np.hanning(len(indata))
     fft_data = fftpack.fft(audio_data)
-    fft_freq = fftpack.fftfreq(len(audio_data), 1.0 / samplerate)
     magnitude = np.abs(fft_data[:len(fft_data)//2])
-    freqs = fft_freq[:len(fft_freq)//2]
 
-    update_led_dominant(magnitude, freqs)
+    update_led_dominant(magnitude)
 
 # === Main ===
 def main():
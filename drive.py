@@ -0,0 +1,31 @@
+"""
+Driving a visualizer script from outside its main().
+
+The scripts build their strip, analyzer and effect at import time, then
+either register an audio callback or hand process_block() to the
+Runtime. Tools that push blocks through a script themselves (golden.py,
+stageprof.py) load it and feed it the same way its main() would.
+"""
+
+import importlib.util
+import os
+
+from frame import show_frame
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def load_script(name, prefix='script'):
+    """Import a fresh copy of NAME.py (module state starts from scratch)."""
+    spec = importlib.util.spec_from_file_location(f"{prefix}_{name}", os.path.join(HERE, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def feed(module, block):
+    """Push one block through a script the way its main() would."""
+    if hasattr(module, 'process_block'):
+        frame = module.process_block(block)
+        if frame is not None:
+            show_frame(module.strip, frame)
+    else:
+        module.audio_callback(block[:, None], len(block), None, None)
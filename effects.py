@@ -0,0 +1,361 @@
+"""
+Frame-rendering versions of the visualizer effects.
+
+Each effect turns a magnitude spectrum into a frame (see frame.py), with
+the untruncated float colors kept alongside in .frame_hdr, and keeps the
+tables it needs between blocks (band bin ranges, palettes) instead of
+rebuilding masks every callback. Tables are rebuilt only when
+a parameter they depend on changes, so effects can be retuned live.
+"""
+
+import numpy as np
+
+from bands import BandEngine
+from frame import new_frame
+from peak import refine_peaks
+
+# === Color helpers ===
+def wheel(pos):
+    pos = 255 - pos
+    if pos < 85:
+        return (255 - pos * 3, 0, pos * 3)
+    if pos < 170:
+        pos -= 85
+        return (0, pos * 3, 255 - pos * 3)
+    pos -= 170
+    return (pos * 3, 255 - pos * 3, 0)
+
+def cascade_wheel(pos):
+    """rainbox_cascade.py's wheel: red -> green -> blue -> red."""
+    if pos < 85:
+        return (pos * 3, 255 - pos * 3, 0)
+    if pos < 170:
+        pos -= 85
+        return (255 - pos * 3, 0, pos * 3)
+    pos -= 170
+    return (0, pos * 3, 255 - pos * 3)
+
+def wheel_palette(num_leds):
+    """(num_leds, 3) rainbow, one wheel() color per LED position."""
+    return np.array([wheel(int(i * 256 / num_leds)) for i in range(num_leds)],
+                    dtype=np.float64)
+
+def colorize(palette, levels, max_brightness, hdr, frame):
+    """Scale the palette by per-LED levels and cap each channel.
+
+    hdr receives the untruncated float colors (for dithered output, see
+    render.py) and frame the same values truncated to uint8, exactly as
+    min(int(c * level), max_brightness) per channel. Returns frame.
+    """
+    np.multiply(palette, levels[:, None], out=hdr)
+    np.minimum(hdr, max_brightness, out=hdr)
+    frame[:] = hdr  # float -> uint8 truncates like int()
+    return frame
+
+# === Band helpers ===
+def band_slices(freqs, edges):
+    """Bin index ranges equivalent to (freqs >= lo) & (freqs < hi) masks.
+
+    freqs must be sorted ascending (as FFT bin frequencies are). Returns
+    an (num_bands, 2) array of [start, stop) indices.
+    """
+    idx = np.searchsorted(freqs, edges, side='left')
+    return np.stack([idx[:-1], idx[1:]], axis=1)
+
+def band_means(magnitude, slices, out):
+    """Mean magnitude per band; empty bands are 0."""
+    for i, (start, stop) in enumerate(slices):
+        out[i] = magnitude[start:stop].mean() if stop > start else 0.0
+    return out
+
+# === Spectrum bars (spectled.py / f4f.py) ===
+class SpectrumEffect:
+    """Linear bands from 0 to max_freq with peak-hold and decay.
+
+    Equivalent to update_leds_spectrum in spectled.py; with a threshold
+    it behaves like f4f.py, where levels below it go dark.
+    """
+
+    def __init__(self, num_leds, freqs, max_freq=2000, fade_decay=0.8,
+                 intensity_scale=3.0, max_brightness=100, threshold=None,
+                 interpolate=False):
+        self.num_leds = num_leds
+        self.freqs = freqs
+        self.max_freq = max_freq
+        self.fade_decay = fade_decay
+        self.intensity_scale = intensity_scale
+        self.max_brightness = max_brightness
+        self.threshold = threshold
+        self.interpolate = interpolate   # Fractional-bin bands (see bands.py)
+        self.band_step = 1       # >1 shares one band mean between LEDs
+
+        self.led_levels = np.zeros(num_leds)
+        self._levels = np.zeros(num_leds)
+        self.frame = new_frame(num_leds)
+        self.frame_hdr = np.zeros((num_leds, 3))
+        self.rebuild_bands()
+        self.rebuild_palette()
+
+    def rebuild_bands(self):
+        freq_step = self.max_freq / self.num_leds
+        edges = np.array([i * freq_step for i in range(self.num_leds + 1)])
+        self.bands = BandEngine(self.freqs, edges, self.interpolate)
+
+    def rebuild_palette(self):
+        self.palette = wheel_palette(self.num_leds)
+
+    def render(self, magnitude):
+        """Update levels from one spectrum; returns the frame or None if silent."""
+        # Ignore DC offset
+        magnitude[0] = 0
+        peak = np.max(magnitude)
+        if peak == 0:
+            return None
+        magnitude = magnitude / peak
+        return self.update(self.bands.means(magnitude, self._levels, self.band_step))
+
+    def update(self, levels):
+        """Advance one block from peak-normalized band means; returns the frame.
+
+        Split from render() so batch rendering (see offline.py) can
+        compute the band means of a whole track at once.
+        """
+        levels = levels ** 0.5 * self.intensity_scale
+        if self.threshold is None:
+            np.clip(levels, 0.0, 1.0, out=levels)
+        else:
+            levels = np.where(levels < self.threshold, 0.0, np.minimum(levels, 1.0))
+
+        # Fade down if lower than previous, otherwise jump up
+        fading = levels < self.led_levels
+        self.led_levels = np.where(fading, self.led_levels * self.fade_decay, levels)
+
+        return colorize(self.palette, self.led_levels, self.max_brightness,
+                        self.frame_hdr, self.frame)
+
+    def reset(self):
+        """Drop the held levels, e.g. when IdleGate wakes up."""
+        self.led_levels = np.zeros(self.num_leds)
+
+    def decay(self):
+        """Fade every LED one step with no new input (e.g. a quiet block)."""
+        self.led_levels = self.led_levels * self.fade_decay
+        return colorize(self.palette, self.led_levels, self.max_brightness,
+                        self.frame_hdr, self.frame)
+
+# === Top-K bands with fade (random_lights.py / linear.py / red2.py) ===
+class TopBandsEffect:
+    """Light only the top_k strongest bands, relative to the strongest.
+
+    edges holds num_leds + 1 band edges in Hz (linear or log spaced).
+    Bands outside the top set decay by fade_decay and snap to dark below
+    0.01, as in update_leds_top5 in random_lights.py.
+    """
+
+    def __init__(self, num_leds, freqs, edges, top_k=5, fade_decay=0.25,
+                 max_brightness=100, interpolate=False):
+        self.num_leds = num_leds
+        self.freqs = freqs
+        self.top_k = top_k
+        self.fade_decay = fade_decay
+        self.max_brightness = max_brightness
+        self.interpolate = interpolate   # Fractional-bin bands (see bands.py)
+        self.band_step = 1       # >1 shares one band mean between LEDs
+        self.top_threshold = None  # Hold bands within this fraction of the max instead
+
+        self.led_levels = np.zeros(num_leds)
+        self._levels = np.zeros(num_leds)
+        self.frame = new_frame(num_leds)
+        self.frame_hdr = np.zeros((num_leds, 3))
+        self.rebuild_bands(edges)
+        self.rebuild_palette()
+
+    def rebuild_bands(self, edges=None):
+        """Rebuild for new edges, or for new freqs with the current ones."""
+        if edges is not None:
+            self.edges = np.asarray(edges, dtype=np.float64)
+        self.bands = BandEngine(self.freqs, self.edges, self.interpolate)
+
+    def rebuild_palette(self):
+        self.palette = wheel_palette(self.num_leds)
+
+    def render(self, magnitude):
+        """Update levels from one spectrum; returns the frame or None if silent."""
+        magnitude[0] = 0  # Remove DC offset
+        peak = np.max(magnitude)
+        if peak == 0:
+            return None
+        magnitude = magnitude / peak
+        return self.update(self.bands.means(magnitude, self._levels, self.band_step))
+
+    def update(self, levels):
+        """Advance one block from peak-normalized band means; returns the frame."""
+        if self.top_threshold is None:
+            # Strongest bands, normalized to the strongest of them
+            top_indices = np.argpartition(levels, -self.top_k)[-self.top_k:]
+            top_indices = top_indices[np.argsort(levels[top_indices])[::-1]]
+            max_level = levels[top_indices[0]] if levels[top_indices[0]] > 0 else 1
+
+            in_top = np.zeros(self.num_leds, dtype=bool)
+            in_top[top_indices] = True
+        else:
+            # Cheaper: no partition or sort, just a comparison with the max
+            max_level = levels.max()
+            max_level = max_level if max_level > 0 else 1
+            in_top = levels >= self.top_threshold * max_level
+        held = np.maximum(self.led_levels, levels / max_level)
+        decayed = self.led_levels * self.fade_decay
+        decayed[decayed < 0.01] = 0.0
+        self.led_levels = np.where(in_top, held, decayed)
+
+        return colorize(self.palette, self.led_levels, self.max_brightness,
+                        self.frame_hdr, self.frame)
+
+    def reset(self):
+        """Drop the held bands."""
+        self.led_levels = np.zeros(self.num_leds)
+
+    def decay(self):
+        """Fade every LED one step with no new input (e.g. a quiet block)."""
+        self.led_levels = self.led_levels * self.fade_decay
+        self.led_levels[self.led_levels < 0.01] = 0.0
+        return colorize(self.palette, self.led_levels, self.max_brightness,
+                        self.frame_hdr, self.frame)
+
+# === Top-K peaks with additive trail (mc4.py / mic3.py) ===
+class PeakTrailEffect:
+    """Light the LEDs under the top_k spectral peaks over a fading trail.
+
+    Equivalent to update_leds_top3 in mc4.py: every block the whole frame
+    fades by fade_factor (truncating like int()), then each peak adds its
+    position's color scaled by sqrt(intensity), saturating at
+    max_brightness. Peaks at or above max_freq are ignored, or pinned to
+    the last LED with clamp=True. Given bin_hz, peak frequencies are
+    refined to sub-bin accuracy (see peak.py) as in mic3.py, and freqs
+    is not needed.
+
+    State is a uint16 array updated in place; peaks are scattered into
+    it with np.add.at, so several peaks landing on one LED add up before
+    the single saturating clamp, and the per-block cost is one pass over
+    the strip plus O(top_k).
+    """
+
+    def __init__(self, num_leds, freqs=None, max_freq=2000, top_k=3, fade_factor=0.85,
+                 max_brightness=100, clamp=False, bin_hz=None, remove_dc=True):
+        self.num_leds = num_leds
+        self.freqs = freqs
+        self.max_freq = max_freq
+        self.top_k = top_k
+        self.fade_factor = fade_factor
+        self.max_brightness = max_brightness
+        self.clamp = clamp
+        self.bin_hz = bin_hz
+        self.remove_dc = remove_dc
+
+        self.state = np.zeros((num_leds, 3), dtype=np.uint16)
+        self.frame = new_frame(num_leds)
+        self.rebuild_palette()
+
+    def rebuild_palette(self):
+        self.palette = wheel_palette(self.num_leds)
+
+    def reset(self):
+        """Clear the trail."""
+        self.state.fill(0)
+
+    def render(self, magnitude):
+        """Update the trail from one spectrum; returns the frame or None if silent."""
+        if self.remove_dc:
+            magnitude[0] = 0
+        peak = np.max(magnitude)
+        if peak == 0:
+            return None
+        magnitude = magnitude / peak
+
+        top_indices = np.argpartition(magnitude, -self.top_k)[-self.top_k:]
+        if self.bin_hz is None:
+            peak_freqs = self.freqs[top_indices]
+        else:
+            peak_freqs = refine_peaks(magnitude, top_indices) * self.bin_hz
+
+        # Decay in place; the float -> uint16 cast truncates like int()
+        np.multiply(self.state, self.fade_factor, out=self.state, casting='unsafe')
+
+        led_idx = ((peak_freqs / self.max_freq) * self.num_leds).astype(np.intp)
+        if self.clamp:
+            np.clip(led_idx, 0, self.num_leds - 1, out=led_idx)
+        else:
+            keep = (led_idx >= 0) & (led_idx < self.num_leds)
+            led_idx, top_indices = led_idx[keep], top_indices[keep]
+
+        boost = self.palette[led_idx] * (magnitude[top_indices] ** 0.5)[:, None]
+        boost = np.minimum(boost.astype(np.uint16), self.max_brightness)
+        np.add.at(self.state, led_idx, boost)
+        np.minimum(self.state, self.max_brightness, out=self.state)
+
+        self.frame[:] = self.state
+        return self.frame
+
+# === Rainbow cascade background (rainbox_cascade.py) ===
+class CascadeEffect:
+    """A rainbow that shifts one wheel step along the strip per render.
+
+    Ignores the audio; render it at a fixed rate (rainbox_cascade.py
+    steps every 100 ms) as a background layer, see compositor.py.
+    """
+
+    def __init__(self, num_leds, step=1):
+        self.num_leds = num_leds
+        self.step = step
+        self.offset = 0
+        self.table = np.array([cascade_wheel(pos) for pos in range(256)], dtype=np.float64)
+        self.positions = np.arange(num_leds) * 256 // num_leds
+        self.frame = new_frame(num_leds)
+
+    def render(self, magnitude=None):
+        """Draw the current phase, then advance it; returns the frame."""
+        self.frame[:] = self.table[(self.positions + self.offset) % 256]
+        self.offset = (self.offset + self.step) % 256
+        return self.frame
+
+# === Benchmark: python effects.py ===
+def _list_trail(led_state, magnitude, freqs, max_freq, palette, fade, cap):
+    """mc4.py's original list-of-tuples update, for comparison."""
+    num_leds = len(led_state)
+    magnitude = magnitude / np.max(magnitude)
+    top_indices = np.argpartition(magnitude, -3)[-3:]
+    led_state = [(int(r * fade), int(g * fade), int(b * fade)) for r, g, b in led_state]
+    for idx in top_indices:
+        led_idx = int((freqs[idx] / max_freq) * num_leds)
+        if 0 <= led_idx < num_leds:
+            scale = magnitude[idx] ** 0.5
+            add = [min(cap, int(c * scale)) for c in palette[led_idx]]
+            led_state[led_idx] = tuple(min(cap, s + a) for s, a in zip(led_state[led_idx], add))
+    return led_state
+
+def benchmark(led_counts=(32, 144, 600, 2400), blocks=200, blocksize=2205, samplerate=44100):
+    """Per-block cost of the trail update, list version vs PeakTrailEffect."""
+    import time
+
+    rng = np.random.default_rng(0)
+    freqs = np.fft.fftfreq(blocksize, 1.0 / samplerate)[:blocksize // 2]
+    spectra = np.abs(rng.normal(size=(blocks, blocksize // 2))) + 1e-3
+    print(f"{'LEDs':>6} {'list us':>10} {'array us':>10}")
+    for num_leds in led_counts:
+        effect = PeakTrailEffect(num_leds, freqs)
+        state = [(0, 0, 0)] * num_leds
+        palette = effect.palette.tolist()
+
+        start = time.perf_counter()
+        for magnitude in spectra:
+            state = _list_trail(state, magnitude, freqs, 2000, palette, 0.85, 100)
+        list_us = (time.perf_counter() - start) / blocks * 1e6
+
+        start = time.perf_counter()
+        for magnitude in spectra:
+            effect.render(magnitude.copy())
+        array_us = (time.perf_counter() - start) / blocks * 1e6
+        print(f"{num_leds:>6} {list_us:>10.1f} {array_us:>10.1f}")
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,148 @@
+"""
+Batched peak-hold / decay envelopes over whole (frames, leds) matrices.
+
+The LED envelopes are recurrences: each frame's level depends on the
+previous one (update_leds_top5's max(led_levels[i], target) or
+led_levels[i] * FADE_DECAY, spectled's fade-or-jump). A closed form
+such as level * decay ** k would not round like repeated
+multiplication, so to match the streaming effects bit for bit the
+recurrence is kept step by step, and everything around it is batched:
+
+  - targets, top-k masks and silence masks are computed for all frames
+    with array operations,
+  - the recurrence runs in a compiled kernel when numba is installed,
+    otherwise as a time loop of in-place vector operations over the
+    LEDs (no per-frame allocation),
+  - colors are applied to all frames in one colorize-equivalent pass.
+
+spectrum_frames() and top_bands_frames() are the batch counterparts of
+SpectrumEffect.update and TopBandsEffect.update (see effects.py) and
+leave the effect in the same state streaming would.
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional
+    njit = None
+
+# === Recurrences ===
+def _fall_scan_py(targets, active, decay, level, out):
+    """Per frame: jump up to the target, or decay when it is lower."""
+    fading = np.zeros(level.shape, dtype=bool)
+    decayed = np.empty_like(level)
+    for t in range(len(targets)):
+        if active[t]:
+            np.less(targets[t], level, out=fading)
+            np.multiply(level, decay, out=decayed)
+            np.copyto(level, targets[t])
+            np.copyto(level, decayed, where=fading)
+        out[t] = level
+    return out
+
+def _hold_scan_py(targets, held, active, decay, snap, level, out):
+    """Per frame: held LEDs keep max(level, target), the rest decay and
+    snap to 0 below snap."""
+    decayed = np.empty_like(level)
+    for t in range(len(targets)):
+        if active[t]:
+            np.multiply(level, decay, out=decayed)
+            decayed[decayed < snap] = 0.0
+            np.maximum(level, targets[t], out=level)
+            np.copyto(level, decayed, where=~held[t])
+        out[t] = level
+    return out
+
+if njit is not None:
+    @njit(cache=True)
+    def _fall_scan_jit(targets, active, decay, level, out):
+        for t in range(targets.shape[0]):
+            if active[t]:
+                for i in range(level.shape[0]):
+                    if targets[t, i] < level[i]:
+                        level[i] = level[i] * decay
+                    else:
+                        level[i] = targets[t, i]
+            out[t] = level
+        return out
+
+    @njit(cache=True)
+    def _hold_scan_jit(targets, held, active, decay, snap, level, out):
+        for t in range(targets.shape[0]):
+            if active[t]:
+                for i in range(level.shape[0]):
+                    if held[t, i]:
+                        level[i] = max(level[i], targets[t, i])
+                    else:
+                        value = level[i] * decay
+                        level[i] = 0.0 if value < snap else value
+            out[t] = level
+        return out
+
+    _fall_scan, _hold_scan = _fall_scan_jit, _hold_scan_jit
+else:
+    _fall_scan, _hold_scan = _fall_scan_py, _hold_scan_py
+
+def fall_decay_scan(targets, decay, active=None, initial=None):
+    """Levels over time for 'jump up, else decay' (SpectrumEffect).
+
+    targets is (frames, leds); frames where active is False leave the
+    levels unchanged. Returns the (frames, leds) levels.
+    """
+    targets = np.ascontiguousarray(targets, dtype=np.float64)
+    active = np.ones(len(targets), dtype=bool) if active is None else np.asarray(active)
+    level = np.zeros(targets.shape[1]) if initial is None else np.array(initial, dtype=np.float64)
+    return _fall_scan(targets, active, float(decay), level, np.empty_like(targets))
+
+def hold_decay_scan(targets, held, decay, snap=0.01, active=None, initial=None):
+    """Levels over time for 'hold the max while held, else decay and snap'
+    (TopBandsEffect); held is a (frames, leds) bool mask."""
+    targets = np.ascontiguousarray(targets, dtype=np.float64)
+    held = np.ascontiguousarray(held, dtype=bool)
+    active = np.ones(len(targets), dtype=bool) if active is None else np.asarray(active)
+    level = np.zeros(targets.shape[1]) if initial is None else np.array(initial, dtype=np.float64)
+    return _hold_scan(targets, held, active, float(decay), float(snap), level,
+                      np.empty_like(targets))
+
+# === Batched effects ===
+def colorize_frames(palette, levels, max_brightness):
+    """colorize() for every frame: (frames, leds) levels -> uint8 frames."""
+    hdr = palette[None, :, :] * levels[:, :, None]
+    np.minimum(hdr, max_brightness, out=hdr)
+    return hdr.astype(np.uint8)
+
+def top_k_mask(levels, k):
+    """Bool mask of each frame's k largest levels, chosen as render() does."""
+    top = np.argpartition(levels, -k, axis=1)[:, -k:]
+    mask = np.zeros(levels.shape, dtype=bool)
+    np.put_along_axis(mask, top, True, axis=1)
+    return mask
+
+def spectrum_frames(effect, band_levels, silent):
+    """All frames of a SpectrumEffect from peak-normalized band means.
+
+    band_levels is (frames, leds); silent frames repeat the previous
+    frame, as when render() returns None.
+    """
+    targets = band_levels ** 0.5 * effect.intensity_scale
+    if effect.threshold is None:
+        np.clip(targets, 0.0, 1.0, out=targets)
+    else:
+        targets = np.where(targets < effect.threshold, 0.0, np.minimum(targets, 1.0))
+    levels = fall_decay_scan(targets, effect.fade_decay, ~silent, effect.led_levels)
+    if len(levels):
+        effect.led_levels = levels[-1].copy()
+    return colorize_frames(effect.palette, levels, effect.max_brightness)
+
+def top_bands_frames(effect, band_levels, silent):
+    """All frames of a TopBandsEffect from peak-normalized band means."""
+    held = top_k_mask(band_levels, effect.top_k)
+    # The strongest of the top k is the frame's maximum
+    max_level = band_levels.max(axis=1)
+    max_level[max_level <= 0] = 1
+    targets = band_levels / max_level[:, None]
+    levels = hold_decay_scan(targets, held, effect.fade_decay, 0.01, ~silent, effect.led_levels)
+    if len(levels):
+        effect.led_levels = levels[-1].copy()
+    return colorize_frames(effect.palette, levels, effect.max_brightness)
@@ -1,6 +1,10 @@
 import sounddevice as sd
 import numpy as np
 import scipy.fftpack as fftpack
+from termview import TerminalView
+
+# Drawn from its own thread so a slow console can't stall the callback
+view = TerminalView(refresh_hz=5)
 
 def audio_callback(indata, frames, time, status):
     # Flatten input data (mono)
@@ -8,7 +12,6 @@ def audio_callback(indata, frames, time, status):
 
     # Compute RMS (volume level)
     volume_norm = np.linalg.norm(audio_data) * 10
-    bar = "#" * min(int(volume_norm), 50)
 
     # Perform FFT
     fft_data = fftpack.fft(audio_data)
@@ -21,8 +24,8 @@ def audio_callback(indata, frames, time, status):
     # Find peak frequency
     peak_freq = freqs[np.argmax(magnitude)]
 
-    # Print intensity and dominant frequency
-    print(f"\rIntensity: [{bar:<50}] {volume_norm:.2f} | Peak Frequency: {peak_freq:6.1f} Hz", end='')
+    # Intensity and dominant frequency are drawn by the view thread
+    view.update(level=volume_norm, peak_hz=peak_freq)
 
 def main():
     global samplerate
@@ -36,11 +39,13 @@ def main():
                             samplerate=samplerate,
                             blocksize=blocksize,
                             callback=audio_callback):
+            view.start(top=2)
             print("Listening to microphone with FFT analysis... Press Ctrl+C to stop.")
             while True:
                 sd.sleep(1000)
     except KeyboardInterrupt:
-        print("\nStopped by user.")
+        view.stop()
+        print("Stopped by user.")
     except Exception as e:
         print(f"Error: {e}")
 
@@ -0,0 +1,28 @@
+"""
+Frame buffer helpers shared by the visualizers.
+
+A frame is a (num_leds, 3) uint8 array of R, G, B values. Effects render
+into frames with array operations and the strip is written in one place,
+instead of every script building Color() values pixel by pixel.
+"""
+
+import numpy as np
+
+def new_frame(num_leds):
+    return np.zeros((num_leds, 3), dtype=np.uint8)
+
+def pack_colors(frame):
+    """Pack an (N, 3) frame into the 24-bit ints Color() would return."""
+    rgb = frame.astype(np.uint32)
+    return (rgb[:, 0] << 16) | (rgb[:, 1] << 8) | rgb[:, 2]
+
+def show_frame(strip, frame):
+    """Write a whole frame to an Adafruit_NeoPixel-style strip and show it."""
+    for i, color in enumerate(pack_colors(frame).tolist()):
+        strip.setPixelColor(i, color)
+    strip.show()
+
+def clear(strip):
+    for i in range(strip.numPixels()):
+        strip.setPixelColor(i, 0)
+    strip.show()
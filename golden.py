@@ -0,0 +1,297 @@
+"""
+Golden-output regression harness for the visualizers.
+
+Every script slices bands, normalizes and fades a little differently, so
+an optimization in one of them can change what the strip shows without
+anything crashing. This runs each visualizer on fixed audio fixtures
+against a recording strip (rpi_ws281x and sounddevice are replaced
+with stand-ins, no hardware is touched), captures the strip after every
+block and compares the frames with the stored goldens in golden/.
+
+    python golden.py                      # check every visualizer
+    python golden.py mc4 spectled         # check some
+    python golden.py --update [names]     # re-record after an intended change
+
+Each script is driven the way its main() would drive it, minus the
+audio stream: audio_callback(indata, frames, None, None) per block, or
+process_block(block) then show_frame() for the runtime-based ones.
+Live-only stages that depend on the machine or the wall clock (analyzer
+calibration, noise profile, idle gate, dithering, power limiting) are
+pinned or bypassed; scripts built on the Analyzer are also run in the
+other modes 'auto' may pick for them, against the same goldens or, for
+decimated, their own (golden/NAME@decimated.npz). The fixtures are
+generated from fixed seeds; their checksums are stored with the goldens
+so a changed fixture is reported as such instead of as a regression.
+"""
+
+import hashlib
+import os
+import sys
+import time
+import types
+
+import numpy as np
+
+from drive import feed, load_script
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+GOLDEN_DIR = os.path.join(HERE, 'golden')
+
+VISUALIZERS = ('ledfft', 'ledfft2', 'spectled', 'f4f', 'reled', 'random_lights',
+               'linear', 'redodomfft', 'domfft', 'mic3', 'mc4', 'test2')
+
+FIXTURE_SECONDS = 3.0
+ATOL = 1                 # Per-channel difference tolerated (float rounding)
+MAX_MISMATCH = 0.002     # Fraction of channel values allowed beyond ATOL
+
+# The sparse DFT computes the same bins as the FFT and is held to the
+# fft goldens; the decimated path low-passes first, so it has its own
+OWN_GOLDEN_MODES = ('decimated',)
+
+# === Audio fixtures ===
+def _tone(t, hz, amp):
+    return amp * np.sin(2 * np.pi * hz * t)
+
+def fixture_silence(t, rng):
+    return np.zeros_like(t)
+
+def fixture_sweep(t, rng):
+    """Log sweep 40 Hz -> 4 kHz: walks every band in turn."""
+    f0, f1, length = 40.0, 4000.0, t[-1]
+    k = np.log(f1 / f0) / length
+    return 0.3 * np.sin(2 * np.pi * f0 * (np.exp(k * t) - 1) / k)
+
+def fixture_chords(t, rng):
+    """Two triads with tremolo: steady multi-peak spectra."""
+    first = t < t[-1] / 2
+    tremolo = 0.75 + 0.25 * np.sin(2 * np.pi * 3 * t)
+    a_minor = _tone(t, 220.0, 0.2) + _tone(t, 261.63, 0.15) + _tone(t, 329.63, 0.15)
+    f_major = _tone(t, 174.61, 0.2) + _tone(t, 220.0, 0.15) + _tone(t, 523.25, 0.1)
+    return tremolo * np.where(first, a_minor, f_major)
+
+def fixture_beats(t, rng):
+    """Kicks every 0.5 s and noisy hats over a quiet bed: onsets and decay."""
+    phase = t % 0.5
+    kick = 0.8 * np.exp(-phase * 18) * np.sin(2 * np.pi * 55 * phase * (1 + np.exp(-phase * 30)))
+    hat_phase = (t + 0.25) % 0.5
+    hat = 0.15 * np.exp(-hat_phase * 60) * rng.standard_normal(len(t))
+    return kick + hat + 0.01 * rng.standard_normal(len(t))
+
+def fixture_noise(t, rng):
+    return 0.1 * rng.standard_normal(len(t))
+
+def fixture_swell(t, rng):
+    """A 440 Hz tone fading in from silence and back out: quiet-block paths."""
+    envelope = np.clip(np.sin(np.pi * t / t[-1]) * 1.5 - 0.25, 0.0, 1.0)
+    return envelope * (_tone(t, 440.0, 0.3) + _tone(t, 1320.0, 0.05))
+
+FIXTURES = {
+    'silence': fixture_silence,
+    'sweep': fixture_sweep,
+    'chords': fixture_chords,
+    'beats': fixture_beats,
+    'noise': fixture_noise,
+    'swell': fixture_swell,
+}
+
+def make_fixture(name, samplerate, seconds=FIXTURE_SECONDS):
+    t = np.arange(int(samplerate * seconds)) / samplerate
+    rng = np.random.default_rng(sorted(FIXTURES).index(name))
+    return FIXTURES[name](t, rng).astype(np.float32)
+
+def checksum(signal):
+    return hashlib.sha1(signal.tobytes()).hexdigest()[:16]
+
+# === Hardware stand-ins ===
+def Color(red, green, blue, white=0):
+    return (white << 24) | (red << 16) | (green << 8) | blue
+
+class RecordingStrip:
+    """Adafruit_NeoPixel look-alike that only keeps the pixel values."""
+
+    def __init__(self, num, pin=18, freq_hz=800000, dma=10, invert=False,
+                 brightness=255, *args, **kwargs):
+        self.pixels = np.zeros(num, dtype=np.uint32)
+        self.brightness = brightness
+        self.shows = 0
+
+    def begin(self):
+        pass
+
+    def numPixels(self):
+        return len(self.pixels)
+
+    def setPixelColor(self, i, color):
+        self.pixels[i] = int(color) & 0xFFFFFF
+
+    def getPixelColor(self, i):
+        return int(self.pixels[i])
+
+    def setBrightness(self, brightness):
+        self.brightness = brightness
+
+    def getBrightness(self):
+        return self.brightness
+
+    def show(self):
+        self.shows += 1
+
+    def frame(self):
+        """Current pixels as an (N, 3) uint8 frame."""
+        p = self.pixels
+        return np.stack([(p >> 16) & 0xFF, (p >> 8) & 0xFF, p & 0xFF], axis=1).astype(np.uint8)
+
+def _no_audio(*args, **kwargs):
+    raise RuntimeError("golden.py drives the callbacks itself; no audio device")
+
+def install_stand_ins():
+    ws = types.ModuleType('rpi_ws281x')
+    ws.Adafruit_NeoPixel = RecordingStrip
+    ws.Color = Color
+    sd = types.ModuleType('sounddevice')
+    sd.InputStream = sd.OutputStream = sd.rec = _no_audio
+    sd.sleep = lambda ms: None
+    sys.modules['rpi_ws281x'] = ws
+    sys.modules['sounddevice'] = sd
+
+# === Driving the scripts ===
+def load_visualizer(name, pin=True, mode='fft'):
+    """Import a fresh copy of a script (module state starts from scratch).
+
+    With pin, what depends on this machine rather than on the audio is
+    fixed: analysis in the given mode, no noise profile, no terminal view.
+    """
+    module = load_script(name, prefix='golden')
+    if not pin:
+        return module
+    if hasattr(module, 'analyzer'):
+        module.analyzer.set_mode(mode)
+        module.analyzer.noise_floor = None
+    if hasattr(module, 'noise_floor'):
+        module.noise_floor = None
+    if hasattr(module, 'view'):
+        module.view = None
+    return module
+
+def run_visualizer(name, fixture, mode='fft'):
+    """Frames shown after each block, shape (n_blocks, num_leds, 3).
+
+    Returns (frames, fixture checksum, error): if the script raises, as
+    the live callback would, frames stop there and error is the
+    exception's type name. A crash always fails the check; it is never
+    recorded as expected output.
+    """
+    module = load_visualizer(name, mode=mode)
+    strip, n = module.strip, module.blocksize
+    signal = make_fixture(fixture, module.samplerate)
+    frames = []
+    error = ''
+    # Scripts that divide by a zero peak warn on every silent block
+    with np.errstate(all='ignore'):
+        try:
+            for start in range(0, len(signal) - n + 1, n):
+                feed(module, signal[start:start + n])
+                frames.append(strip.frame())
+        except Exception as e:
+            error = type(e).__name__
+    frames = np.array(frames) if frames else np.zeros((0, strip.numPixels(), 3), np.uint8)
+    return frames, checksum(signal), error
+
+def golden_path(name, mode='fft'):
+    if mode in OWN_GOLDEN_MODES:
+        name = f"{name}@{mode}"
+    return os.path.join(GOLDEN_DIR, f"{name}.npz")
+
+def analysis_modes(name):
+    """'fft' plus the other Analyzer paths 'auto' may pick for a script."""
+    module = load_visualizer(name, pin=False)
+    if not hasattr(module, 'analyzer'):
+        return ['fft']
+    return module.analyzer.usable_modes()
+
+def record(name):
+    os.makedirs(GOLDEN_DIR, exist_ok=True)
+    for mode in analysis_modes(name):
+        if mode != 'fft' and mode not in OWN_GOLDEN_MODES:
+            continue
+        label = name if mode == 'fft' else f"{name}@{mode}"
+        arrays = {}
+        for fixture in FIXTURES:
+            frames, digest, error = run_visualizer(name, fixture, mode)
+            arrays[fixture] = frames
+            arrays[f"{fixture}_checksum"] = np.array(digest)
+            if error:
+                print(f"{label}/{fixture}: raises {error} after {len(frames)} blocks; "
+                      f"this fixture will fail until the script is fixed")
+        path = golden_path(name, mode)
+        np.savez_compressed(path, **arrays)
+        print(f"{label}: recorded {len(FIXTURES)} fixtures -> {os.path.relpath(path)}")
+    return True
+
+def compare(frames, golden, atol=ATOL, max_mismatch=MAX_MISMATCH):
+    """None if frames match golden within tolerance, else what differs."""
+    if frames.shape != golden.shape:
+        return f"shape {frames.shape} != golden {golden.shape}"
+    if not frames.size:
+        return None
+    diff = np.abs(frames.astype(np.int16) - golden.astype(np.int16))
+    bad = diff > atol
+    if bad.mean() <= max_mismatch:
+        return None
+    first = int(np.argmax(bad.any(axis=(1, 2))))
+    return (f"{int(bad.sum())} values off by > {atol} (max {int(diff.max())}), "
+            f"first at block {first}")
+
+def check(name):
+    runs = [(name if mode == 'fft' else f"{name}@{mode}", mode) for mode in analysis_modes(name)]
+    ok = True
+    start = time.perf_counter()
+    blocks = 0
+    for label, mode in runs:
+        path = golden_path(name, mode)
+        if not os.path.exists(path):
+            print(f"{label}: no golden, run python golden.py --update {name}")
+            ok = False
+            continue
+        golden = np.load(path)
+        for fixture in FIXTURES:
+            frames, digest, error = run_visualizer(name, fixture, mode)
+            blocks += len(frames)
+            if fixture not in golden.files:
+                print(f"{label}/{fixture}: not in golden, re-record with --update")
+                ok = False
+            elif str(golden[f"{fixture}_checksum"]) != digest:
+                print(f"{label}/{fixture}: fixture audio changed, re-record with --update")
+                ok = False
+            elif error:
+                print(f"{label}/{fixture}: FAIL raised {error} after {len(frames)} blocks")
+                ok = False
+            else:
+                problem = compare(frames, golden[fixture])
+                if problem:
+                    print(f"{label}/{fixture}: FAIL {problem}")
+                    ok = False
+    elapsed = time.perf_counter() - start
+    status = "ok" if ok else "FAILED"
+    modes = f", {len(runs)} analysis modes" if len(runs) > 1 else ""
+    print(f"{name}: {status} ({blocks} blocks{modes}, "
+          f"{1000 * elapsed / max(blocks, 1):.2f} ms/block)")
+    return ok
+
+def main():
+    args = sys.argv[1:]
+    update = '--update' in args
+    names = [a[:-3] if a.endswith('.py') else a for a in args if a != '--update']
+    unknown = [n for n in names if n not in VISUALIZERS]
+    if unknown:
+        print(f"Unknown visualizer(s): {', '.join(unknown)}; expected {', '.join(VISUALIZERS)}")
+        sys.exit(2)
+
+    install_stand_ins()
+    sys.path.insert(0, HERE)
+    results = [(record if update else check)(name) for name in names or VISUALIZERS]
+    if not all(results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
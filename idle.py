@@ -0,0 +1,124 @@
+"""
+Idle / power-save state machine for quiet rooms.
+
+A rig in a silent room still runs the FFT, the band loop and show() for
+every block. IdleGate wraps a visualizer's process(block) function and
+puts a cheap RMS check in front of it (soundhound.py's level meter, on
+every stride-th sample):
+
+  active  - level seen within hold seconds: process every block
+  fading  - quiet for hold seconds: fade the last frame to black over
+            fade seconds, once, without running the visualizer
+  idle    - only the RMS check runs and no frames are produced, so the
+            strip is not rewritten
+
+Hysteresis keeps it from flapping: the level must drop below
+sleep_level to start the hold timer, but only rising above the higher
+wake_level wakes it, which happens on the first loud block. On waking,
+on_wake() runs before the first block is processed, e.g. an effect's
+reset(), so levels held from before the pause don't flash back.
+"""
+
+import time
+
+import numpy as np
+
+ACTIVE = 'active'
+FADING = 'fading'
+IDLE = 'idle'
+STATES = (ACTIVE, FADING, IDLE)
+
+def block_rms(block, stride=4):
+    """RMS of every stride-th sample; plenty to tell silence from sound."""
+    samples = block[::stride]
+    return float(np.linalg.norm(samples)) / np.sqrt(max(len(samples), 1))
+
+class IdleGate:
+    """Skip analysis and fade out during silence; levels are sample RMS."""
+
+    def __init__(self, process, wake_level=0.01, sleep_level=0.005, hold=10.0,
+                 fade=1.5, stride=4, clock=time.monotonic, on_wake=None):
+        if sleep_level > wake_level:
+            raise ValueError("sleep_level must not exceed wake_level")
+        self.process = process
+        self.wake_level = wake_level
+        self.sleep_level = sleep_level
+        self.hold = hold
+        self.fade = fade
+        self.stride = stride
+        self.clock = clock
+        self.on_wake = on_wake
+
+        self.state = ACTIVE
+        self.level = 0.0
+        self._since = clock()          # entered the current state
+        self._quiet_since = None       # first quiet block while active
+        self._last = None              # last frame produced while active
+        self._faded = None
+
+        # Stats
+        self.seconds = dict.fromkeys(STATES, 0.0)
+        self.wakeups = 0
+        self.skipped_blocks = 0
+
+    def _enter(self, state, now):
+        self.seconds[self.state] += now - self._since
+        self.state = state
+        self._since = now
+
+    def _fade_frame(self, now):
+        remaining = 1.0 - (now - self._since) / self.fade if self.fade > 0 else 0.0
+        if self._last is None or remaining <= 0:
+            return None
+        np.multiply(self._last, remaining, out=self._faded, casting='unsafe')
+        return self._faded
+
+    def __call__(self, block):
+        now = self.clock()
+        self.level = level = block_rms(block, self.stride)
+
+        if self.state != ACTIVE:
+            if level < self.wake_level:
+                self.skipped_blocks += 1
+                if self.state == FADING:
+                    frame = self._fade_frame(now)
+                    if frame is not None:
+                        return frame
+                    self._enter(IDLE, now)
+                    # Make sure the strip ends fully dark
+                    if self._last is not None:
+                        self._faded.fill(0)
+                        self._last = None
+                        return self._faded
+                return None
+            self.wakeups += 1
+            self._quiet_since = None
+            self._enter(ACTIVE, now)
+            if self.on_wake is not None:
+                self.on_wake()
+
+        if level < self.sleep_level:
+            if self._quiet_since is None:
+                self._quiet_since = now
+            elif now - self._quiet_since >= self.hold:
+                self._enter(FADING, now)
+                return self._fade_frame(now)
+        else:
+            self._quiet_since = None
+
+        frame = self.process(block)
+        if frame is not None:
+            if self._last is None or self._last.shape != frame.shape:
+                self._last = np.array(frame, copy=True)
+                self._faded = np.empty_like(self._last)
+            else:
+                np.copyto(self._last, frame)
+        return frame
+
+    def stats(self):
+        seconds = dict(self.seconds)
+        seconds[self.state] += self.clock() - self._since
+        stats = {'idle_state': self.state, 'idle_wakeups': self.wakeups,
+                 'idle_skipped_blocks': self.skipped_blocks}
+        stats.update({f"seconds_{state}": round(value, 1) for state, value in seconds.items()})
+        return stats
@@ -1,7 +1,9 @@
+import os
 import sounddevice as sd
 import numpy as np
-import scipy.fftpack as fftpack
 from rpi_ws281x import Adafruit_NeoPixel, Color
+from analysis import Analyzer
+from noisefloor import NoiseFloor, profile_path
 
 # === LED Configuration ===
 LED_COUNT = 32
@@ -28,6 +30,13 @@ MAX_BRIGHTNESS = 50
 
 led_levels = [0.0] * LED_COUNT
 
+# Learned per room with `python noisefloor.py linear`
+NOISE_PROFILE = profile_path('linear')
+noise_floor = NoiseFloor.load(NOISE_PROFILE) if os.path.exists(NOISE_PROFILE) else None
+
+# Only bins up to FREQ_MAX are used: let the analyzer pick FFT vs sparse DFT
+analyzer = Analyzer(blocksize, samplerate, FREQ_MAX, noise_floor=noise_floor)
+
 def wheel(pos):
     pos = 255 - pos
     if pos < 85:
@@ -43,32 +52,36 @@ def generate_linear_freq_edges(f_min, f_max, num_bands):
     return np.linspace(f_min, f_max, num_bands + 1)
 
 # === LED update using linear frequency bands ===
-def update_leds_linear_bands(magnitude, freqs):
+def update_leds_linear_bands(magnitude, freqs, quiet=False):
     global led_levels
 
     num_leds = strip.numPixels()
     freq_edges = generate_linear_freq_edges(FREQ_MIN, FREQ_MAX, num_leds)
 
     magnitude[0] = 0  # Remove DC
-    if np.max(magnitude) == 0:
-        return
-    magnitude = magnitude / np.max(magnitude)
-
-    # Compute intensity per LED band
-    levels = np.zeros(num_leds)
-    for i in range(num_leds):
-        f_start = freq_edges[i]
-        f_end = freq_edges[i + 1]
-        band = magnitude[(freqs >= f_start) & (freqs < f_end)]
-        levels[i] = np.mean(band) if len(band) else 0.0
-
-    # Get top 5 bands
-    top_indices = np.argpartition(levels, -5)[-5:]
-    top_indices = top_indices[np.argsort(levels[top_indices])[::-1]]
-
-    # Normalize relative to top level
-    max_level = levels[top_indices[0]] if levels[top_indices[0]] > 0 else 1
-    relative_levels = {i: levels[i] / max_level for i in top_indices}
+    if quiet:
+        # Only room noise left: fade every band instead of normalizing the hiss
+        relative_levels = {}
+    else:
+        if np.max(magnitude) == 0:
+            return
+        magnitude = magnitude / np.max(magnitude)
+
+        # Compute intensity per LED band
+        levels = np.zeros(num_leds)
+        for i in range(num_leds):
+            f_start = freq_edges[i]
+            f_end = freq_edges[i + 1]
+            band = magnitude[(freqs >= f_start) & (freqs < f_end)]
+            levels[i] = np.mean(band) if len(band) else 0.0
+
+        # Get top 5 bands
+        top_indices = np.argpartition(levels, -5)[-5:]
+        top_indices = top_indices[np.argsort(levels[top_indices])[::-1]]
+
+        # Normalize relative to top level
+        max_level = levels[top_indices[0]] if levels[top_indices[0]] > 0 else 1
+        relative_levels = {i: levels[i] / max_level for i in top_indices}
 
     for i in range(num_leds):
         if i in relative_levels:
@@ -90,17 +103,15 @@ def update_leds_linear_bands(magnitude, freqs):
 
 # === Audio Callback ===
 def audio_callback(indata, frames, time, status):
-    audio_data = indata[:, 0] * np.hanning(len(indata))
-    fft_data = fftpack.fft(audio_data)
-    fft_freq = fftpack.fftfreq(len(audio_data), 1.0 / samplerate)
-    magnitude = np.abs(fft_data[:len(fft_data)//2])
-    freqs = fft_freq[:len(fft_freq)//2]
+    magnitude = analyzer(indata[:, 0])
+    freqs = analyzer.freqs
 
-    update_leds_linear_bands(magnitude, freqs)
+    update_leds_linear_bands(magnitude, freqs, analyzer.quiet)
 
 # === Main Loop ===
 def main():
     print(f"Top 5 LED bands (linearly spaced from {FREQ_MIN}–{FREQ_MAX} Hz). Ctrl+C to stop.")
+    print(f"Using {analyzer.describe()}.")
     try:
         with sd.InputStream(device=0,
                             channels=1,
@@ -1,7 +1,9 @@
 import sounddevice as sd
 import numpy as np
 import scipy.fftpack as fftpack
-from rpi_ws281x import Adafruit_NeoPixel, Color
+from rpi_ws281x import Adafruit_NeoPixel
+from effects import PeakTrailEffect
+from frame import clear, show_frame
 
 # === LED Configuration ===
 LED_COUNT = 32
@@ -20,76 +22,27 @@ samplerate = 44100
 block_duration = 0.05
 blocksize = int(samplerate * block_duration)
 
-# LED state buffer for fading
-led_state = [(0, 0, 0)] * LED_COUNT
-
-# === Helper: Color Wheel ===
-def wheel(pos):
-    pos = 255 - pos
-    if pos < 85:
-        return (255 - pos * 3, 0, pos * 3)
-    if pos < 170:
-        pos -= 85
-        return (0, pos * 3, 255 - pos * 3)
-    pos -= 170
-    return (pos * 3, 255 - pos * 3, 0)
+# Fading trail state lives in the effect (uint16 array, updated in place)
+freqs = fftpack.fftfreq(blocksize, 1.0 / samplerate)[:blocksize // 2]
+effect = PeakTrailEffect(LED_COUNT, freqs,
+                         max_freq=2000,        # NEW: Reduced max frequency
+                         top_k=3,
+                         fade_factor=0.85,
+                         max_brightness=100)   # NEW: Cap RGB brightness
 
 # === Update LEDs ===
-def update_leds_top3(magnitude, freqs):
-    global led_state
-
-    num_leds = strip.numPixels()
-    max_freq = 2000  # NEW: Reduced max frequency
-    max_brightness = 100  # NEW: Cap RGB brightness
-
-    # Ignore DC (0 Hz) component
-    magnitude[0] = 0
-
-    if np.max(magnitude) == 0:
-        return
-    magnitude = magnitude / np.max(magnitude)
-
-    # Get top 3 peak bins
-    top_indices = np.argpartition(magnitude, -3)[-3:]
-    top_indices = top_indices[np.argsort(magnitude[top_indices])[::-1]]
-
-    # Fade all LEDs
-    fade_factor = 0.85
-    led_state = [(int(r * fade_factor), int(g * fade_factor), int(b * fade_factor)) for r, g, b in led_state]
-
-    for idx in top_indices:
-        freq = freqs[idx]
-        intensity = magnitude[idx]
-
-        # Map to LED index
-        led_idx = int((freq / max_freq) * num_leds)
-        if led_idx < 0 or led_idx >= num_leds:
-            continue
-
-        base_color = wheel(int(led_idx * 256 / num_leds))
-        scale = intensity ** 0.5
-
-        scaled_color = tuple(min(max_brightness, int(c * scale)) for c in base_color)
-
-        # Add scaled color to current state
-        r = min(max_brightness, led_state[led_idx][0] + scaled_color[0])
-        g = min(max_brightness, led_state[led_idx][1] + scaled_color[1])
-        b = min(max_brightness, led_state[led_idx][2] + scaled_color[2])
-        led_state[led_idx] = (r, g, b)
-
-    for i, (r, g, b) in enumerate(led_state):
-        strip.setPixelColor(i, Color(r, g, b))
-    strip.show()
+def update_leds_top3(magnitude):
+    frame = effect.render(magnitude)
+    if frame is not None:
+        show_frame(strip, frame)
 
 # === Audio Callback ===
 def audio_callback(indata, frames, time, status):
     audio_data = indata[:, 0] * np.hanning(len(indata))
     fft_data = fftpack.fft(audio_data)
-    fft_freq = fftpack.fftfreq(len(audio_data), 1.0 / samplerate)
     magnitude = np.abs(fft_data[:len(fft_data)//2])
-    freqs = fft_freq[:len(fft_freq)//2]
 
-    update_leds_top3(magnitude, freqs)
+    update_leds_top3(magnitude)
 
 # === Main Loop ===
 def main():
@@ -105,9 +58,7 @@ def main():
     except KeyboardInterrupt:
         print("\nShutting down...")
     finally:
-        for i in range(strip.numPixels()):
-            strip.setPixelColor(i, Color(0, 0, 0))
-        strip.show()
+        clear(strip)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,198 @@
+"""
+Low-overhead metrics for running rigs.
+
+Counters, gauges and fixed-bucket histograms live in arrays allocated
+when the metric is registered, so recording from the audio path is an index
+lookup and an add, with no allocation. Metrics are exposed as
+Prometheus text, either from a small HTTP endpoint on localhost or by
+periodically dumping a file (e.g. for node_exporter's textfile
+collector).
+
+RateLimitedPrinter keeps console output (over SSH or a serial console,
+where every print can stall the caller) to a few updates per second.
+"""
+
+import bisect
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+METRICS_PORT = 9108   # Default; scripts that run side by side pick their own
+PREFIX = 'jeepers_'
+
+# Default histogram buckets in milliseconds (upper bounds, +Inf implied)
+MS_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100)
+
+class Histogram:
+    """Fixed buckets with a preallocated count array."""
+
+    def __init__(self, buckets=MS_BUCKETS):
+        self.buckets = list(buckets)
+        self.counts = np.zeros(len(self.buckets) + 1, dtype=np.int64)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class Metrics:
+    """Registry of named counters, gauges and histograms."""
+
+    def __init__(self, prefix=PREFIX):
+        self.prefix = prefix
+        self._counter_index = {}
+        self._counters = np.zeros(0, dtype=np.int64)
+        self._gauge_index = {}
+        self._gauges = np.zeros(0, dtype=np.float64)
+        self._help = {}
+        self.histograms = {}
+
+    def counter(self, name, help_text=''):
+        if name not in self._counter_index:
+            self._counter_index[name] = len(self._counters)
+            self._counters = np.append(self._counters, 0)
+            self._help[name] = help_text
+
+    def gauge(self, name, help_text=''):
+        """A point-in-time value (power draw, QoS level, ...), set with set()."""
+        if name not in self._gauge_index:
+            self._gauge_index[name] = len(self._gauges)
+            self._gauges = np.append(self._gauges, 0.0)
+            self._help[name] = help_text
+
+    def histogram(self, name, help_text='', buckets=MS_BUCKETS):
+        if name not in self.histograms:
+            self.histograms[name] = Histogram(buckets)
+            self._help[name] = help_text
+        return self.histograms[name]
+
+    def inc(self, name, amount=1):
+        self._counters[self._counter_index[name]] += amount
+
+    def value(self, name):
+        return int(self._counters[self._counter_index[name]])
+
+    def set(self, name, value):
+        self._gauges[self._gauge_index[name]] = value
+
+    def gauge_value(self, name):
+        return float(self._gauges[self._gauge_index[name]])
+
+    def observe(self, name, value):
+        self.histograms[name].observe(value)
+
+    def observe_ms_since(self, name, start):
+        """Record the milliseconds since a time.perf_counter() start."""
+        self.histograms[name].observe((time.perf_counter() - start) * 1000)
+
+    def record_status(self, status):
+        """Count over/underflows from a sounddevice CallbackFlags status."""
+        if not status:
+            return
+        if status.input_overflow:
+            self.inc('input_overflows')
+        if status.input_underflow:
+            self.inc('input_underflows')
+
+    # === Exposition ===
+    def prometheus_text(self):
+        lines = []
+        for name, index in self._counter_index.items():
+            full = f"{self.prefix}{name}_total"
+            if self._help[name]:
+                lines.append(f"# HELP {full} {self._help[name]}")
+            lines.append(f"# TYPE {full} counter")
+            lines.append(f"{full} {int(self._counters[index])}")
+        for name, index in self._gauge_index.items():
+            full = self.prefix + name
+            if self._help[name]:
+                lines.append(f"# HELP {full} {self._help[name]}")
+            lines.append(f"# TYPE {full} gauge")
+            lines.append(f"{full} {self._gauges[index]:g}")
+        for name, hist in self.histograms.items():
+            full = self.prefix + name
+            if self._help[name]:
+                lines.append(f"# HELP {full} {self._help[name]}")
+            lines.append(f"# TYPE {full} histogram")
+            cumulative = np.cumsum(hist.counts)
+            for bound, count in zip(hist.buckets, cumulative):
+                lines.append(f'{full}_bucket{{le="{bound}"}} {count}')
+            lines.append(f'{full}_bucket{{le="+Inf"}} {cumulative[-1]}')
+            lines.append(f"{full}_sum {hist.sum:.6f}")
+            lines.append(f"{full}_count {hist.count}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port=METRICS_PORT, host='127.0.0.1'):
+        """Serve /metrics over HTTP from a daemon thread."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Keep scrapes out of the console
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+        return server
+
+    def dump(self, path):
+        """Atomically write the Prometheus text to path."""
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp, path)
+
+    def dump_every(self, path, interval=10.0):
+        """Dump to path every interval seconds from a daemon thread."""
+        def run():
+            while True:
+                time.sleep(interval)
+                self.dump(path)
+        thread = threading.Thread(target=run, name='metrics-dump', daemon=True)
+        thread.start()
+        return thread
+
+# === Console output ===
+class RateLimitedPrinter:
+    """print() that drops calls arriving within interval of the last one."""
+
+    def __init__(self, interval=0.2):
+        self.interval = interval
+        self._last = 0.0
+        self.suppressed = 0
+
+    def __call__(self, *args, **kwargs):
+        now = time.monotonic()
+        if now - self._last < self.interval:
+            self.suppressed += 1
+            return False
+        self._last = now
+        kwargs.setdefault('flush', True)
+        print(*args, **kwargs)
+        return True
+
+def runtime_metrics():
+    """A Metrics registry with the names Runtime records."""
+    metrics = Metrics()
+    metrics.counter('blocks', 'Audio blocks analyzed')
+    metrics.counter('dropped_blocks', 'Blocks dropped because analysis fell behind')
+    metrics.counter('input_overflows', 'Input overflows reported by PortAudio')
+    metrics.counter('input_underflows', 'Input underflows reported by PortAudio')
+    metrics.counter('frames_sent', 'Frames written to the strip')
+    metrics.counter('frames_skipped', 'Frames replaced before they were shown')
+    metrics.histogram('callback_ms', 'PortAudio callback duration')
+    metrics.histogram('analysis_ms', 'Block analysis and effect time')
+    metrics.histogram('show_ms', 'Strip output time')
+    return metrics
@@ -0,0 +1,210 @@
+"""
+Multi-process visualizer pipeline for multi-core Pis.
+
+A single visualizer process holds the GIL through the FFT, the band
+loop and every setPixelColor call, so a Pi 4 uses one of its four cores.
+Here each stage gets its own process, connected by shared-memory rings
+(see ringbuffer.py) so blocks, spectra and frames are never pickled.
+Audio goes through a SampleRing that the analysis stage reads as
+zero-copy window views, so further readers (e.g. a recorder) can be
+attached to the same stream:
+
+    capture  ->  analysis  ->  effect  ->  output
+    (stream)     (FFT)         (levels,    (strip.show)
+                               colors)
+
+The stages form a pipeline rather than a worker pool because effects
+carry envelope state from block to block. Each stage reports its CPU
+utilization, and the parent prints them with the ring drop counts.
+
+Run directly for spectled.py's spectrum bars across four processes.
+"""
+
+import multiprocessing as mp
+import signal
+import time
+
+import numpy as np
+import scipy.fftpack as fftpack
+
+from analysis import Analyzer
+from effects import SpectrumEffect
+from frame import clear, new_frame, show_frame
+from ringbuffer import SampleRing, SlotRing
+
+STAGES = ('capture', 'analysis', 'effect', 'output')
+
+# Per-stage shared counters
+ITEMS = 0
+CPU_SECONDS = 1
+
+class Pipeline:
+    """Run capture, analysis, effect and output in separate processes.
+
+    The make_* factories are called inside the process that uses them, so
+    the strip (and its DMA channel) only ever exists in the output stage:
+      make_analyzer() -> analyze(block) returning n_bins magnitudes
+      make_effect()   -> render(magnitude) returning a frame or None
+      make_strip()    -> an initialized Adafruit_NeoPixel-style strip
+    """
+
+    def __init__(self, samplerate, blocksize, n_bins, num_leds,
+                 make_analyzer, make_effect, make_strip, device=0,
+                 slots=8, stats_interval=10.0):
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.n_bins = n_bins
+        self.num_leds = num_leds
+        self.make_analyzer = make_analyzer
+        self.make_effect = make_effect
+        self.make_strip = make_strip
+        self.device = device
+        self.stats_interval = stats_interval
+
+        self.audio = SampleRing(blocksize * slots)
+        self.spectra = SlotRing(n_bins, np.float64, slots)
+        self.frames = SlotRing((num_leds, 3), np.uint8, slots)
+        self.stop = mp.Event()
+        self._stats = mp.Array('d', len(STAGES) * 2, lock=False)
+
+    def _stage_stats(self, name):
+        stats = np.frombuffer(self._stats, dtype=np.float64).reshape(len(STAGES), 2)
+        return stats[STAGES.index(name)]
+
+    # === Stage bodies (each runs in its own process) ===
+    def _capture(self, stats):
+        import sounddevice as sd
+
+        def callback(indata, frames, time, status):
+            self.audio.write(indata[:, 0])
+            stats[ITEMS] += 1
+
+        with sd.InputStream(device=self.device,
+                            channels=1,
+                            samplerate=self.samplerate,
+                            blocksize=self.blocksize,
+                            callback=callback):
+            while not self.stop.wait(0.5):
+                stats[CPU_SECONDS] = time.process_time()
+
+    def _analysis(self, stats):
+        analyze = self.make_analyzer()
+        reader = self.audio.reader()
+        try:
+            while not self.stop.is_set():
+                if reader.wait(self.blocksize, timeout=0.5):
+                    self.spectra.put(analyze(reader.read(self.blocksize)))
+                    stats[ITEMS] += 1
+                stats[CPU_SECONDS] = time.process_time()
+        finally:
+            reader.close()
+
+    def _effect(self, stats):
+        render = self.make_effect()
+        magnitude = np.zeros(self.n_bins)
+        while not self.stop.is_set():
+            if self.spectra.get(magnitude, timeout=0.5):
+                frame = render(magnitude)
+                if frame is not None:
+                    self.frames.put(frame)
+                stats[ITEMS] += 1
+            stats[CPU_SECONDS] = time.process_time()
+
+    def _output(self, stats):
+        strip = self.make_strip()
+        frame = new_frame(self.num_leds)
+        try:
+            while not self.stop.is_set():
+                # Only the newest frame is worth showing
+                if self.frames.get_latest(frame, timeout=0.5):
+                    show_frame(strip, frame)
+                    stats[ITEMS] += 1
+                stats[CPU_SECONDS] = time.process_time()
+        finally:
+            clear(strip)
+
+    def _run_stage(self, name):
+        # Ctrl+C goes to the whole process group; let the parent decide
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        getattr(self, '_' + name)(self._stage_stats(name))
+
+    # === Parent ===
+    def report(self, previous, elapsed):
+        """Print per-stage CPU utilization since the previous report."""
+        parts = []
+        for name in STAGES:
+            stats = self._stage_stats(name)
+            cpu = stats[CPU_SECONDS] - previous[name]
+            previous[name] = stats[CPU_SECONDS]
+            parts.append(f"{name} {100 * cpu / elapsed:4.1f}% ({int(stats[ITEMS])})")
+        print(" | ".join(parts)
+              + f" | lost {self.audio.overflow()} samples"
+              + f" | dropped {self.spectra.dropped}/{self.frames.dropped}", flush=True)
+
+    def run(self):
+        """Start all stages and report until interrupted."""
+        procs = [mp.Process(target=self._run_stage, args=(name,), name=name, daemon=True)
+                 for name in STAGES]
+        for proc in procs:
+            proc.start()
+
+        previous = dict.fromkeys(STAGES, 0.0)
+        last = time.monotonic()
+        try:
+            while all(proc.is_alive() for proc in procs):
+                time.sleep(self.stats_interval)
+                now = time.monotonic()
+                self.report(previous, now - last)
+                last = now
+        finally:
+            self.stop.set()
+            for proc in procs:
+                proc.join(timeout=2)
+            for ring in (self.audio, self.spectra, self.frames):
+                ring.close()
+
+# === Default configuration: spectled.py across four processes ===
+LED_COUNT = 32
+LED_PIN = 18
+LED_FREQ_HZ = 800000
+LED_DMA = 10
+LED_BRIGHTNESS = 50
+LED_INVERT = False
+
+samplerate = 44100
+block_duration = 0.05
+blocksize = int(samplerate * block_duration)
+
+MAX_FREQ = 2000
+FADE_DECAY = 0.8
+INTENSITY_SCALE = 3.0
+MAX_BRIGHTNESS = 100
+
+def make_analyzer():
+    # spectled normalizes against the whole spectrum, so keep every bin
+    return Analyzer(blocksize, samplerate, samplerate / 2, mode='fft')
+
+def make_effect():
+    freqs = fftpack.fftfreq(blocksize, 1.0 / samplerate)[:blocksize // 2]
+    effect = SpectrumEffect(LED_COUNT, freqs, MAX_FREQ, FADE_DECAY,
+                            INTENSITY_SCALE, MAX_BRIGHTNESS)
+    return effect.render
+
+def make_strip():
+    from rpi_ws281x import Adafruit_NeoPixel
+    strip = Adafruit_NeoPixel(LED_COUNT, LED_PIN, LED_FREQ_HZ,
+                              LED_DMA, LED_INVERT, LED_BRIGHTNESS)
+    strip.begin()
+    return strip
+
+def main():
+    print("Multi-process spectrum visualizer (0–2000 Hz). Ctrl+C to stop.")
+    pipeline = Pipeline(samplerate, blocksize, blocksize // 2, LED_COUNT,
+                        make_analyzer, make_effect, make_strip)
+    try:
+        pipeline.run()
+    except KeyboardInterrupt:
+        print("\nShutting down...")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+"""
+Drive remote LED nodes over UDP with DDP (Distributed Display Protocol).
+
+With a mic and analyzer on every Pi, the strips around a room drift out
+of sync. Instead one host analyzes and sends frames, and each node only
+receives them and writes its strip.
+
+DDPStrip looks like an Adafruit_NeoPixel strip (numPixels,
+setPixelColor, show, ...), so DitheredOutput or show_frame() can drive
+it unchanged; each show() sends the whole frame to every node, split
+into packets of at most 480 pixels. The last packet carries the push
+flag, and receivers only display on push, so a frame is never shown
+half updated. Optionally the same calls are forwarded to a local strip.
+Frames can carry a presentation timestamp in DDP's timecode field so
+every node shows them at the same moment (see sync.py).
+
+DDPReceiver applies incoming packets to a local strip. It rewrites only
+the pixels that changed and calls show() once per push. It tracks the
+4-bit DDP sequence number to count dropped packets. Timestamped frames
+are handed to a FrameScheduler when one is attached.
+
+    python netsink.py             # run a receiver node on the local strip
+    python netsink.py loopback    # send test frames to a local receiver
+"""
+
+import socket
+import struct
+import sys
+import threading
+import time
+
+import numpy as np
+
+from frame import new_frame, pack_colors
+from sync import FrameScheduler, SharedClock, from_timecode, to_timecode
+
+DDP_PORT = 4048
+DDP_HEADER = struct.Struct('>BBBBIH')  # flags, sequence, type, id, offset, length
+DDP_TIMECODE = struct.Struct('>I')     # follows the header when DDP_TIMECODE_FLAG is set
+DDP_VERSION = 0x40
+DDP_TIMECODE_FLAG = 0x10
+DDP_PUSH = 0x01
+DDP_TYPE_RGB8 = 0x0B    # RGB, 8 bits per channel
+DDP_ID_DISPLAY = 1
+MAX_PAYLOAD = 1440      # 480 RGB pixels, fits a standard Ethernet MTU
+
+def next_sequence(sequence):
+    """DDP sequence numbers run 1..15 (0 means unused)."""
+    return sequence % 15 + 1
+
+def pack_frame(frame, sequence, dest=DDP_ID_DISPLAY, timecode=None):
+    """Split an (N, 3) uint8 frame into DDP packets, push flag on the last.
+
+    Packets are numbered from the sequence after the given one; returns
+    (packets, last sequence used). A timecode (see sync.to_timecode) is
+    sent with every packet.
+    """
+    data = np.ascontiguousarray(frame, dtype=np.uint8).tobytes()
+    packets = []
+    for offset in range(0, max(len(data), 1), MAX_PAYLOAD):
+        chunk = data[offset:offset + MAX_PAYLOAD]
+        sequence = next_sequence(sequence)
+        flags = DDP_VERSION
+        if offset + MAX_PAYLOAD >= len(data):
+            flags |= DDP_PUSH
+        if timecode is not None:
+            flags |= DDP_TIMECODE_FLAG
+        header = DDP_HEADER.pack(flags, sequence, DDP_TYPE_RGB8, dest, offset, len(chunk))
+        if timecode is not None:
+            header += DDP_TIMECODE.pack(timecode)
+        packets.append(header + chunk)
+    return packets, sequence
+
+def parse_node(node):
+    """'host', 'host:port' or (host, port) -> (host, port)."""
+    if isinstance(node, str):
+        host, _, port = node.partition(':')
+        return host, int(port) if port else DDP_PORT
+    return node[0], int(node[1])
+
+# === Sender ===
+class DDPStrip:
+    """Adafruit_NeoPixel-style strip that sends each show() to DDP nodes.
+
+    With a latency (seconds), every frame is stamped to be presented that
+    long after it was sent, on the shared clock.
+    """
+
+    def __init__(self, num_leds, nodes, local=None, dest=DDP_ID_DISPLAY,
+                 latency=None, clock=None):
+        self.num_leds = num_leds
+        self.nodes = [parse_node(node) for node in nodes]
+        self.local = local
+        self.dest = dest
+        self.latency = latency
+        self.clock = clock or SharedClock()
+        self.brightness = 255
+
+        self.frame = new_frame(num_leds)
+        self.sequence = 0
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+
+        # Counters
+        self.frames_sent = 0
+        self.packets_sent = 0
+        self.send_errors = 0
+
+    # Adafruit_NeoPixel API
+    def begin(self):
+        if self.local is not None:
+            self.local.begin()
+
+    def numPixels(self):
+        return self.num_leds
+
+    def setBrightness(self, brightness):
+        self.brightness = brightness
+        if self.local is not None:
+            self.local.setBrightness(brightness)
+
+    def setPixelColor(self, i, color):
+        self.frame[i] = ((color >> 16) & 0xFF, (color >> 8) & 0xFF, color & 0xFF)
+        if self.local is not None:
+            self.local.setPixelColor(i, color)
+
+    def show(self):
+        if self.brightness == 255:
+            self.send(self.frame)
+        else:
+            self.send((self.frame.astype(np.uint16) * self.brightness >> 8).astype(np.uint8))
+        if self.local is not None:
+            self.local.show()
+
+    def send(self, frame, pts=None):
+        """Send one frame to every node without blocking.
+
+        pts is the shared-clock time to present it at; by default now +
+        latency, or immediately on arrival without a latency.
+        """
+        if pts is None and self.latency is not None:
+            pts = self.clock.now() + self.latency
+        timecode = None if pts is None else to_timecode(pts)
+        packets, self.sequence = pack_frame(frame, self.sequence, self.dest, timecode)
+        for node in self.nodes:
+            for packet in packets:
+                try:
+                    self.sock.sendto(packet, node)
+                    self.packets_sent += 1
+                except OSError:
+                    # Full send buffer or unreachable node: drop, never stall
+                    self.send_errors += 1
+        self.frames_sent += 1
+
+    def stats(self):
+        return {'net_frames': self.frames_sent, 'net_packets': self.packets_sent,
+                'net_errors': self.send_errors}
+
+    def close(self):
+        self.sock.close()
+
+# === Receiver ===
+class DDPReceiver:
+    """Apply DDP frames to a local strip (or just keep them, strip=None).
+
+    Timestamped frames go to scheduler (a sync.FrameScheduler presenting
+    with self.show) when one is set, and are shown on arrival otherwise.
+    """
+
+    def __init__(self, strip, num_leds=None, host='0.0.0.0', port=DDP_PORT,
+                 scheduler=None):
+        self.strip = strip
+        self.scheduler = scheduler
+        self.num_leds = num_leds if num_leds is not None else strip.numPixels()
+        self.frame = new_frame(self.num_leds)
+        self._flat = self.frame.reshape(-1)
+        self._shown = new_frame(self.num_leds)
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((host, port))
+        self.sock.settimeout(0.5)
+        self.port = self.sock.getsockname()[1]
+        self._stop = threading.Event()
+
+        # Counters
+        self.sequence = None
+        self.packets = 0
+        self.frames = 0
+        self.dropped_packets = 0
+        self.bad_packets = 0
+
+    def handle(self, packet):
+        """Apply one packet; returns True if it completed a frame."""
+        if len(packet) < DDP_HEADER.size:
+            self.bad_packets += 1
+            return False
+        flags, sequence, _, _, offset, length = DDP_HEADER.unpack_from(packet)
+        if flags & 0xC0 != DDP_VERSION:
+            self.bad_packets += 1
+            return False
+        self.packets += 1
+        start = DDP_HEADER.size
+        timecode = None
+        if flags & DDP_TIMECODE_FLAG:
+            timecode, = DDP_TIMECODE.unpack_from(packet, start)
+            start += DDP_TIMECODE.size
+
+        sequence &= 0x0F
+        if sequence:
+            if self.sequence is not None:
+                self.dropped_packets += (sequence - next_sequence(self.sequence)) % 15
+            self.sequence = sequence
+
+        data = packet[start:start + length]
+        end = min(offset + len(data), len(self._flat))
+        if end > offset:
+            self._flat[offset:end] = np.frombuffer(data, dtype=np.uint8, count=end - offset)
+
+        if flags & DDP_PUSH:
+            if timecode is not None and self.scheduler is not None:
+                clock = self.scheduler.clock
+                self.scheduler.submit(self.frame, from_timecode(timecode, clock.now()))
+            else:
+                self.show()
+            return True
+        return False
+
+    def show(self, frame=None):
+        """Write frame (default: the last one received) to the strip."""
+        if frame is None:
+            frame = self.frame
+        self.frames += 1
+        if self.strip is None:
+            return
+        changed = np.flatnonzero(np.any(frame != self._shown, axis=1))
+        if len(changed):
+            colors = pack_colors(frame[changed]).tolist()
+            for i, color in zip(changed.tolist(), colors):
+                self.strip.setPixelColor(i, color)
+            self.strip.show()
+            self._shown[:] = frame
+
+    def serve_forever(self):
+        size = DDP_HEADER.size + DDP_TIMECODE.size + MAX_PAYLOAD
+        while not self._stop.is_set():
+            try:
+                packet = self.sock.recv(size)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            self.handle(packet)
+
+    def run_in_thread(self):
+        thread = threading.Thread(target=self.serve_forever, name='ddp-receiver', daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        return {'packets': self.packets, 'frames': self.frames,
+                'dropped_packets': self.dropped_packets, 'bad_packets': self.bad_packets}
+
+    def close(self):
+        self.stop()
+        self.sock.close()
+
+# === Node / loopback demo ===
+LED_COUNT = 32
+LED_PIN = 18
+LED_FREQ_HZ = 800000
+LED_DMA = 10
+LED_BRIGHTNESS = 50
+LED_INVERT = False
+
+def loopback(frames=200, num_leds=LED_COUNT):
+    """Send moving test frames to a receiver on 127.0.0.1 and compare."""
+    receiver = DDPReceiver(None, num_leds, host='127.0.0.1', port=0)
+    receiver.run_in_thread()
+    sender = DDPStrip(num_leds, [('127.0.0.1', receiver.port)])
+    frame = new_frame(num_leds)
+    mismatches = 0
+    for i in range(frames):
+        frame[:] = 0
+        frame[i % num_leds] = (255, i % 256, 0)
+        sender.send(frame)
+        time.sleep(0.002)
+        if receiver.frames and not np.array_equal(receiver.frame, frame):
+            mismatches += 1
+    time.sleep(0.1)
+    receiver.close()
+    sender.close()
+    print(f"sent {sender.frames_sent} frames / {sender.packets_sent} packets, "
+          f"received {receiver.stats()}, {mismatches} late frames")
+
+def main():
+    if sys.argv[1:] == ['loopback']:
+        loopback()
+        return
+
+    from rpi_ws281x import Adafruit_NeoPixel
+    from frame import clear
+
+    strip = Adafruit_NeoPixel(LED_COUNT, LED_PIN, LED_FREQ_HZ,
+                              LED_DMA, LED_INVERT, LED_BRIGHTNESS)
+    strip.begin()
+    receiver = DDPReceiver(strip)
+    receiver.scheduler = FrameScheduler(receiver.show).start()
+    print(f"DDP node listening on UDP {receiver.port}. Ctrl+C to stop.")
+    receiver.run_in_thread()
+    try:
+        while True:
+            time.sleep(60)
+            stats = dict(receiver.stats(), **receiver.scheduler.stats())
+            print(" ".join(f"{k}={v}" for k, v in stats.items()), flush=True)
+    except KeyboardInterrupt:
+        print("\nShutting down...")
+    finally:
+        receiver.close()
+        receiver.scheduler.stop()
+        clear(strip)
+
+if __name__ == "__main__":
+    main()
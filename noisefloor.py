@@ -0,0 +1,141 @@
+"""
+Noise-floor calibration and spectral subtraction.
+
+Every visualizer normalizes each block to its own peak, so in an idle
+room HVAC hum or mic hiss is scaled up to full brightness. The fixed
+fudge factors (ledfft.py's intensity / 5, INTENSITY_SCALE,
+f4f.py's MIN_DB_THRESHOLD) have to be re-picked for every room.
+
+Instead, record a few seconds of the room with nothing playing: the
+per-bin mean and standard deviation of the magnitude spectrum make up
+a NoiseFloor, saved with the analysis mode it was learned in (the
+decimated path has different bins from fft and sparse). While running, subtract() removes
+mean + k * std from each bin in place (clamping at zero) and reports
+whether anything meaningful is left, so quiet blocks can fade to dark
+instead of rendering amplified noise.
+
+The profile is per bin, so each visualizer learns its own with its own
+analyzer (see profile_path()). Run directly to calibrate one, spectled
+by default:
+
+    python noisefloor.py [NAME] [seconds] [path]
+"""
+
+import importlib
+import sys
+
+import numpy as np
+
+NOISE_PROFILE = 'noise_profile.npy'
+
+def profile_path(name):
+    """Where a visualizer's profile is saved; spectled.py's predates the rest."""
+    return NOISE_PROFILE if name == 'spectled' else f"noise_profile_{name}.npy"
+
+class NoiseLearner:
+    """Running per-bin mean and variance of magnitude spectra."""
+
+    def __init__(self, n_bins):
+        self.n_bins = n_bins
+        self.count = 0
+        self._sum = np.zeros(n_bins)
+        self._sum_sq = np.zeros(n_bins)
+
+    def add(self, magnitude):
+        self._sum += magnitude
+        self._sum_sq += np.square(magnitude)
+        self.count += 1
+
+    def result(self, **kwargs):
+        """The learned NoiseFloor; kwargs are passed to NoiseFloor."""
+        if not self.count:
+            raise ValueError("no blocks recorded")
+        mean = self._sum / self.count
+        var = np.maximum(self._sum_sq / self.count - np.square(mean), 0.0)
+        return NoiseFloor(mean, np.sqrt(var), **kwargs)
+
+class NoiseFloor:
+    """A per-bin noise profile to subtract from magnitude spectra.
+
+    k sets how many standard deviations above the mean are removed. A
+    block is quiet when the magnitude left after subtraction sums to
+    less than gate times the mean noise magnitude. mode is the Analyzer
+    mode the profile was learned in, None if unknown.
+    """
+
+    def __init__(self, mean, std, k=3.0, gate=0.05, mode=None):
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.std = np.asarray(std, dtype=np.float64)
+        self.n_bins = len(self.mean)
+        self.mode = mode
+        self.k = k
+        self.gate = gate
+        self.rebuild()
+
+    def rebuild(self):
+        """Recompute the subtracted floor; call after changing k or gate."""
+        self.floor = self.mean + self.k * self.std
+        self.gate_level = self.gate * float(np.sum(self.mean))
+
+    def subtract(self, magnitude):
+        """Remove the floor from magnitude in place; returns False if quiet."""
+        if len(magnitude) != self.n_bins:
+            raise ValueError(f"spectrum has {len(magnitude)} bins, profile has {self.n_bins}")
+        np.subtract(magnitude, self.floor, out=magnitude)
+        np.maximum(magnitude, 0.0, out=magnitude)
+        return float(np.sum(magnitude)) >= self.gate_level
+
+    def save(self, path=NOISE_PROFILE):
+        # A file object keeps np.savez from appending .npz to the name
+        with open(path, 'wb') as f:
+            np.savez(f, mean=self.mean, std=self.std, mode=self.mode or '')
+
+    @classmethod
+    def load(cls, path=NOISE_PROFILE, **kwargs):
+        data = np.load(path)
+        if isinstance(data, np.ndarray):
+            # Profiles saved before the mode was recorded: [mean, std]
+            mean, std = data
+            return cls(mean, std, **kwargs)
+        with data:
+            kwargs.setdefault('mode', str(data['mode']) or None)
+            return cls(data['mean'], data['std'], **kwargs)
+
+def calibrate(analyze, n_bins, seconds, samplerate, blocksize, device=0, **kwargs):
+    """Learn a NoiseFloor from seconds of live input.
+
+    analyze(block) must be the same block -> magnitude function the
+    visualizer uses, so the profile lines up bin for bin.
+    """
+    import sounddevice as sd
+
+    learner = NoiseLearner(n_bins)
+    blocks = max(1, int(seconds * samplerate / blocksize))
+    with sd.InputStream(device=device,
+                        channels=1,
+                        samplerate=samplerate,
+                        blocksize=blocksize) as stream:
+        for _ in range(blocks):
+            indata, _ = stream.read(blocksize)
+            learner.add(analyze(indata[:, 0]))
+    return learner.result(**kwargs)
+
+# === Calibration for a visualizer ===
+def main():
+    name = sys.argv[1] if len(sys.argv) > 1 else 'spectled'
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 10.0
+    path = sys.argv[3] if len(sys.argv) > 3 else profile_path(name)
+    module = importlib.import_module(name)
+    analyzer = module.analyzer
+    analyzer.noise_floor = None     # Learn the raw spectrum, not what's left of it
+    print(f"Recording {seconds:.0f} s of room noise for {name}. "
+          f"Keep the room as it will be between songs...")
+    floor = calibrate(analyzer, analyzer.n_bins, seconds, module.samplerate, module.blocksize,
+                      mode=analyzer.mode)
+    floor.save(path)
+    print(f"Saved {floor.n_bins}-bin {floor.mode} noise profile to {path} "
+          f"(mean level {np.mean(floor.mean):.4f}, peak bin "
+          f"{analyzer.freqs[np.argmax(floor.mean)]:.0f} Hz).")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Batch offline renderer: a WAV file in, the frames a visualizer would
+have shown out, without hardware or real-time playback.
+
+The live scripts analyze one block per callback. Here the whole track
+is cut into the same back-to-back blocks and analyzed as a 2-D STFT
+matrix in one FFT call, and the band means of all blocks come from one
+prefix-sum table (see bands.py). Top-k selection and coloring are
+batched too, and the envelopes (peak-hold and decay), which are
+sequential in time, run as scans over the (blocks, leds) matrix (see
+envelope.py). The frames
+match what the live visualizer renders block for block. A four-minute
+track takes well under a second.
+
+Output is an (n_blocks, num_leds, 3) uint8 .npy and, optionally, a PNG
+image strip (time left to right, one row per LED) and an animated GIF
+if Pillow is installed.
+
+    python offline.py song.wav spectled [frames.npy] [preview.png|.gif]
+
+Effects: spectled, random_lights, mc4. Live-only stages (noise floor,
+idle gate, dithering) are not applied.
+"""
+
+import struct
+import sys
+import time
+import zlib
+
+import numpy as np
+import scipy.fftpack as fftpack
+from scipy.io import wavfile
+
+from analysis import Analyzer
+from effects import PeakTrailEffect, SpectrumEffect, TopBandsEffect
+from envelope import spectrum_frames, top_bands_frames
+
+# === Input ===
+def read_wav(path):
+    """Mono float32 samples in [-1, 1) and the sample rate."""
+    samplerate, data = wavfile.read(path)
+    if data.dtype.kind == 'i':
+        data = data / float(np.iinfo(data.dtype).max + 1)
+    elif data.dtype.kind == 'u':
+        data = (data - 128.0) / 128.0
+    if data.ndim > 1:
+        # Live input is channel 0 of the mic, but a mixdown is fairer for files
+        data = data.mean(axis=1)
+    return data.astype(np.float32), samplerate
+
+def stft_magnitude(signal, blocksize, window=True, n_bins=None):
+    """Magnitudes of back-to-back blocks, shape (n_blocks, n_bins).
+
+    Same as np.abs(fftpack.fft(block * hanning)[:n_bins]) per block
+    (n_bins defaults to blocksize // 2), for the whole signal at once.
+    """
+    n_blocks = len(signal) // blocksize
+    blocks = signal[:n_blocks * blocksize].reshape(n_blocks, blocksize)
+    if window:
+        blocks = blocks * np.hanning(blocksize)
+    spectrum = fftpack.fft(blocks, axis=1)
+    return np.abs(spectrum[:, :n_bins or blocksize // 2])
+
+def normalize_blocks(magnitudes):
+    """Zero DC and scale each block to its peak in place, like render().
+
+    Returns the mask of silent blocks (peak 0), which are left at zero.
+    """
+    magnitudes[:, 0] = 0
+    peaks = magnitudes.max(axis=1)
+    silent = peaks == 0
+    magnitudes[~silent] /= peaks[~silent, None]
+    return silent
+
+# === Renderers (one per live script) ===
+def render_spectled(signal, samplerate, num_leds=32, block_duration=0.05):
+    blocksize = int(samplerate * block_duration)
+    magnitudes = stft_magnitude(signal, blocksize)
+    silent = normalize_blocks(magnitudes)
+    freqs = fftpack.fftfreq(blocksize, 1.0 / samplerate)[:blocksize // 2]
+    effect = SpectrumEffect(num_leds, freqs)
+    return spectrum_frames(effect, effect.bands.batch_means(magnitudes), silent), blocksize
+
+def render_random_lights(signal, samplerate, num_leds=32, block_duration=0.025,
+                         max_freq=1000, top_k=6, fade_decay=0.25):
+    blocksize = int(samplerate * block_duration)
+    # Same bins as the live Analyzer in fft mode
+    analyzer = Analyzer(blocksize, samplerate, max_freq, mode='fft')
+    magnitudes = stft_magnitude(signal, blocksize, n_bins=analyzer.n_bins)
+    silent = normalize_blocks(magnitudes)
+    freq_step = max_freq / num_leds
+    effect = TopBandsEffect(num_leds, analyzer.freqs,
+                            [i * freq_step for i in range(num_leds + 1)],
+                            top_k=top_k, fade_decay=fade_decay)
+    return top_bands_frames(effect, effect.bands.batch_means(magnitudes), silent), blocksize
+
+def render_mc4(signal, samplerate, num_leds=32, block_duration=0.05):
+    blocksize = int(samplerate * block_duration)
+    magnitudes = stft_magnitude(signal, blocksize)
+    freqs = fftpack.fftfreq(blocksize, 1.0 / samplerate)[:blocksize // 2]
+    effect = PeakTrailEffect(num_leds, freqs)
+    # The trail is O(top_k) per block after the shared FFT, so reuse render()
+    frames = np.zeros((len(magnitudes), num_leds, 3), dtype=np.uint8)
+    frame = effect.frame
+    for t, magnitude in enumerate(magnitudes):
+        rendered = effect.render(magnitude)
+        if rendered is not None:
+            frame = rendered
+        frames[t] = frame
+    return frames, blocksize
+
+RENDERERS = {
+    'spectled': render_spectled,
+    'random_lights': render_random_lights,
+    'mc4': render_mc4,
+}
+
+# === Output ===
+def write_png(path, rgb):
+    """Write an (H, W, 3) uint8 image as PNG with only the standard library."""
+    height, width, _ = rgb.shape
+    raw = np.zeros((height, width * 3 + 1), dtype=np.uint8)  # filter byte 0 per row
+    raw[:, 1:] = rgb.reshape(height, width * 3)
+
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack('>I', len(data)) + body + struct.pack('>I', zlib.crc32(body))
+
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+        f.write(chunk(b'IDAT', zlib.compress(raw.tobytes(), 6)))
+        f.write(chunk(b'IEND', b''))
+
+def preview_strip(frames, led_px=4, block_px=1):
+    """Time runs left to right, LED 0 at the top."""
+    image = frames.transpose(1, 0, 2)
+    return np.repeat(np.repeat(image, led_px, axis=0), block_px, axis=1)
+
+def write_gif(path, frames, blocksize, samplerate, led_px=16):
+    from PIL import Image
+
+    images = [Image.fromarray(np.repeat(np.repeat(frame[None], led_px, axis=0), led_px, axis=1))
+              for frame in frames]
+    duration = int(round(1000 * blocksize / samplerate))
+    images[0].save(path, save_all=True, append_images=images[1:], duration=duration, loop=0)
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[2] not in RENDERERS:
+        print(__doc__)
+        sys.exit(1)
+    wav, name = sys.argv[1], sys.argv[2]
+    out = sys.argv[3] if len(sys.argv) > 3 else f"{name}_frames.npy"
+    preview = sys.argv[4] if len(sys.argv) > 4 else None
+
+    signal, samplerate = read_wav(wav)
+    start = time.perf_counter()
+    frames, blocksize = RENDERERS[name](signal, samplerate)
+    elapsed = time.perf_counter() - start
+    np.save(out, frames)
+    print(f"{name}: {len(frames)} frames ({len(signal) / samplerate:.1f} s of audio) "
+          f"in {elapsed:.2f} s -> {out}")
+
+    if preview:
+        if preview.lower().endswith('.gif'):
+            write_gif(preview, frames, blocksize, samplerate)
+        else:
+            write_png(preview, preview_strip(frames))
+        print(f"Preview -> {preview}")
+
+if __name__ == "__main__":
+    main()
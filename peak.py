@@ -0,0 +1,143 @@
+"""
+Dominant-frequency estimation for the single-LED visualizers.
+
+The FFT scripts used to take freqs[np.argmax(magnitude)] over a freshly
+masked copy of the spectrum, which quantizes the result to whole bins
+(40 Hz at 25 ms blocks) and makes the lit LED hop between neighbours.
+This module searches a precomputed bin range in place, refines the peak
+with quadratic interpolation and smooths it over time.
+"""
+
+import numpy as np
+
+# === Bin range helpers ===
+def bin_range(n_fft, samplerate, f_min=0.0, f_max=None):
+    """Return the [lo, hi) bin slice covering f_min..f_max.
+
+    Bins are those of the positive half of an n_fft-point FFT. f_max of
+    None means "up to Nyquist".
+    """
+    n_bins = n_fft // 2
+    lo = int(np.ceil(f_min * n_fft / samplerate))
+    if f_max is None:
+        hi = n_bins
+    else:
+        hi = int(np.floor(f_max * n_fft / samplerate)) + 1
+    lo = min(max(lo, 0), n_bins)
+    hi = min(max(hi, lo), n_bins)
+    return lo, hi
+
+# === Sub-bin interpolation ===
+def interpolate_peak(magnitude, idx, log=True):
+    """Fit a parabola through a peak bin and its neighbours.
+
+    Returns (offset, value) where offset is in bins (-0.5..0.5) relative
+    to idx. With log=True the fit is done on log-magnitude, which is close
+    to exact for the Hanning-windowed blocks the visualizers use.
+    """
+    if idx <= 0 or idx >= len(magnitude) - 1:
+        return 0.0, magnitude[idx]
+
+    a, b, c = magnitude[idx - 1], magnitude[idx], magnitude[idx + 1]
+    if log:
+        if a <= 0 or b <= 0 or c <= 0:
+            return 0.0, b
+        a, b, c = np.log(a), np.log(b), np.log(c)
+
+    denom = a - 2 * b + c
+    if denom >= 0:
+        # Not a local maximum (flat or a valley), nothing to refine
+        return 0.0, magnitude[idx]
+    offset = 0.5 * (a - c) / denom
+    value = b - 0.25 * (a - c) * offset
+    if log:
+        value = np.exp(value)
+    return offset, value
+
+def refine_peaks(magnitude, indices, log=True):
+    """Vectorized interpolate_peak for several peak bins at once.
+
+    Returns an array of fractional bin positions, one per index.
+    """
+    indices = np.asarray(indices)
+    inner = (indices > 0) & (indices < len(magnitude) - 1)
+    idx = np.where(inner, indices, 1)
+
+    a = magnitude[idx - 1]
+    b = magnitude[idx]
+    c = magnitude[idx + 1]
+    if log:
+        valid = inner & (a > 0) & (b > 0) & (c > 0)
+        with np.errstate(divide='ignore'):
+            a, b, c = np.log(a), np.log(b), np.log(c)
+    else:
+        valid = inner
+
+    denom = a - 2 * b + c
+    valid &= denom < 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        offset = np.where(valid, 0.5 * (a - c) / denom, 0.0)
+    return indices + offset
+
+def find_peak(magnitude, lo, hi, log=True):
+    """Locate the strongest bin in magnitude[lo:hi] with sub-bin accuracy.
+
+    Returns (fractional_bin, value), or None if the range is empty. The
+    slice is a view, so no copy of the spectrum is made.
+    """
+    if hi <= lo:
+        return None
+    idx = lo + int(np.argmax(magnitude[lo:hi]))
+    offset, value = interpolate_peak(magnitude, idx, log)
+    return idx + offset, value
+
+# === Temporal tracking ===
+class PeakTracker:
+    """Track the dominant frequency of successive spectra.
+
+    Frequencies are smoothed in the log (pitch) domain so the glide speed
+    is the same across the strip. A jump larger than jump_octaves is taken
+    as a new note and snapped to immediately instead of gliding.
+    """
+
+    def __init__(self, n_fft, samplerate, f_min=0.0, f_max=None,
+                 smoothing=0.5, jump_octaves=0.5, log=True):
+        self.lo, self.hi = bin_range(n_fft, samplerate, f_min, f_max)
+        self.bin_hz = samplerate / n_fft
+        self.smoothing = smoothing
+        self.jump_octaves = jump_octaves
+        self.log = log
+        self.pitch = None       # log2 of the smoothed frequency
+        self.intensity = 0.0
+
+    def reset(self):
+        self.pitch = None
+        self.intensity = 0.0
+
+    def update(self, magnitude):
+        """Feed one magnitude spectrum.
+
+        Returns (freq_hz, intensity) where intensity is the peak value
+        relative to the spectrum maximum, or None for a silent block.
+        """
+        peak_all = np.max(magnitude)
+        if peak_all == 0:
+            return None
+        found = find_peak(magnitude, self.lo, self.hi, self.log)
+        if found is None:
+            return None
+
+        bin_pos, value = found
+        freq = max(bin_pos, 0.5) * self.bin_hz
+        intensity = min(value / peak_all, 1.0)
+
+        pitch = np.log2(freq)
+        if self.pitch is None or abs(pitch - self.pitch) > self.jump_octaves:
+            self.pitch = pitch
+            self.intensity = intensity
+        else:
+            a = self.smoothing
+            self.pitch = a * self.pitch + (1 - a) * pitch
+            self.intensity = a * self.intensity + (1 - a) * intensity
+
+        return 2 ** self.pitch, self.intensity
@@ -0,0 +1,87 @@
+"""
+Per-frame current budget for battery-powered rigs.
+
+LED_BRIGHTNESS, MAX_BRIGHTNESS and the per-channel min() clamps bound
+single pixels, not the strip: with many LEDs lit at once the draw can
+still brown out a battery pack. PowerLimiter estimates the current of
+each outgoing frame with one array reduction and scales the whole frame
+down uniformly when it would exceed the budget, so colors and relative
+levels are kept.
+
+The model is the usual WS2812 one: each channel draws up to
+ma_per_channel at full duty, linear in its value, plus a constant idle
+current per LED for the controller.
+"""
+
+import numpy as np
+
+class PowerLimiter:
+    """Scale frames to stay within budget_ma.
+
+    gain is any brightness scaling applied after this stage (e.g. a
+    strip's hardware setBrightness() value / 255), so the estimate refers
+    to what is actually driven onto the LEDs. A budget_ma of None only
+    estimates (the stats and gauges still report the draw) and never
+    scales; mains-powered rigs leave it off.
+    """
+
+    def __init__(self, num_leds, budget_ma, ma_per_channel=20.0, idle_ma=1.0, gain=1.0):
+        self.num_leds = num_leds
+        self.budget_ma = budget_ma
+        self.ma_per_channel = ma_per_channel
+        self.idle_ma = idle_ma
+        self.gain = gain
+
+        # Metrics
+        self.estimated_ma = 0.0   # before limiting, last frame
+        self.limited_ma = 0.0     # after limiting, last frame
+        self.peak_ma = 0.0        # highest estimate seen
+        self.scale = 1.0          # last scale factor applied
+        self.frames = 0
+        self.limited_frames = 0
+        self.metrics = None
+
+    def export(self, metrics):
+        """Publish estimated/limited current as gauges in a Metrics registry."""
+        metrics.gauge('power_estimated_ma', 'Estimated strip current before limiting (mA)')
+        metrics.gauge('power_limited_ma', 'Estimated strip current after limiting (mA)')
+        metrics.counter('power_limited_frames', 'Frames scaled down to the power budget')
+        self.metrics = metrics
+
+    def estimate(self, frame):
+        """Estimated current in mA for a (N, 3) frame of 0-255 values."""
+        duty = float(np.sum(frame, dtype=np.float64)) * self.gain / 255.0
+        return self.idle_ma * self.num_leds + duty * self.ma_per_channel
+
+    def limit(self, frame):
+        """Scale frame in place if it exceeds the budget; returns frame."""
+        idle = self.idle_ma * self.num_leds
+        estimated = self.estimate(frame)
+        self.frames += 1
+        self.estimated_ma = estimated
+        self.peak_ma = max(self.peak_ma, estimated)
+
+        if self.budget_ma is None or estimated <= self.budget_ma or estimated <= idle:
+            self.scale = 1.0
+            self.limited_ma = estimated
+        else:
+            self.scale = max(self.budget_ma - idle, 0.0) / (estimated - idle)
+            np.multiply(frame, self.scale, out=frame, casting='unsafe')
+            self.limited_ma = idle + (estimated - idle) * self.scale
+            self.limited_frames += 1
+            if self.metrics is not None:
+                self.metrics.inc('power_limited_frames')
+
+        if self.metrics is not None:
+            self.metrics.set('power_estimated_ma', estimated)
+            self.metrics.set('power_limited_ma', self.limited_ma)
+        return frame
+
+    def stats(self):
+        return {
+            'power_estimated_ma': round(self.estimated_ma, 1),
+            'power_limited_ma': round(self.limited_ma, 1),
+            'power_peak_ma': round(self.peak_ma, 1),
+            'power_scale': round(self.scale, 3),
+            'power_limited_frames': self.limited_frames,
+        }
@@ -0,0 +1,179 @@
+"""
+Quality-of-service control: degrade gracefully when blocks overrun.
+
+When process(block) takes longer than a block lasts, the runtime falls
+further behind, dropping blocks, until something gives, and under
+systemd (Restart=always, RestartSec=10) an exception means ten seconds
+of darkness. QualityController wraps a visualizer's process(block) like
+IdleGate does, times every call against the block period and walks a
+ladder of cheaper modes:
+
+  level 0   full quality
+  level n   the first n steps applied, e.g. fewer bands, a smaller
+            FFT, no top-k sort, and last (built in) half the render rate
+
+The load is the time a block costs over the time available for it:
+process() plus whatever output ran since the previous block, since on
+long strips show() or the dither refresh often costs more than the
+analysis. Output only counts if it is wrapped with timed(). It steps
+down when the smoothed load stays above high, and back up when it stays
+below low. Each transition waits settle blocks, and stepping up waits
+longer after every relapse so a rig on the edge doesn't flap. Transitions are logged, and an
+exception in process() is logged and counted and the block skipped,
+instead of taking the service down.
+"""
+
+import threading
+import time
+from collections import namedtuple
+
+from metrics import RateLimitedPrinter
+
+# apply() and revert() run between blocks on the processing thread
+Step = namedtuple('Step', 'name apply revert')
+
+def fewer_bands(effect, step=2):
+    """One band mean shared by every step LEDs (see BandEngine.means)."""
+    def apply():
+        effect.band_step = step
+
+    def revert():
+        effect.band_step = 1
+    return Step(f"1/{step} bands", apply, revert)
+
+def smaller_fft(analyzer, effect, factor=2):
+    """Analyze only the newest 1/factor of each block, with coarser bins."""
+    full = analyzer.blocksize
+
+    def resize(blocksize):
+        analyzer.set_blocksize(blocksize)
+        effect.freqs = analyzer.freqs
+        effect.rebuild_bands()
+    return Step(f"1/{factor} FFT", lambda: resize(full // factor), lambda: resize(full))
+
+def threshold_bands(effect, fraction=0.5):
+    """TopBandsEffect holds bands near the max instead of sorting the top k."""
+    def apply():
+        effect.top_threshold = fraction
+
+    def revert():
+        effect.top_threshold = None
+    return Step("no top-k sort", apply, revert)
+
+class QualityController:
+    """Wrap process(block) -> frame and trade detail for time under load."""
+
+    def __init__(self, process, period, steps=(), high=0.8, low=0.4, settle=25,
+                 max_settle=800, alpha=0.2, half_rate=True, clock=time.perf_counter,
+                 log=print):
+        if low >= high:
+            raise ValueError("low must be below high")
+        self.process = process
+        self.period = period
+        self.steps = list(steps)
+        if half_rate:
+            self.steps.append(Step("half rate", lambda: self._set_stride(2),
+                                   lambda: self._set_stride(1)))
+        self.high = high
+        self.low = low
+        self.settle = settle
+        self.max_settle = max_settle
+        self.alpha = alpha
+        self.clock = clock
+        self.log = log
+        self._warn = RateLimitedPrinter(5.0)
+
+        self.level = 0
+        self.load = 0.0
+        self.stride = 1
+        self._count = 0
+        self._since = 0             # blocks since the last transition
+        self._up_settle = settle    # grows when stepping up doesn't hold
+        self._restored = False      # last transition was a step up
+        self._output = 0.0          # seconds of output since the last block
+        self._output_lock = threading.Lock()
+
+        # Stats
+        self.transitions = 0
+        self.errors = 0
+        self.skipped_blocks = 0
+
+    def timed(self, output):
+        """Wrap an output function (show_frame, a dither refresh) so its
+        time counts toward the load; it may run on another thread."""
+        def timed_output(*args, **kwargs):
+            start = self.clock()
+            try:
+                return output(*args, **kwargs)
+            finally:
+                elapsed = self.clock() - start
+                with self._output_lock:
+                    self._output += elapsed
+        return timed_output
+
+    def _set_stride(self, stride):
+        self.stride = stride
+
+    @property
+    def mode(self):
+        return self.steps[self.level - 1].name if self.level else 'full'
+
+    def _transition(self, before):
+        self._since = 0
+        self.transitions += 1
+        self.log(f"QoS: {before} -> {self.mode} (level {self.level}), "
+                 f"load {self.load:.0%} of a {self.period * 1000:.1f} ms block")
+
+    def _degrade(self):
+        before = self.mode
+        if self._restored:
+            # Overloaded again right after stepping up: wait longer next
+            # time, or start afresh if the step up held for a while
+            if self._since < 2 * self._up_settle:
+                self._up_settle = min(2 * self._up_settle, self.max_settle)
+            else:
+                self._up_settle = self.settle
+        self._restored = False
+        self.steps[self.level].apply()
+        self.level += 1
+        self._transition(before)
+
+    def _restore(self):
+        before = self.mode
+        self.level -= 1
+        self.steps[self.level].revert()
+        self._restored = True
+        self._transition(before)
+
+    def __call__(self, block):
+        self._count += 1
+        if self._count % self.stride:
+            self.skipped_blocks += 1
+            return None
+
+        start = self.clock()
+        try:
+            frame = self.process(block)
+        except Exception as e:
+            self.errors += 1
+            self._warn(f"QoS: skipped a block after {type(e).__name__}: {e}")
+            frame = None
+        elapsed = self.clock() - start
+        with self._output_lock:
+            output, self._output = self._output, 0.0
+        load = (elapsed + output) / (self.period * self.stride)
+        self.load += self.alpha * (load - self.load)
+
+        self._since += 1
+        if self.load > self.high and self.level < len(self.steps):
+            if self._since >= self.settle:
+                self._degrade()
+        elif self.load < self.low and self.level > 0:
+            if self._since >= self._up_settle:
+                self._restore()
+        return frame
+
+    def stats(self):
+        return {'qos_mode': self.mode, 'qos_level': self.level,
+                'qos_load': round(self.load, 2), 'qos_transitions': self.transitions,
+                'qos_errors': self.errors, 'qos_skipped_blocks': self.skipped_blocks}
@@ -1,7 +1,12 @@
-import sounddevice as sd
-import numpy as np
-import scipy.fftpack as fftpack
-from rpi_ws281x import Adafruit_NeoPixel, Color
+import os
+from frame import clear, show_frame
+from idle import IdleGate
+from metrics import runtime_metrics
+from noisefloor import NoiseFloor, profile_path
+from power import PowerLimiter
+from qos import QualityController, fewer_bands, smaller_fft, threshold_bands
+from runtime import Runtime
+from scene import Scene, load_script_scene, scene_arg
 
 # === LED Configuration ===
 LED_COUNT = 32
@@ -11,107 +16,86 @@ LED_DMA = 10
 LED_BRIGHTNESS = 100
 LED_INVERT = False
 
-strip = Adafruit_NeoPixel(LED_COUNT, LED_PIN, LED_FREQ_HZ,
-                          LED_DMA, LED_INVERT, LED_BRIGHTNESS)
-strip.begin()
-
 # === Audio Configuration ===
 samplerate = 44100
 block_duration = 0.025
-blocksize = int(samplerate * block_duration)
 
 # === Visualizer Parameters ===
 MAX_FREQ = 1000
 FADE_DECAY = 0.25
 MAX_BRIGHTNESS = 100
-
-# Track brightness levels per LED
-led_levels = [0.0] * LED_COUNT
-
-def wheel(pos):
-    pos = 255 - pos
-    if pos < 85:
-        return (255 - pos * 3, 0, pos * 3)
-    if pos < 170:
-        pos -= 85
-        return (0, pos * 3, 255 - pos * 3)
-    pos -= 170
-    return (pos * 3, 255 - pos * 3, 0)
-
-def update_leds_top5(magnitude, freqs):
-    global led_levels
-
-    num_leds = strip.numPixels()
-    freq_step = MAX_FREQ / num_leds
-
-    magnitude[0] = 0  # Remove DC offset
-
-    if np.max(magnitude) == 0:
-        return
-
-    magnitude = magnitude / np.max(magnitude)
-
-    # Get the center frequency and band index for each LED
-    levels = np.zeros(num_leds)
-    for i in range(num_leds):
-        f_start = i * freq_step
-        f_end = (i + 1) * freq_step
-        band = magnitude[(freqs >= f_start) & (freqs < f_end)]
-        levels[i] = np.mean(band) if len(band) else 0.0
-
-    # Get top 5 LED indices with highest intensity
-    top_indices = np.argpartition(levels, -6)[-6:]
-    top_indices = top_indices[np.argsort(levels[top_indices])[::-1]]  # sorted descending
-
-    # Normalize the top levels for relative brightness
-    max_top_level = levels[top_indices[0]] if levels[top_indices[0]] > 0 else 1
-    relative_levels = {i: levels[i] / max_top_level for i in top_indices}
-
-    # Update LED levels with fading
-    for i in range(num_leds):
-        if i in relative_levels:
-            target_level = relative_levels[i]
-            led_levels[i] = max(led_levels[i], target_level)
-        else:
-            led_levels[i] *= FADE_DECAY
-            if led_levels[i] < 0.01:
-                led_levels[i] = 0.0
-
-        # Set color and brightness
-        base_color = wheel(int(i * 256 / num_leds))
-        r = min(int(base_color[0] * led_levels[i]), MAX_BRIGHTNESS)
-        g = min(int(base_color[1] * led_levels[i]), MAX_BRIGHTNESS)
-        b = min(int(base_color[2] * led_levels[i]), MAX_BRIGHTNESS)
-
-        strip.setPixelColor(i, Color(r, g, b))
-
-    strip.show()
-
-def audio_callback(indata, frames, time, status):
-    audio_data = indata[:, 0] * np.hanning(len(indata))
-    fft_data = fftpack.fft(audio_data)
-    fft_freq = fftpack.fftfreq(len(audio_data), 1.0 / samplerate)
-    magnitude = np.abs(fft_data[:len(fft_data)//2])
-    freqs = fft_freq[:len(fft_freq)//2]
-
-    update_leds_top5(magnitude, freqs)
+POWER_BUDGET_MA = None  # Estimated strip current cap in mA, e.g. 1000 on battery rigs
+METRICS_PORT = 9109     # spectled.py serves on 9108, so both can run at once
+
+# === Scene (see scene.py) ===
+# Top 6 of LED_COUNT equal-width bands from 0 to MAX_FREQ, with fade-out;
+# `python random_lights.py --scene FILE` takes one top_bands layer and
+# the hardware and audio settings from a scene file instead. Only bins
+# up to MAX_FREQ are used: let the analyzer pick FFT vs sparse DFT
+scene_config = load_script_scene(scene_arg() if __name__ == "__main__" else None, {
+    'hardware': {'led_count': LED_COUNT, 'pin': LED_PIN, 'freq_hz': LED_FREQ_HZ,
+                 'dma': LED_DMA, 'brightness': LED_BRIGHTNESS, 'invert': LED_INVERT},
+    'audio': {'samplerate': samplerate, 'block_duration': block_duration, 'device': 0},
+    'analysis': {'f_max': MAX_FREQ},
+    'layers': [{'effect': 'top_bands', 'top_k': 6, 'fade_decay': FADE_DECAY,
+                'max_brightness': MAX_BRIGHTNESS}],
+}, 'top_bands')
+LED_COUNT = scene_config['hardware']['led_count']
+LED_BRIGHTNESS = scene_config['hardware']['brightness']
+samplerate = scene_config['audio']['samplerate']
+block_duration = scene_config['audio']['block_duration']
+
+# Learned per room with `python noisefloor.py random_lights`
+NOISE_PROFILE = profile_path('random_lights')
+noise_floor = NoiseFloor.load(NOISE_PROFILE) if os.path.exists(NOISE_PROFILE) else None
+
+scene = Scene(scene_config, noise_floor=noise_floor)
+strip = scene.make_strip()
+blocksize = scene.blocksize
+analyzer = scene.analyzer
+noise_floor = analyzer.noise_floor     # None if it was learned for another layout
+effect = scene.compositor.layers[0].effect
+
+# The strip still applies LED_BRIGHTNESS after us, so tell the power model
+limiter = PowerLimiter(LED_COUNT, POWER_BUDGET_MA, gain=LED_BRIGHTNESS / 255)
+
+def process_block(block):
+    # The newest analyzer.blocksize samples (all of them unless QoS halved it)
+    magnitude = analyzer(block[len(block) - analyzer.blocksize:])
+    if analyzer.quiet:
+        # Only room noise left: fade out instead of normalizing the hiss
+        return effect.decay()
+    return effect.render(magnitude)
+
+# === Graceful degradation (see qos.py) ===
+qos_steps = [fewer_bands(effect)]
+# The noise profile is per FFT bin, so keep the full FFT with one
+if noise_floor is None:
+    qos_steps.append(smaller_fft(analyzer, effect))
+qos_steps.append(threshold_bands(effect))
+
+# Overruns step down to cheaper modes instead of falling behind
+qos = QualityController(process_block, block_duration, qos_steps)
+
+# Fade out and stop analyzing after 10 s of silence
+gate = IdleGate(qos, hold=10.0, on_wake=effect.reset)
 
 def main():
-    print("Top 5 frequency bands with fade-out effect. Ctrl+C to exit.")
+    print(f"Top {effect.top_k} frequency bands with fade-out effect. Ctrl+C to exit.")
+    print(f"Using {analyzer.describe()}.")
+    metrics = runtime_metrics()
+    limiter.export(metrics)
+    metrics.serve(METRICS_PORT)
+    runtime = Runtime(gate,
+                      qos.timed(lambda frame: show_frame(strip, limiter.limit(frame))),
+                      samplerate, blocksize, device=scene_config['audio']['device'],
+                      stats_sources=[limiter.stats, qos.stats, gate.stats], metrics=metrics)
     try:
-        with sd.InputStream(device=0,
-                            channels=1,
-                            samplerate=samplerate,
-                            blocksize=blocksize,
-                            callback=audio_callback):
-            while True:
-                sd.sleep(10)
+        runtime.run()
     except KeyboardInterrupt:
         print("\nShutting down...")
     finally:
-        for i in range(strip.numPixels()):
-            strip.setPixelColor(i, Color(0, 0, 0))
-        strip.show()
+        clear(strip)
 
 if __name__ == "__main__":
     main()
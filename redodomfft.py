@@ -2,6 +2,7 @@ import sounddevice as sd
 import numpy as np
 import scipy.fftpack as fftpack
 from rpi_ws281x import Adafruit_NeoPixel, Color
+from peak import PeakTracker
 
 # === LED Setup ===
 LED_COUNT = 32
@@ -23,6 +24,9 @@ blocksize = int(samplerate * block_duration)
 # === Frequency Filter Setting ===
 FREQ_MIN = 800  # Hz, frequencies below this value will be ignored
 
+# === Peak tracking: search only bins >= FREQ_MIN, sub-bin accurate ===
+tracker = PeakTracker(blocksize, samplerate, f_min=FREQ_MIN)
+
 # === Color helper ===
 def wheel(pos):
     pos = 255 - pos
@@ -35,28 +39,16 @@ def wheel(pos):
     return Color(pos * 3, 255 - pos * 3, 0)
 
 # === LED update: only dominant frequency ===
-def update_led_dominant(magnitude, freqs):
+def update_led_dominant(magnitude):
     num_leds = strip.numPixels()
     max_freq = 2000  # Hz, top frequency mapped to last LED
 
-    # Normalize the magnitude spectrum (avoid division by zero)
-    if np.max(magnitude) == 0:
+    # Find the interpolated peak at or above FREQ_MIN and its intensity
+    # relative to the whole spectrum (nothing to display if silent)
+    peak = tracker.update(magnitude)
+    if peak is None:
         return
-    magnitude = magnitude / np.max(magnitude)
-
-    # Filter out frequencies below the minimum threshold
-    mask = freqs >= FREQ_MIN
-    if not np.any(mask):
-        return  # nothing to display if all frequencies are below FREQ_MIN
-
-    # Apply the mask to get filtered magnitude and frequency arrays
-    mag_filtered = magnitude[mask]
-    freqs_filtered = freqs[mask]
-
-    # Find the peak frequency within the filtered range and its intensity
-    peak_idx = np.argmax(mag_filtered)
-    peak_freq = freqs_filtered[peak_idx]
-    intensity = mag_filtered[peak_idx]
+    peak_freq, intensity = peak
 
     # Map frequency to LED index
     led_idx = int((peak_freq / max_freq) * num_leds)
@@ -83,11 +75,9 @@ def audio_callback(indata, frames, time, status):
     # Apply a Hanning window to the audio data
     audio_data = indata[:, 0] * np.hanning(len(indata))
     fft_data = fftpack.fft(audio_data)
-    fft_freq = fftpack.fftfreq(len(audio_data), 1.0 / samplerate)
     magnitude = np.abs(fft_data[:len(fft_data)//2])
-    freqs = fft_freq[:len(fft_freq)//2]
 
-    update_led_dominant(magnitude, freqs)
+    update_led_dominant(magnitude)
 
 # === Main Program ===
 def main():
@@ -1,7 +1,9 @@
+import os
 import sounddevice as sd
 import numpy as np
-import scipy.fftpack as fftpack
 from rpi_ws281x import Adafruit_NeoPixel, Color
+from analysis import Analyzer
+from noisefloor import NoiseFloor, profile_path
 
 # === LED Setup ===
 LED_COUNT = 32
@@ -28,6 +30,14 @@ RELATIVE_THRESHOLD = 0.05  # Minimum normalized level to light up
 
 led_levels = [0.0] * LED_COUNT
 
+# Learned per room with `python noisefloor.py reled`
+NOISE_PROFILE = profile_path('reled')
+noise_floor = NoiseFloor.load(NOISE_PROFILE) if os.path.exists(NOISE_PROFILE) else None
+
+# Bands stop at MAX_FREQ and are renormalized per frame, so the analyzer
+# may decimate or skip the upper spectrum entirely
+analyzer = Analyzer(blocksize, samplerate, MAX_FREQ, noise_floor=noise_floor)
+
 def wheel(pos):
     pos = 255 - pos
     if pos < 85:
@@ -38,7 +48,7 @@ def wheel(pos):
     pos -= 170
     return (pos * 3, 255 - pos * 3, 0)
 
-def update_leds_relative(magnitude, freqs):
+def update_leds_relative(magnitude, freqs, quiet=False):
     global led_levels
 
     num_leds = strip.numPixels()
@@ -46,26 +56,30 @@ def update_leds_relative(magnitude, freqs):
 
     magnitude[0] = 0  # Remove DC
 
-    if np.max(magnitude) == 0:
-        return
-
-    magnitude = magnitude / np.max(magnitude)  # Normalize globally
-
-    # Compute average magnitude per LED band
-    levels = np.zeros(num_leds)
-    for i in range(num_leds):
-        f_start = i * freq_step
-        f_end = (i + 1) * freq_step
-        band = magnitude[(freqs >= f_start) & (freqs < f_end)]
-        level = np.mean(band) if len(band) else 0.0
-        levels[i] = level ** 0.5  # Perceptual scaling
-
-    # Normalize per-frame to get relative band strengths
-    max_level = np.max(levels)
-    if max_level == 0:
-        relative_levels = np.zeros_like(levels)
+    if quiet:
+        # Only room noise left: fade every band instead of normalizing the hiss
+        relative_levels = np.zeros(num_leds)
     else:
-        relative_levels = levels / max_level
+        if np.max(magnitude) == 0:
+            return
+
+        magnitude = magnitude / np.max(magnitude)  # Normalize globally
+
+        # Compute average magnitude per LED band
+        levels = np.zeros(num_leds)
+        for i in range(num_leds):
+            f_start = i * freq_step
+            f_end = (i + 1) * freq_step
+            band = magnitude[(freqs >= f_start) & (freqs < f_end)]
+            level = np.mean(band) if len(band) else 0.0
+            levels[i] = level ** 0.5  # Perceptual scaling
+
+        # Normalize per-frame to get relative band strengths
+        max_level = np.max(levels)
+        if max_level == 0:
+            relative_levels = np.zeros_like(levels)
+        else:
+            relative_levels = levels / max_level
 
     for i in range(num_leds):
         level = relative_levels[i]
@@ -89,16 +103,14 @@ def update_leds_relative(magnitude, freqs):
     strip.show()
 
 def audio_callback(indata, frames, time, status):
-    audio_data = indata[:, 0] * np.hanning(len(indata))
-    fft_data = fftpack.fft(audio_data)
-    fft_freq = fftpack.fftfreq(len(audio_data), 1.0 / samplerate)
-    magnitude = np.abs(fft_data[:len(fft_data)//2])
-    freqs = fft_freq[:len(fft_freq)//2]
+    magnitude = analyzer(indata[:, 0])
+    freqs = analyzer.freqs
 
-    update_leds_relative(magnitude, freqs)
+    update_leds_relative(magnitude, freqs, analyzer.quiet)
 
 def main():
     print("LED spectrum using relative intensity & fade. Ctrl+C to exit.")
+    print(f"Using {analyzer.describe()}.")
     try:
         with sd.InputStream(device=0,
                             channels=1,
@@ -0,0 +1,116 @@
+"""
+High-bit-depth output stage with gamma correction and temporal dithering.
+
+Truncating levels to ints per channel and then letting the strip scale
+by LED_BRIGHTNESS leaves a dim strip only a handful of distinct steps,
+so slow fades visibly staircase. DitheredOutput instead takes float
+frames (0-255 units, e.g. an effect's .frame_hdr), applies brightness
+and gamma through a lookup table, and spreads the fractional part over
+time: each refresh adds the previous rounding error back in before
+flooring, so the average over a few refreshes matches the float value.
+
+Dithering only works if refreshes outpace analysis, so the output runs
+on its own thread at refresh_hz and only rewrites pixels that changed.
+The strip's own brightness is pinned at 255; scaling happens here,
+before quantization. An optional PowerLimiter (see power.py) caps the
+estimated current of each refresh after brightness and gamma.
+"""
+
+import threading
+import time
+
+import numpy as np
+
+from frame import pack_colors
+
+LUT_SIZE = 4096  # 12-bit input resolution for the gamma/brightness table
+
+class DitheredOutput:
+    """Float frames in, dithered 8-bit frames out at a fixed refresh rate."""
+
+    def __init__(self, strip, brightness=255, gamma=1.0, refresh_hz=120, limiter=None):
+        self.strip = strip
+        self.limiter = limiter
+        self.num_leds = strip.numPixels()
+        self.refresh_hz = refresh_hz
+        self.brightness = brightness
+        self.gamma = gamma
+
+        self._target = np.zeros((self.num_leds, 3), dtype=np.float32)
+        self._error = np.zeros((self.num_leds, 3), dtype=np.float32)
+        self._shown = np.zeros((self.num_leds, 3), dtype=np.uint8)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.refreshes = 0
+        self.late_refreshes = 0
+
+        strip.setBrightness(255)
+        self.rebuild_lut()
+
+    def rebuild_lut(self):
+        """Recompute the brightness/gamma table; call after changing either."""
+        x = np.linspace(0.0, 1.0, LUT_SIZE)
+        self._lut = (x ** self.gamma * self.brightness).astype(np.float32)
+
+    def set_levels(self, brightness=None, gamma=None):
+        if brightness is not None:
+            self.brightness = brightness
+        if gamma is not None:
+            self.gamma = gamma
+        self.rebuild_lut()
+
+    def submit(self, frame):
+        """Set the frame to display from now on (float, 0-255 per channel)."""
+        with self._lock:
+            np.copyto(self._target, frame, casting='unsafe')
+
+    def refresh(self):
+        """Quantize the current target once and push changed pixels."""
+        with self._lock:
+            idx = (self._target * ((LUT_SIZE - 1) / 255.0)).astype(np.intp)
+        np.clip(idx, 0, LUT_SIZE - 1, out=idx)
+
+        value = self._lut[idx]
+        if self.limiter is not None:
+            self.limiter.limit(value)
+        value += self._error
+        shown = np.floor(value)
+        np.subtract(value, shown, out=self._error)
+        np.clip(shown, 0, 255, out=shown)
+        shown = shown.astype(np.uint8)
+
+        changed = np.flatnonzero(np.any(shown != self._shown, axis=1))
+        if len(changed):
+            colors = pack_colors(shown[changed]).tolist()
+            for i, color in zip(changed.tolist(), colors):
+                self.strip.setPixelColor(i, color)
+            self.strip.show()
+            self._shown = shown
+        self.refreshes += 1
+
+    def _run(self):
+        period = 1.0 / self.refresh_hz
+        deadline = time.monotonic()
+        while not self._stop.is_set():
+            self.refresh()
+            deadline += period
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # Fell behind: count it and don't try to catch up in a burst
+                self.late_refreshes += 1
+                deadline = time.monotonic()
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='dither', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
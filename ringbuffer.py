@@ -0,0 +1,313 @@
+"""
+Ring buffers for handing audio blocks and frames between threads and
+processes without pickling.
+
+SampleRing is a continuous float32 sample stream with one writer and
+several independent readers. Storage is mirrored (every sample is kept
+at i and i + capacity), so any window of up to capacity samples is a
+contiguous, zero-copy view; readers can step overlapping STFT windows
+through it. The writer never blocks: a reader that falls more than
+capacity behind skips ahead and the lost samples are counted as
+overflow for that reader.
+
+SlotRing is a single-producer, single-consumer queue of fixed-shape
+numpy slots living in multiprocessing.shared_memory. The producer copies
+into the next free slot and bumps a counter; the consumer copies out.
+Only a semaphore release/acquire crosses the process boundary per item.
+When the consumer falls behind, new items are dropped and counted rather
+than blocking the producer (which is usually an audio callback).
+"""
+
+import multiprocessing as mp
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Header fields (int64) at the start of the shared block
+WRITE_SEQ = 0
+READ_SEQ = 1
+DROPPED = 2
+HEADER_SIZE = 8 * 8  # keep slot data 64-byte aligned
+
+class SlotRing:
+    """Fixed-capacity SPSC ring of numpy arrays in shared memory."""
+
+    def __init__(self, shape, dtype=np.float32, slots=8):
+        self.shape = tuple(int(n) for n in np.atleast_1d(shape))
+        self.dtype = np.dtype(dtype)
+        self.slots = slots
+        slot_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        self._shm = shared_memory.SharedMemory(create=True, size=HEADER_SIZE + slots * slot_bytes)
+        self._owner = True
+        self._ready = mp.Semaphore(0)
+        self._attach()
+        self.header[:] = 0
+
+    def _attach(self):
+        buf = self._shm.buf
+        self.header = np.ndarray((HEADER_SIZE // 8,), dtype=np.int64, buffer=buf)
+        self.data = np.ndarray((self.slots,) + self.shape, dtype=self.dtype,
+                               buffer=buf, offset=HEADER_SIZE)
+
+    # Only the shared-memory name travels when a ring is sent to a
+    # spawned process; the child maps the same block
+    def __getstate__(self):
+        return {'shape': self.shape, 'dtype': self.dtype.str, 'slots': self.slots,
+                'name': self._shm.name, 'ready': self._ready}
+
+    def __setstate__(self, state):
+        self.shape = state['shape']
+        self.dtype = np.dtype(state['dtype'])
+        self.slots = state['slots']
+        self._ready = state['ready']
+        self._shm = shared_memory.SharedMemory(name=state['name'])
+        self._owner = False
+        self._attach()
+
+    @property
+    def dropped(self):
+        return int(self.header[DROPPED])
+
+    def __len__(self):
+        return int(self.header[WRITE_SEQ] - self.header[READ_SEQ])
+
+    def put(self, item):
+        """Copy item into the next slot; returns False (and counts) if full."""
+        seq = self.header[WRITE_SEQ]
+        if seq - self.header[READ_SEQ] >= self.slots:
+            self.header[DROPPED] += 1
+            return False
+        self.data[seq % self.slots] = item
+        self.header[WRITE_SEQ] = seq + 1
+        self._ready.release()
+        return True
+
+    def get(self, out, timeout=None):
+        """Copy the oldest item into out; returns False on timeout."""
+        if not self._ready.acquire(timeout=timeout):
+            return False
+        seq = self.header[READ_SEQ]
+        out[...] = self.data[seq % self.slots]
+        self.header[READ_SEQ] = seq + 1
+        return True
+
+    def get_latest(self, out, timeout=None):
+        """Copy the newest item into out, discarding older ones.
+
+        Returns the number of items consumed (0 on timeout).
+        """
+        if not self._ready.acquire(timeout=timeout):
+            return 0
+        consumed = 1
+        while self._ready.acquire(block=False):
+            consumed += 1
+        seq = self.header[READ_SEQ] + consumed - 1
+        out[...] = self.data[seq % self.slots]
+        self.header[READ_SEQ] = seq + 1
+        return consumed
+
+    def close(self):
+        self.header = self.data = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+# === Continuous sample ring ===
+# SampleRing header layout (int64): write cursor, then per reader
+# [claimed, cursor, overflow]
+SAMPLE_WRITE = 0
+READER_BASE = 1
+READER_FIELDS = 3
+CLAIMED, CURSOR, OVERFLOW = range(READER_FIELDS)
+
+class SampleRing:
+    """Single-writer, multi-reader float32 sample ring.
+
+    With shared=True the storage lives in multiprocessing.shared_memory
+    and the ring can be handed to child processes; otherwise it is a
+    plain array for use between threads. Cursors count samples since
+    the start of the stream, so they never wrap.
+    """
+
+    def __init__(self, capacity, max_readers=4, shared=True):
+        self.capacity = int(capacity)
+        self.max_readers = max_readers
+        self.shared = shared
+        header_len = READER_BASE + READER_FIELDS * max_readers
+        self._header_bytes = -(-header_len * 8 // 64) * 64
+        size = self._header_bytes + 2 * self.capacity * 4
+        if shared:
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+            self._owner = True
+            buf = self._shm.buf
+            self._lock = mp.Lock()
+            self._ready = [mp.Semaphore(0) for _ in range(max_readers)]
+        else:
+            self._shm = None
+            buf = bytearray(size)
+            self._lock = threading.Lock()
+            self._ready = [threading.Semaphore(0) for _ in range(max_readers)]
+        self._attach(buf)
+        self.header[:] = 0
+
+    def _attach(self, buf):
+        self.header = np.ndarray((READER_BASE + READER_FIELDS * self.max_readers,),
+                                 dtype=np.int64, buffer=buf)
+        self.data = np.ndarray((2 * self.capacity,), dtype=np.float32,
+                               buffer=buf, offset=self._header_bytes)
+
+    def __getstate__(self):
+        if not self.shared:
+            raise TypeError("Only shared=True rings can be sent to other processes")
+        return {'capacity': self.capacity, 'max_readers': self.max_readers,
+                'header_bytes': self._header_bytes, 'name': self._shm.name,
+                'lock': self._lock, 'ready': self._ready}
+
+    def __setstate__(self, state):
+        self.capacity = state['capacity']
+        self.max_readers = state['max_readers']
+        self.shared = True
+        self._header_bytes = state['header_bytes']
+        self._lock = state['lock']
+        self._ready = state['ready']
+        self._shm = shared_memory.SharedMemory(name=state['name'])
+        self._owner = False
+        self._attach(self._shm.buf)
+
+    @property
+    def written(self):
+        return int(self.header[SAMPLE_WRITE])
+
+    def write(self, block):
+        """Append samples (e.g. indata[:, 0]); never blocks."""
+        n = len(block)
+        if n > self.capacity:
+            block = block[-self.capacity:]
+            self.header[SAMPLE_WRITE] += n - self.capacity
+            n = self.capacity
+        cap = self.capacity
+        pos = int(self.header[SAMPLE_WRITE] % cap)
+        first = min(n, cap - pos)
+        data = self.data
+        data[pos:pos + first] = block[:first]
+        data[pos + cap:pos + cap + first] = block[:first]
+        rest = n - first
+        if rest:
+            data[:rest] = block[first:]
+            data[cap:cap + rest] = block[first:]
+        # Publish order matters across processes: samples first, then the
+        # cursor that makes them visible. x86 keeps stores in order, but
+        # ARM (the Pi) may let another core see the new cursor before the
+        # samples (and a 64-bit cursor store isn't single-copy atomic on
+        # 32-bit ARM). The semaphore release below is a full barrier
+        # (sem_post/sem_wait), so cross-process readers must wait() before
+        # trusting the cursor; only same-process threads may just poll.
+        self.header[SAMPLE_WRITE] += n
+
+        for i, ready in enumerate(self._ready):
+            if self.header[READER_BASE + i * READER_FIELDS + CLAIMED]:
+                ready.release()
+
+    def view(self, start, size):
+        """Zero-copy view of samples [start, start + size) of the stream.
+
+        Valid only while the writer has not yet advanced capacity - size
+        samples past start; copy it if it must be kept longer. size may
+        not exceed capacity: older samples are already overwritten.
+        """
+        if not 0 <= size <= self.capacity:
+            raise ValueError(f"size must be in [0, {self.capacity}], got {size}")
+        pos = start % self.capacity
+        return self.data[pos:pos + size]
+
+    def overflow(self):
+        """Samples lost so far, summed over the currently claimed readers."""
+        fields = self.header[READER_BASE:].reshape(self.max_readers, READER_FIELDS)
+        return int(fields[fields[:, CLAIMED] != 0, OVERFLOW].sum())
+
+    def latest(self, size):
+        """View of the newest size samples (zero-padded at stream start)."""
+        return self.view(self.written - size, size)
+
+    def reader(self, from_start=False):
+        """Claim a reader slot; it starts at the newest sample unless from_start."""
+        with self._lock:
+            for i in range(self.max_readers):
+                base = READER_BASE + i * READER_FIELDS
+                if not self.header[base + CLAIMED]:
+                    self.header[base + CURSOR] = 0 if from_start else self.written
+                    self.header[base + OVERFLOW] = 0
+                    self.header[base + CLAIMED] = 1
+                    return SampleReader(self, i)
+        raise RuntimeError(f"All {self.max_readers} reader slots are in use")
+
+    def close(self):
+        self.header = self.data = None
+        if self._shm is not None:
+            self._shm.close()
+            if self._owner:
+                self._shm.unlink()
+
+class SampleReader:
+    """One consumer's cursor into a SampleRing."""
+
+    def __init__(self, ring, index):
+        self.ring = ring
+        self.index = index
+        self._base = READER_BASE + index * READER_FIELDS
+        self._ready = ring._ready[index]
+
+    @property
+    def cursor(self):
+        return int(self.ring.header[self._base + CURSOR])
+
+    @property
+    def overflow(self):
+        """Samples this reader lost by falling more than capacity behind."""
+        return int(self.ring.header[self._base + OVERFLOW])
+
+    def available(self):
+        header = self.ring.header
+        cursor = header[self._base + CURSOR]
+        lag = header[SAMPLE_WRITE] - cursor
+        if lag > self.ring.capacity:
+            # Overrun: skip to the oldest sample still in the ring
+            header[self._base + OVERFLOW] += lag - self.ring.capacity
+            header[self._base + CURSOR] = cursor + lag - self.ring.capacity
+            lag = self.ring.capacity
+        return int(lag)
+
+    def wait(self, size, timeout=None):
+        """Block until size samples are available; False on timeout."""
+        while self.available() < size:
+            if not self._ready.acquire(timeout=timeout):
+                return False
+        # Drain wakeups for data we are about to consume anyway
+        while self._ready.acquire(block=False):
+            pass
+        return True
+
+    def read(self, size):
+        """Zero-copy view of the next size samples, or None if not yet written."""
+        return self.window(size, size)
+
+    def window(self, size, hop):
+        """Zero-copy view of size samples at the cursor, then advance by hop.
+
+        With hop < size successive windows overlap, as for an STFT.
+        Returns None if the window isn't complete yet. size must fit in
+        the ring and hop must be between 1 and size.
+        """
+        if not 0 < size <= self.ring.capacity:
+            raise ValueError(f"size must be in [1, {self.ring.capacity}], got {size}")
+        if not 0 < hop <= size:
+            raise ValueError(f"hop must be in [1, {size}], got {hop}")
+        if self.available() < size:
+            return None
+        cursor = self.cursor
+        self.ring.header[self._base + CURSOR] = cursor + hop
+        return self.ring.view(cursor, size)
+
+    def close(self):
+        self.ring.header[self._base + CLAIMED] = 0
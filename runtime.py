@@ -0,0 +1,173 @@
+"""
+Asyncio runtime for the audio visualizers.
+
+The scripts used to do all their work inside the PortAudio callback
+while the main thread slept in sd.sleep(). Here the callback only copies
+the block and hands it to the event loop, where coordinated tasks do the
+rest:
+
+  analysis - block -> frame via the visualizer's process() function,
+             applying live parameter changes between blocks
+  render   - pushes the newest frame to the strip from a worker thread
+  control  - optional ControlServer for live tuning (see control.py)
+  stats    - periodic one-line summary
+
+Backpressure is explicit: the block queue is bounded and drops the
+oldest block when analysis falls behind, and the renderer only ever
+shows the newest frame, counting the ones it skipped.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+import numpy as np
+import sounddevice as sd
+
+from control import ControlServer
+
+class Runtime:
+    """Drive process(block) -> frame and output(frame) from a live input stream.
+
+    process receives a mono float32 block and returns an (N, 3) frame or
+    None when there is nothing to show. output writes a frame to the
+    strip and may block (it runs off the event loop). stats_sources are
+    callables returning dicts merged into the runtime's own stats; pass a
+    Metrics registry from metrics.runtime_metrics() to also record
+    counters and timing histograms for export.
+    """
+
+    def __init__(self, process, output, samplerate, blocksize, device=0,
+                 params=None, control_port=None, queue_size=4, stats_interval=60.0,
+                 stats_sources=(), metrics=None):
+        self.process = process
+        self.output = output
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.device = device
+        self.params = params
+        self.control_port = control_port
+        self.queue_size = queue_size
+        self.stats_interval = stats_interval
+        self.stats_sources = list(stats_sources)
+        self.metrics = metrics
+
+        self.stats = {
+            'blocks': 0, 'dropped_blocks': 0, 'input_overflows': 0,
+            'silent_blocks': 0, 'frames': 0, 'skipped_frames': 0,
+            'process_ms': 0.0, 'max_process_ms': 0.0, 'output_ms': 0.0,
+        }
+
+    def snapshot(self):
+        stats = dict(self.stats)
+        for source in self.stats_sources:
+            stats.update(source())
+        return stats
+
+    # === Capture (PortAudio thread) ===
+    def _callback(self, indata, frames, time, status):
+        start = perf_counter()
+        if status.input_overflow:
+            self.stats['input_overflows'] += 1
+        # indata is reused by PortAudio after we return, so copy it out
+        block = indata[:, 0].copy()
+        self._loop.call_soon_threadsafe(self._enqueue, block)
+        if self.metrics is not None:
+            self.metrics.record_status(status)
+            self.metrics.observe_ms_since('callback_ms', start)
+
+    def _enqueue(self, block):
+        if self._blocks.full():
+            self._blocks.get_nowait()
+            self.stats['dropped_blocks'] += 1
+            if self.metrics is not None:
+                self.metrics.inc('dropped_blocks')
+        self._blocks.put_nowait(block)
+
+    # === Tasks ===
+    async def _analysis(self):
+        stats = self.stats
+        metrics = self.metrics
+        while True:
+            block = await self._blocks.get()
+            if self.params is not None:
+                self.params.apply()
+
+            start = perf_counter()
+            frame = self.process(block)
+            elapsed = (perf_counter() - start) * 1000
+            stats['blocks'] += 1
+            stats['process_ms'] = elapsed
+            stats['max_process_ms'] = max(stats['max_process_ms'], elapsed)
+            if metrics is not None:
+                metrics.inc('blocks')
+                metrics.observe('analysis_ms', elapsed)
+
+            if frame is None:
+                stats['silent_blocks'] += 1
+                continue
+            if self._frame_ready.is_set():
+                stats['skipped_frames'] += 1
+                if metrics is not None:
+                    metrics.inc('frames_skipped')
+            # The effect reuses its frame buffer; the renderer gets its own
+            self._frame = np.array(frame, copy=True)
+            self._frame_ready.set()
+
+    async def _render(self, executor):
+        while True:
+            await self._frame_ready.wait()
+            self._frame_ready.clear()
+            frame = self._frame
+            start = perf_counter()
+            await self._loop.run_in_executor(executor, self.output, frame)
+            elapsed = (perf_counter() - start) * 1000
+            self.stats['output_ms'] = elapsed
+            self.stats['frames'] += 1
+            if self.metrics is not None:
+                self.metrics.inc('frames_sent')
+                self.metrics.observe('show_ms', elapsed)
+
+    async def _report(self):
+        while True:
+            await asyncio.sleep(self.stats_interval)
+            s = self.stats
+            extra = "".join(f" {k}={v}" for source in self.stats_sources
+                            for k, v in source().items())
+            print(f"blocks={s['blocks']} dropped={s['dropped_blocks']} "
+                  f"overflows={s['input_overflows']} frames={s['frames']} "
+                  f"skipped={s['skipped_frames']} process={s['process_ms']:.2f}ms "
+                  f"(max {s['max_process_ms']:.2f}ms) show={s['output_ms']:.2f}ms"
+                  + extra, flush=True)
+
+    async def main(self):
+        self._loop = asyncio.get_running_loop()
+        self._blocks = asyncio.Queue(maxsize=self.queue_size)
+        self._frame_ready = asyncio.Event()
+        self._frame = None
+
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='render') as executor:
+            tasks = [self._analysis(), self._render(executor)]
+            control = self._control_server = None
+            if self.params is not None and self.control_port is not None:
+                control = ControlServer(self.params, stats=self.snapshot, port=self.control_port)
+                self._control_server = await control.start()
+                print(f"Live tuning on {control.host}:{control.port} (JSON lines).")
+            if self.stats_interval:
+                tasks.append(self._report())
+
+            try:
+                with sd.InputStream(device=self.device,
+                                    channels=1,
+                                    samplerate=self.samplerate,
+                                    blocksize=self.blocksize,
+                                    callback=self._callback):
+                    await asyncio.gather(*tasks)
+            finally:
+                # Free the port on Ctrl+C or an error so a restart can bind it
+                if self._control_server is not None:
+                    await control.stop(self._control_server)
+
+    def run(self):
+        """Run until interrupted (KeyboardInterrupt propagates to the caller)."""
+        asyncio.run(self.main())
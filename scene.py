@@ -0,0 +1,507 @@
+"""
+Declarative scenes: hardware, analysis and an effect chain in one file.
+
+Every script carries its own LED_COUNT / LED_PIN / samplerate /
+MAX_FREQ / FADE_DECAY block, and copies drift (random_lights.py
+printed "Top 5" while lighting 6 bands). A scene file describes the
+same things once, in TOML, JSON or YAML:
+
+    [hardware]
+    led_count = 32
+    brightness = 50
+
+    [analysis]
+    f_max = 2000
+
+    [[layers]]
+    effect = "spectrum"
+    fade_decay = 0.8
+
+    [[layers]]
+    effect = "peak_trail"
+    blend = "add"
+
+load_scene() validates it against DEFAULTS and the effect
+constructors (unknown keys, wrongly typed and out-of-range values are
+errors, with the offending path), and Scene compiles it into an Analyzer plus a
+Compositor of effects, so band tables, palettes and matrix layouts are
+built once, up front.
+
+Scenes hot-reload: a SceneWatcher polls the file and stages the new
+config, and the next process() call applies it between blocks. Only the
+stages whose config changed are rebuilt: a layer whose blend/opacity/
+interval changed is retuned in place, a layer whose effect settings
+changed is rebuilt alone, and an analysis change rebuilds the analyzer
+and the effects that depend on its bins. Hardware and audio changes
+need a restart and are reported as such. A file that fails to parse,
+validate or build is reported and the last good scene keeps running.
+
+    python scene.py scene.toml
+
+spectled.py and random_lights.py build their pipeline through Scene as
+well, from their own constants or from a scene file given with
+--scene FILE. They drive a single layer themselves (live tuning, noise
+profile, QoS), so such a file must have exactly one layer of their
+effect, and it is not hot-reloaded.
+"""
+
+import copy
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+from analysis import MODES, Analyzer
+from compositor import BLEND_MODES, Compositor, Layer
+from effects import CascadeEffect, PeakTrailEffect, SpectrumEffect, TopBandsEffect
+from waterfall import WaterfallEffect
+
+DEFAULTS = {
+    'hardware': {
+        'led_count': 32, 'pin': 18, 'freq_hz': 800000, 'dma': 10,
+        'brightness': 50, 'invert': False,
+        'matrix': None,             # [rows, cols] for matrix effects
+    },
+    'audio': {'samplerate': 44100, 'block_duration': 0.05,
+              'device': None},      # index or name; None is the default input
+    'analysis': {'f_max': 2000.0, 'mode': 'auto', 'window': True},
+    'output': {'gamma': 1.0, 'refresh_hz': 120},
+}
+
+# Sections whose changes need a new strip or input stream, and the
+# keys in them that can still change live
+RESTART_SECTIONS = ('hardware', 'audio')
+LIVE_KEYS = {'hardware.brightness'}
+
+EFFECTS = {
+    'spectrum': SpectrumEffect,
+    'top_bands': TopBandsEffect,
+    'peak_trail': PeakTrailEffect,
+    'cascade': CascadeEffect,
+    'waterfall': WaterfallEffect,
+}
+
+# Layer keys handled by the compositor rather than the effect
+LAYER_KEYS = {'effect': None, 'blend': 'add', 'opacity': 1.0, 'interval': 0.0}
+
+# Effect constructor arguments that the scene supplies itself
+SUPPLIED = {'num_leds', 'freqs', 'edges', 'rows', 'cols', 'bin_hz'}
+
+# Band layout for top_bands (edges are computed from these)
+BAND_KEYS = {'bands': 'linear', 'f_min': 20.0, 'f_max': None}  # f_max None: analysis.f_max
+
+# Types of the settings whose default is None (None itself stays allowed)
+OPTIONAL_TYPES = {'matrix': list, 'threshold': float, 'f_max': float, 'depth': int}
+
+# Settings that must be above zero when set
+POSITIVE = {'led_count', 'samplerate', 'block_duration', 'refresh_hz',
+            'f_max', 'max_freq', 'depth', 'step'}
+
+# Inclusive bounds of settings that are fractions or 8-bit levels
+RANGES = {'opacity': (0.0, 1.0), 'fade_decay': (0.0, 1.0),
+          'brightness': (0, 255), 'max_brightness': (0, 255)}
+
+# === Loading and validation ===
+def read_config(path):
+    """Parse a .toml, .json or .yaml/.yml file into a dict."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.json':
+        with open(path) as f:
+            return json.load(f)
+    if ext == '.toml':
+        try:
+            import tomllib
+        except ImportError:  # Python < 3.11
+            import tomli as tomllib
+        with open(path, 'rb') as f:
+            return tomllib.load(f)
+    if ext in ('.yaml', '.yml'):
+        import yaml
+        with open(path) as f:
+            return yaml.safe_load(f) or {}
+    raise ValueError(f"{path}: unknown config format {ext!r} (use .toml, .json or .yaml)")
+
+def _coerce(path, value, default):
+    """Coerce value to the type of default, like Params.set().
+
+    A None default takes its type from OPTIONAL_TYPES; None values pass.
+    """
+    if value is None:
+        return value
+    kind = type(default)
+    if default is None:
+        kind = OPTIONAL_TYPES.get(path.rsplit('.', 1)[-1])
+        if kind is None:
+            return value
+    if kind is bool:
+        if not isinstance(value, bool):
+            raise ValueError(f"{path}: expected true/false, got {value!r}")
+        return value
+    if kind in (int, float):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"{path}: expected a number, got {value!r}")
+        if kind is int and value != int(value):
+            raise ValueError(f"{path}: expected an integer, got {value!r}")
+        value = kind(value)
+        key = path.rsplit('.', 1)[-1]
+        if key in POSITIVE and not value > 0:
+            raise ValueError(f"{path}: must be positive, got {value!r}")
+        if key in RANGES and not RANGES[key][0] <= value <= RANGES[key][1]:
+            low, high = RANGES[key]
+            raise ValueError(f"{path}: expected {low} to {high}, got {value!r}")
+        return value
+    if not isinstance(value, kind):
+        raise ValueError(f"{path}: expected {kind.__name__}, got {value!r}")
+    return value
+
+def _section(path, values, defaults):
+    if not isinstance(values, dict):
+        raise ValueError(f"{path}: expected a table")
+    unknown = set(values) - set(defaults)
+    if unknown:
+        raise ValueError(f"{path}: unknown key(s) {', '.join(sorted(unknown))}")
+    return {key: _coerce(f"{path}.{key}", values.get(key, default), default)
+            for key, default in defaults.items()}
+
+def effect_defaults(name):
+    """Configurable constructor arguments of an effect and their defaults."""
+    params = inspect.signature(EFFECTS[name]).parameters
+    defaults = {key: p.default for key, p in params.items()
+                if key not in SUPPLIED and p.default is not inspect.Parameter.empty}
+    if name == 'top_bands':
+        defaults.update(BAND_KEYS)
+    return defaults
+
+def validate(config):
+    """Check a raw config and fill in defaults; returns a new dict."""
+    if not isinstance(config, dict):
+        raise ValueError("scene: expected a table at the top level")
+    unknown = set(config) - set(DEFAULTS) - {'layers'}
+    if unknown:
+        raise ValueError(f"scene: unknown section(s) {', '.join(sorted(unknown))}")
+
+    scene = {name: _section(name, config.get(name, {}), defaults)
+             for name, defaults in DEFAULTS.items()}
+
+    if scene['analysis']['mode'] not in ('auto',) + MODES:
+        raise ValueError(f"analysis.mode: expected one of {('auto',) + MODES}")
+    matrix = scene['hardware']['matrix']
+    if matrix is not None:
+        if len(matrix) != 2 or not all(isinstance(n, int) and not isinstance(n, bool)
+                                       and n > 0 for n in matrix):
+            raise ValueError(f"hardware.matrix: expected [rows, cols] as two positive "
+                             f"integers, got {matrix!r}")
+        if matrix[0] * matrix[1] != scene['hardware']['led_count']:
+            raise ValueError("hardware.matrix: expected [rows, cols] covering led_count")
+        scene['hardware']['matrix'] = list(matrix)
+
+    layers = config.get('layers', [{'effect': 'spectrum'}])
+    if not layers:
+        raise ValueError("layers: a scene needs at least one layer")
+    scene['layers'] = []
+    for i, spec in enumerate(layers):
+        path = f"layers[{i}]"
+        if not isinstance(spec, dict) or spec.get('effect') not in EFFECTS:
+            raise ValueError(f"{path}.effect: expected one of {', '.join(EFFECTS)}")
+        name = spec['effect']
+        defaults = dict(LAYER_KEYS, effect=name, **effect_defaults(name))
+        layer = _section(path, spec, defaults)
+        if layer['blend'] not in BLEND_MODES:
+            raise ValueError(f"{path}.blend: expected one of {', '.join(BLEND_MODES)}")
+        if name == 'waterfall' and matrix is None:
+            raise ValueError(f"{path}: the waterfall effect needs hardware.matrix")
+        if name == 'top_bands' and layer['bands'] not in ('linear', 'log'):
+            raise ValueError(f"{path}.bands: expected 'linear' or 'log'")
+        if name == 'top_bands' and layer['bands'] == 'log':
+            f_max = scene['analysis']['f_max']
+            top = min(layer['f_max'] or f_max, f_max)
+            if not 0 < layer['f_min'] < top:
+                raise ValueError(f"{path}.f_min: log bands need 0 < f_min < f_max ({top:g}), "
+                                 f"got {layer['f_min']:g}")
+        led_count = scene['hardware']['led_count']
+        if 'top_k' in layer and not 1 <= layer['top_k'] <= led_count:
+            raise ValueError(f"{path}.top_k: expected 1 to led_count ({led_count}), "
+                             f"got {layer['top_k']}")
+        if name == 'waterfall' and layer['depth'] is not None and layer['depth'] < matrix[0]:
+            raise ValueError(f"{path}.depth: expected at least the matrix rows ({matrix[0]})")
+        scene['layers'].append(layer)
+    return scene
+
+def load_scene(path):
+    return validate(read_config(path))
+
+def scene_arg(argv=None):
+    """The FILE of a --scene FILE option on the command line, or None."""
+    argv = sys.argv[1:] if argv is None else argv
+    if '--scene' not in argv:
+        return None
+    i = argv.index('--scene')
+    if i + 1 == len(argv):
+        raise SystemExit("--scene needs a scene file")
+    return argv[i + 1]
+
+def load_script_scene(path, defaults, effect):
+    """A visualizer script's scene: the file at path, or defaults (a raw
+    config made from the script's constants) when path is None.
+
+    The script drives the one layer's effect itself, so the scene must
+    have exactly one layer of that effect, blended as is.
+    """
+    config = load_scene(path) if path else validate(defaults)
+    path = path or 'scene'
+    layers = config['layers']
+    if len(layers) != 1 or layers[0]['effect'] != effect:
+        raise ValueError(f"{path}: layers: expected a single {effect} layer "
+                         f"(run layered scenes with scene.py)")
+    for key, default in LAYER_KEYS.items():
+        if key != 'effect' and layers[0][key] != default:
+            raise ValueError(f"{path}: layers[0].{key}: only scene.py blends layers")
+    return config
+
+def diff_configs(old, new):
+    """Dotted paths of every value that differs between two validated scenes."""
+    changed = []
+    for section in DEFAULTS:
+        for key in DEFAULTS[section]:
+            if old[section][key] != new[section][key]:
+                changed.append(f"{section}.{key}")
+    for i in range(max(len(old['layers']), len(new['layers']))):
+        a = old['layers'][i] if i < len(old['layers']) else {}
+        b = new['layers'][i] if i < len(new['layers']) else {}
+        for key in sorted(set(a) | set(b)):
+            if a.get(key) != b.get(key):
+                changed.append(f"layers[{i}].{key}")
+    return changed
+
+def restart_paths(changed):
+    """The changed paths that only take effect after a restart."""
+    return [path for path in changed
+            if path.split('.')[0] in RESTART_SECTIONS and path not in LIVE_KEYS]
+
+# === Compiled scene ===
+class Scene:
+    """A validated scene compiled into an analyzer and a layer compositor."""
+
+    def __init__(self, config, noise_floor=None):
+        self.config = config
+        self.noise_floor = noise_floor     # passed on to every Analyzer built
+        self._pending = None
+        self._lock = threading.Lock()
+        self.listeners = []    # called with the list of changed paths after a reload
+        self.num_leds = config['hardware']['led_count']
+        self.samplerate = config['audio']['samplerate']
+        self.blocksize = int(self.samplerate * config['audio']['block_duration'])
+        self._build_analyzer()
+        self.compositor = Compositor(self.num_leds,
+                                     [self._build_layer(i, spec)
+                                      for i, spec in enumerate(config['layers'])])
+
+    def _build_analyzer(self):
+        a = self.config['analysis']
+        self.analyzer = Analyzer(self.blocksize, self.samplerate, a['f_max'],
+                                 window=a['window'], mode=a['mode'],
+                                 noise_floor=self.noise_floor)
+
+    def _build_effect(self, spec):
+        name = spec['effect']
+        kwargs = {key: value for key, value in spec.items()
+                  if key not in LAYER_KEYS and key not in BAND_KEYS}
+        freqs = self.analyzer.freqs
+        if name == 'spectrum':
+            return SpectrumEffect(self.num_leds, freqs, **kwargs)
+        if name == 'top_bands':
+            f_max = self.config['analysis']['f_max']
+            top = min(spec['f_max'] or f_max, f_max)
+            if spec['bands'] == 'log':
+                edges = np.geomspace(spec['f_min'], top, self.num_leds + 1)
+            else:
+                edges = np.linspace(0.0, top, self.num_leds + 1)
+            return TopBandsEffect(self.num_leds, freqs, edges, **kwargs)
+        if name == 'peak_trail':
+            return PeakTrailEffect(self.num_leds, freqs, **kwargs)
+        if name == 'cascade':
+            return CascadeEffect(self.num_leds, **kwargs)
+        rows, cols = self.config['hardware']['matrix']
+        return WaterfallEffect(rows, cols, freqs, **kwargs)
+
+    def _build_layer(self, index, spec):
+        effect = self._build_effect(spec)
+
+        def render(magnitude):
+            # Blend the untruncated levels when the effect keeps them
+            if effect.render(magnitude) is None:
+                return None
+            return getattr(effect, 'frame_hdr', effect.frame)
+
+        layer = Layer(f"{index}_{spec['effect']}", render, self.num_leds,
+                      mode=spec['blend'], opacity=spec['opacity'], interval=spec['interval'])
+        layer.effect = effect
+        return layer
+
+    # === Hot reload ===
+    def stage(self, config):
+        """Queue a validated config; applied at the start of the next process()."""
+        with self._lock:
+            self._pending = config
+
+    def reload(self, config):
+        """Apply a validated config now; returns the changed paths.
+
+        Must run between blocks (process() does this for staged configs).
+        If building a stage raises, the scene is left as it was.
+        """
+        old, changed = self.config, diff_configs(self.config, config)
+        if not changed:
+            return changed
+        old_analyzer = self.analyzer
+        self.config = config
+
+        if restart_paths(changed):
+            # Keep the sizes the strip and stream were opened with
+            self.config = copy.deepcopy(config)
+            for section in RESTART_SECTIONS:
+                self.config[section] = dict(old[section])
+            for path in LIVE_KEYS:
+                section, key = path.split('.')
+                self.config[section][key] = config[section][key]
+
+        analysis_changed = any(path.startswith('analysis.') for path in changed)
+        layers = []
+        retuned = []
+        try:
+            if analysis_changed:
+                self._build_analyzer()
+            for i, spec in enumerate(self.config['layers']):
+                before = old['layers'][i] if i < len(old['layers']) else None
+                layer = self.compositor.layers[i] if before is not None else None
+                effect_same = before is not None and before['effect'] == spec['effect'] and all(
+                    before[key] == spec[key] for key in spec if key not in LAYER_KEYS)
+                if layer is None or analysis_changed or not effect_same:
+                    layer = self._build_layer(i, spec)
+                else:
+                    retuned.append((layer, spec))
+                layers.append(layer)
+        except Exception:
+            self.config, self.analyzer = old, old_analyzer
+            raise
+
+        # Everything built: only now touch the running layers
+        for layer, spec in retuned:
+            layer.mode = spec['blend']
+            layer.opacity = spec['opacity']
+            layer.interval = spec['interval']
+        self.compositor.layers = layers
+
+        for listener in self.listeners:
+            listener(changed)
+        return changed
+
+    def process(self, block):
+        """Block -> blended float frame, applying any staged config first."""
+        if self._pending is not None:
+            with self._lock:
+                config, self._pending = self._pending, None
+            try:
+                self.reload(config)
+            except Exception as e:
+                # Keep running the last good scene
+                print(f"Scene reload failed: {type(e).__name__}: {e}", flush=True)
+        return self.compositor.render(self.analyzer(block))
+
+    def stats(self):
+        return self.compositor.stats()
+
+    def make_strip(self):
+        from rpi_ws281x import Adafruit_NeoPixel
+
+        hw = self.config['hardware']
+        strip = Adafruit_NeoPixel(hw['led_count'], hw['pin'], hw['freq_hz'],
+                                  hw['dma'], hw['invert'], hw['brightness'])
+        strip.begin()
+        return strip
+
+    def describe(self):
+        layers = ", ".join(f"{spec['effect']} ({spec['blend']})" for spec in self.config['layers'])
+        return f"{self.num_leds} LEDs, {self.analyzer.describe()}; layers: {layers}"
+
+class SceneWatcher:
+    """Poll a scene file and stage valid changes on the scene."""
+
+    def __init__(self, path, scene, interval=1.0):
+        self.path = path
+        self.scene = scene
+        self.interval = interval
+        self._mtime = os.path.getmtime(path)
+
+    def check(self):
+        """Stage the file if it changed; returns True if it did."""
+        try:
+            mtime = os.path.getmtime(self.path)
+            if mtime == self._mtime:
+                return False
+            self._mtime = mtime
+            config = load_scene(self.path)
+        except (OSError, ValueError) as e:
+            # Keep running the last good scene
+            print(f"Scene reload failed: {e}", flush=True)
+            return False
+        except Exception as e:
+            # Parser errors that aren't ValueErrors (YAML) or a validation
+            # gap must not end the watcher thread either
+            print(f"Scene reload failed: {type(e).__name__}: {e}", flush=True)
+            return False
+        self.scene.stage(config)
+        return True
+
+    def run_in_thread(self):
+        def run():
+            while True:
+                time.sleep(self.interval)
+                self.check()
+        thread = threading.Thread(target=run, name='scene-watch', daemon=True)
+        thread.start()
+        return thread
+
+def main():
+    from frame import clear
+    from render import DitheredOutput
+    from runtime import Runtime
+
+    path = sys.argv[1] if len(sys.argv) > 1 else 'scene.toml'
+    scene = Scene(load_scene(path))
+    strip = scene.make_strip()
+    out = scene.config['output']
+    output = DitheredOutput(strip, scene.config['hardware']['brightness'],
+                            out['gamma'], out['refresh_hz'])
+
+    def on_reload(changed):
+        print("Scene reloaded: " + ", ".join(changed), flush=True)
+        restart = restart_paths(changed)
+        if 'output.refresh_hz' in changed:
+            restart.append('output.refresh_hz')
+        if restart:
+            print("Restart to apply: " + ", ".join(restart), flush=True)
+        output.set_levels(scene.config['hardware']['brightness'],
+                          scene.config['output']['gamma'])
+
+    scene.listeners.append(on_reload)
+    SceneWatcher(path, scene).run_in_thread()
+
+    print(f"Scene {path}: {scene.describe()}. Ctrl+C to stop.")
+    runtime = Runtime(scene.process, output.submit, scene.samplerate, scene.blocksize,
+                      device=scene.config['audio']['device'], stats_sources=[scene.stats])
+    output.start()
+    try:
+        runtime.run()
+    except KeyboardInterrupt:
+        print("\nShutting down...")
+    finally:
+        output.stop()
+        clear(strip)
+
+if __name__ == "__main__":
+    main()
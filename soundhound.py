@@ -1,12 +1,15 @@
 import sounddevice as sd
 import numpy as np
+from termview import TerminalView
+
+# Drawn from its own thread so a slow console can't stall the callback
+view = TerminalView(refresh_hz=5)
 
 def print_sound_level(indata, frames, time, status):
     # Calculate RMS (Root Mean Square) for the input audio buffer
     volume_norm = np.linalg.norm(indata) * 10
-    # Print intensity bar to console
-    bar = "#" * int(volume_norm)
-    print(f"\rIntensity: [{bar:<50}] {volume_norm:.2f}", end='')
+    # Intensity bar is drawn by the view thread
+    view.update(level=volume_norm)
 
 def main():
     # Audio settings
@@ -23,11 +26,13 @@ def main():
                             samplerate=samplerate,
                             blocksize=int(samplerate * block_duration),
                             device=device):
+            view.start(top=2)
             print("Listening to microphone... Press Ctrl+C to stop.")
             while True:
                 sd.sleep(1000)  # Keep program running
     except KeyboardInterrupt:
-        print("\nStopped by user.")
+        view.stop()
+        print("Stopped by user.")
     except Exception as e:
         print(str(e))
 
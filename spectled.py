@@ -1,7 +1,17 @@
-import sounddevice as sd
+import os
 import numpy as np
-import scipy.fftpack as fftpack
-from rpi_ws281x import Adafruit_NeoPixel, Color
+from control import CONTROL_PORT, Params
+from frame import clear
+from idle import IdleGate
+from metrics import METRICS_PORT, runtime_metrics
+from netsink import DDPStrip
+from noisefloor import NOISE_PROFILE, NoiseFloor
+from power import PowerLimiter
+from qos import QualityController, fewer_bands, smaller_fft
+from render import DitheredOutput
+from runtime import Runtime
+from scene import Scene, load_script_scene, scene_arg
+from termview import TerminalView
 
 # === LED Configuration ===
 LED_COUNT = 32
@@ -11,14 +21,9 @@ LED_DMA = 10
 LED_BRIGHTNESS = 50
 LED_INVERT = False
 
-strip = Adafruit_NeoPixel(LED_COUNT, LED_PIN, LED_FREQ_HZ,
-                          LED_DMA, LED_INVERT, LED_BRIGHTNESS)
-strip.begin()
-
 # === Audio Configuration ===
 samplerate = 44100
 block_duration = 0.05
-blocksize = int(samplerate * block_duration)
 
 # === Visualization Parameters ===
 MAX_FREQ = 2000          # Top frequency mapped to last LED
@@ -26,96 +31,156 @@ FADE_DECAY = 0.8         # Decay factor per frame
 INTENSITY_SCALE = 3.0    # Adjust sensitivity to sound level
 MAX_BRIGHTNESS = 100     # Limit per-channel RGB value
 
-# Track per-LED brightness (linear 0–1 scale)
-led_levels = [0.0] * LED_COUNT
-
-# === Color helper: rainbow mapping ===
-def wheel(pos):
-    pos = 255 - pos
-    if pos < 85:
-        return (255 - pos * 3, 0, pos * 3)
-    if pos < 170:
-        pos -= 85
-        return (0, pos * 3, 255 - pos * 3)
-    pos -= 170
-    return (pos * 3, 255 - pos * 3, 0)
-
-# === Update LEDs based on full spectrum ===
-def update_leds_spectrum(magnitude, freqs):
-    global led_levels
-
-    num_leds = strip.numPixels()
-    freq_step = MAX_FREQ / num_leds
-
-    # Ignore DC offset
-    magnitude[0] = 0
-    if np.max(magnitude) == 0:
-        return
-
-    magnitude = magnitude / np.max(magnitude)
-
-    for i in range(num_leds):
-        # Frequency range for this LED
-        f_start = i * freq_step
-        f_end = (i + 1) * freq_step
-        band = magnitude[(freqs >= f_start) & (freqs < f_end)]
-
-        # Mean intensity in this band
-        level = np.mean(band) if len(band) else 0.0
-        level = level ** 0.5  # Adjust scaling
-        level *= INTENSITY_SCALE
-
-        # Clamp between 0 and 1
-        level = max(0.0, min(level, 1.0))
-
-        # Fade down if lower than previous, otherwise update
-        if level < led_levels[i]:
-            led_levels[i] *= FADE_DECAY
-        else:
-            led_levels[i] = level
-
-        # Map to color
-        base_color = wheel(int(i * 256 / num_leds))
-        r = int(base_color[0] * led_levels[i])
-        g = int(base_color[1] * led_levels[i])
-        b = int(base_color[2] * led_levels[i])
-
-        # Cap max brightness
-        r = min(r, MAX_BRIGHTNESS)
-        g = min(g, MAX_BRIGHTNESS)
-        b = min(b, MAX_BRIGHTNESS)
-
-        strip.setPixelColor(i, Color(r, g, b))
-
-    strip.show()
-
-# === Audio Callback ===
-def audio_callback(indata, frames, time, status):
-    audio_data = indata[:, 0] * np.hanning(len(indata))
-    fft_data = fftpack.fft(audio_data)
-    fft_freq = fftpack.fftfreq(len(audio_data), 1.0 / samplerate)
-    magnitude = np.abs(fft_data[:len(fft_data)//2])
-    freqs = fft_freq[:len(fft_freq)//2]
-
-    update_leds_spectrum(magnitude, freqs)
+# === Output Stage ===
+GAMMA = 1.0              # Output gamma (levels are already sqrt-scaled)
+OUTPUT_HZ = 120          # Dithered refresh rate, well above the block rate
+POWER_BUDGET_MA = None   # Estimated strip current cap in mA, e.g. 1000 on battery rigs
+TERMINAL_VIEW = False    # Mirror frames to the console for remote monitoring
+IDLE_HOLD = 10.0         # Seconds of silence before fading out and idling
+NETWORK_NODES = []       # DDP receivers to drive too, e.g. ['10.0.0.21', '10.0.0.22:4048']
+
+# === Scene (see scene.py) ===
+# The settings above as a scene, or `python spectled.py --scene FILE` for
+# one spectrum layer from a scene file; its values replace the constants.
+# The analysis covers the whole positive spectrum, since MAX_FREQ can be
+# retuned up to Nyquist
+scene_config = load_script_scene(scene_arg() if __name__ == "__main__" else None, {
+    'hardware': {'led_count': LED_COUNT, 'pin': LED_PIN, 'freq_hz': LED_FREQ_HZ,
+                 'dma': LED_DMA, 'brightness': LED_BRIGHTNESS, 'invert': LED_INVERT},
+    'audio': {'samplerate': samplerate, 'block_duration': block_duration, 'device': 0},
+    'analysis': {'f_max': samplerate / 2, 'mode': 'fft'},
+    'output': {'gamma': GAMMA, 'refresh_hz': OUTPUT_HZ},
+    'layers': [{'effect': 'spectrum', 'max_freq': MAX_FREQ, 'fade_decay': FADE_DECAY,
+                'intensity_scale': INTENSITY_SCALE, 'max_brightness': MAX_BRIGHTNESS}],
+}, 'spectrum')
+LED_COUNT = scene_config['hardware']['led_count']
+LED_BRIGHTNESS = scene_config['hardware']['brightness']
+samplerate = scene_config['audio']['samplerate']
+block_duration = scene_config['audio']['block_duration']
+GAMMA = scene_config['output']['gamma']
+OUTPUT_HZ = scene_config['output']['refresh_hz']
+layer = scene_config['layers'][0]
+MAX_FREQ = layer['max_freq']
+FADE_DECAY = layer['fade_decay']
+INTENSITY_SCALE = layer['intensity_scale']
+MAX_BRIGHTNESS = layer['max_brightness']
+
+# === Noise Floor ===
+# Learned per room with `python noisefloor.py`; without a profile every
+# block is normalized as before
+NOISE_K = 3.0            # Std deviations above the mean noise to subtract
+noise_floor = NoiseFloor.load(NOISE_PROFILE, k=NOISE_K) if os.path.exists(NOISE_PROFILE) else None
+
+# The analyzer subtracts the noise profile and flags quiet blocks; bands,
+# palette and per-LED levels (linear 0–1 scale) live in the effect
+scene = Scene(scene_config, noise_floor=noise_floor)
+strip = scene.make_strip()
+blocksize = scene.blocksize
+analyzer = scene.analyzer
+noise_floor = analyzer.noise_floor     # None if it was learned for another layout
+effect = scene.compositor.layers[0].effect
+
+# Float frames are dithered down to 8 bits at OUTPUT_HZ; LED_BRIGHTNESS is
+# applied there, before quantization, instead of by the strip
+limiter = PowerLimiter(LED_COUNT, POWER_BUDGET_MA)
+target = DDPStrip(LED_COUNT, NETWORK_NODES, local=strip) if NETWORK_NODES else strip
+output = DitheredOutput(target, LED_BRIGHTNESS, GAMMA, OUTPUT_HZ, limiter=limiter)
+
+view = TerminalView(LED_COUNT, full_scale=MAX_BRIGHTNESS) if TERMINAL_VIEW else None
+
+# === Live tuning (see control.py) ===
+params = Params(MAX_FREQ=MAX_FREQ, FADE_DECAY=FADE_DECAY,
+                INTENSITY_SCALE=INTENSITY_SCALE, MAX_BRIGHTNESS=MAX_BRIGHTNESS,
+                LED_BRIGHTNESS=LED_BRIGHTNESS, GAMMA=GAMMA,
+                POWER_BUDGET_MA=POWER_BUDGET_MA or 0, NOISE_K=NOISE_K)
+params.bounds(MAX_FREQ=(1, samplerate // 2), FADE_DECAY=(0.0, 1.0),
+              INTENSITY_SCALE=(0.0, None), MAX_BRIGHTNESS=(0, 255),
+              LED_BRIGHTNESS=(0, 255), GAMMA=(0.1, 10.0),
+              POWER_BUDGET_MA=(0, None), NOISE_K=(0.0, None))
+
+def retune_levels(p):
+    effect.fade_decay = p['FADE_DECAY']
+    effect.intensity_scale = p['INTENSITY_SCALE']
+    effect.max_brightness = p['MAX_BRIGHTNESS']
+    if view is not None:
+        view.full_scale = p['MAX_BRIGHTNESS']
+
+def retune_bands(p):
+    effect.max_freq = p['MAX_FREQ']
+    effect.rebuild_bands()
+
+params.on_change({'FADE_DECAY', 'INTENSITY_SCALE', 'MAX_BRIGHTNESS'}, retune_levels)
+params.on_change({'MAX_FREQ'}, retune_bands)
+params.on_change({'LED_BRIGHTNESS', 'GAMMA'},
+                 lambda p: output.set_levels(p['LED_BRIGHTNESS'], p['GAMMA']))
+# A live budget of 0 turns the cap off
+params.on_change({'POWER_BUDGET_MA'},
+                 lambda p: setattr(limiter, 'budget_ma', p['POWER_BUDGET_MA'] or None))
+
+def retune_noise(p):
+    if noise_floor is not None:
+        noise_floor.k = p['NOISE_K']
+        noise_floor.rebuild()
+
+params.on_change({'NOISE_K'}, retune_noise)
+
+# === Block processing (runs on the runtime's event loop) ===
+def process_block(block):
+    # The newest analyzer.blocksize samples (all of them unless QoS halved it)
+    magnitude = analyzer(block[len(block) - analyzer.blocksize:])
+
+    if analyzer.quiet:
+        # Only room noise left: fade out instead of normalizing the hiss
+        frame = effect.decay()
+    else:
+        frame = effect.render(magnitude)
+    if view is not None:
+        view.update(frame=effect.frame_hdr, peak_hz=analyzer.freqs[np.argmax(magnitude)],
+                    level=10 * np.linalg.norm(block))
+    if frame is None:
+        return None
+    return effect.frame_hdr
+
+# === Graceful degradation (see qos.py) ===
+def qos_steps():
+    steps = [fewer_bands(effect)]
+    # The noise profile is per FFT bin, so keep the full FFT with one
+    if noise_floor is None:
+        steps.append(smaller_fft(analyzer, effect))
+    return steps
 
 # === Main Loop ===
 def main():
-    print("Real-time LED Spectrum Visualizer (0–2000 Hz). Ctrl+C to stop.")
+    print(f"Real-time LED Spectrum Visualizer (0–{MAX_FREQ:g} Hz). Ctrl+C to stop.")
+    metrics = runtime_metrics()
+    limiter.export(metrics)
+    metrics.serve(METRICS_PORT)
+    stats_sources = [limiter.stats]
+    if NETWORK_NODES:
+        stats_sources.append(target.stats)
+    # Overruns step down to cheaper modes instead of falling behind
+    qos = QualityController(process_block, block_duration, qos_steps())
+    # The dither thread's pushes to the strip cost CPU the analysis needs too
+    output.refresh = qos.timed(output.refresh)
+    # Silence skips the FFT entirely; the first loud block wakes it
+    gate = IdleGate(qos, hold=IDLE_HOLD, on_wake=effect.reset)
+    stats_sources += [qos.stats, gate.stats]
+    runtime = Runtime(gate, output.submit, samplerate, blocksize,
+                      device=scene_config['audio']['device'],
+                      params=params, control_port=CONTROL_PORT,
+                      stats_sources=stats_sources, metrics=metrics)
+    output.start()
+    if view is not None:
+        view.start(top=2)
     try:
-        with sd.InputStream(device=0,
-                            channels=1,
-                            samplerate=samplerate,
-                            blocksize=blocksize,
-                            callback=audio_callback):
-            while True:
-                sd.sleep(1000)
+        runtime.run()
     except KeyboardInterrupt:
         print("\nShutting down...")
     finally:
-        for i in range(strip.numPixels()):
-            strip.setPixelColor(i, Color(0, 0, 0))
-        strip.show()
+        output.stop()
+        clear(strip)
+        if view is not None:
+            view.stop()
 
 if __name__ == "__main__":
     main()
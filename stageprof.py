@@ -0,0 +1,302 @@
+"""
+Per-stage profiling of the block path, with flame-graph export.
+
+When a show stutters, the Runtime's process/show timings say that a
+block was slow but not where the time went. This wraps the pipeline's
+building blocks in timers for a fixed window and attributes every
+microsecond to a stage:
+
+  capture   - copying the block out of the input buffer
+  window    - np.hanning
+  fft       - fftpack.fft / the Analyzer's transform
+  bin       - band means, peak search and the scripts' per-LED band loops
+  envelope  - peak-hold / decay updates of the effects
+  color     - wheel(), Color() and colorize()
+  output    - show_frame() and the strip's setPixelColor()/show()
+
+Stages nest: a script's update_leds() loop is bin, and the wheel() and
+setPixelColor() calls inside it are color and output beneath it. Time
+not inside any stage (np.abs, normalization, callback glue) stays with
+the root, block. Results are written as collapsed stacks (one
+"block;bin;color 1234" line per stack, in microseconds of self time,
+for flamegraph.pl or speedscope) or, for a .json path, as a Chrome
+trace (chrome://tracing, Perfetto) with one event per stage call.
+
+    python stageprof.py NAME [SOURCE] [SECONDS] [OUT]
+
+NAME is a visualizer script (e.g. spectled). SOURCE is a golden.py fixture
+(default beats) or a .wav file, run as fast as possible on the
+recording strip, or 'live' to profile the real microphone and strip on
+the device; live mode runs the whole path in the audio callback, as
+the older scripts do, rather than through the Runtime.
+"""
+
+import contextlib
+import functools
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+
+STAGES = ('capture', 'window', 'fft', 'bin', 'envelope', 'color', 'output')
+ROOT = 'block'
+
+class StageProfiler:
+    """Timed, nested stage calls recorded for the first seconds of use."""
+
+    def __init__(self, seconds=10.0, clock=time.perf_counter):
+        self.seconds = seconds
+        self.clock = clock
+        self.events = []    # (stack, start, duration, self time, thread id)
+        self.done = False
+        self._start = None
+        self._local = threading.local()
+
+    def call(self, stage, fn, *args, **kwargs):
+        """fn(*args, **kwargs), timed as stage under the current stack."""
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        # Recursion into the same stage (show_frame -> setPixelColor) is one call
+        if self.done or (stack and stack[-1][0] == stage):
+            return fn(*args, **kwargs)
+
+        entry = [stage, 0.0]    # name, time spent in child stages
+        stack.append(entry)
+        path = ';'.join(name for name, _ in stack)
+        start = self.clock()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            duration = self.clock() - start
+            stack.pop()
+            if stack:
+                stack[-1][1] += duration
+            self.events.append((path, start, duration, duration - entry[1],
+                                threading.get_ident()))
+            if not stack:
+                if self._start is None:
+                    self._start = start
+                elif start + duration - self._start >= self.seconds:
+                    self.done = True
+
+    def wrap(self, stage, fn, nested=False):
+        """fn timed as stage; with nested, only when called inside a timed call."""
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            if nested and not getattr(self._local, 'stack', None):
+                return fn(*args, **kwargs)
+            return self.call(stage, fn, *args, **kwargs)
+        return timed
+
+    # === Results ===
+    def collapsed(self):
+        """Self time per stack in whole microseconds, flamegraph.pl style."""
+        totals = defaultdict(float)
+        for path, _, _, self_time, _ in self.events:
+            totals[path] += self_time
+        return {path: int(round(t * 1e6)) for path, t in sorted(totals.items())}
+
+    def chrome_trace(self):
+        origin = min((e[1] for e in self.events), default=0.0)
+        threads = {tid: i for i, tid in enumerate(dict.fromkeys(e[4] for e in self.events))}
+        return {'traceEvents': [
+            {'name': path.rsplit(';', 1)[-1], 'cat': 'pipeline', 'ph': 'X',
+             'ts': round((start - origin) * 1e6, 3), 'dur': round(duration * 1e6, 3),
+             'pid': os.getpid(), 'tid': threads[tid], 'args': {'stack': path}}
+            for path, start, duration, _, tid in self.events],
+            'displayTimeUnit': 'ms'}
+
+    def write(self, path):
+        """Chrome trace for .json paths, collapsed stacks otherwise."""
+        import json
+
+        with open(path, 'w') as f:
+            if path.endswith('.json'):
+                json.dump(self.chrome_trace(), f)
+            else:
+                for stack, micros in self.collapsed().items():
+                    f.write(f"{stack} {micros}\n")
+
+    def summary(self):
+        """Per-stage self time: {stage: (calls, total_ms)}, root included."""
+        stages = defaultdict(lambda: [0, 0.0])
+        for path, _, _, self_time, _ in self.events:
+            totals = stages[path.rsplit(';', 1)[-1]]
+            totals[0] += 1
+            totals[1] += self_time * 1000
+        return {stage: tuple(stages[stage]) for stage in (ROOT,) + STAGES if stage in stages}
+
+    def report(self):
+        blocks = max(sum(1 for e in self.events if e[0] == ROOT), 1)
+        summary = self.summary()
+        total = sum(ms for _, ms in summary.values()) or 1.0
+        print(f"{'stage':<10}{'calls':>8}{'total ms':>11}{'ms/block':>10}{'share':>8}")
+        for stage, (calls, ms) in summary.items():
+            print(f"{stage:<10}{calls:>8}{ms:>11.2f}{ms / blocks:>10.3f}{ms / total:>8.1%}")
+        print(f"{blocks} blocks, {total / blocks:.3f} ms per block")
+
+# === Instrumenting a visualizer ===
+class _TimedModule:
+    """A library module as one script sees it, with some functions timed."""
+
+    def __init__(self, module, timed):
+        self._module = module
+        vars(self).update(timed)
+
+    def __getattr__(self, name):
+        return getattr(self._module, name)
+
+@contextlib.contextmanager
+def instrumented(profiler, module):
+    """Time the pipeline stages a loaded visualizer uses inside the with block.
+
+    numpy and scipy.fftpack are only wrapped as the script sees them
+    (its np / fftpack globals are swapped for timed stand-ins), and the
+    shared helpers (effects, bands, peak, drive) only record calls made
+    from inside a timed block, so the rest of the process is neither
+    profiled nor slowed much. Everything is restored on the way out,
+    also when the run fails.
+    """
+    import scipy.fftpack
+
+    import bands
+    import drive
+    import effects
+    import peak
+
+    targets = []    # (owner, name, replacement)
+    library = {np: {'hanning': 'window'}, scipy.fftpack: {'fft': 'fft'}}
+    for name, value in list(vars(module).items()):
+        for lib, stages in library.items():
+            if value is lib:
+                timed = {fn: profiler.wrap(stage, getattr(lib, fn)) for fn, stage in stages.items()}
+                targets.append((module, name, _TimedModule(lib, timed)))
+            for fn, stage in stages.items():
+                if value is getattr(lib, fn):    # from scipy.fftpack import fft
+                    targets.append((module, name, profiler.wrap(stage, value)))
+
+    shared = [
+        (effects, 'band_means', 'bin'),
+        (bands.BandEngine, 'means', 'bin'),
+        (peak.PeakTracker, 'update', 'bin'),
+        (effects.SpectrumEffect, 'update', 'envelope'),
+        (effects.SpectrumEffect, 'decay', 'envelope'),
+        (effects.TopBandsEffect, 'update', 'envelope'),
+        (effects.PeakTrailEffect, 'render', 'envelope'),
+        (effects, 'colorize', 'color'),
+        (effects, 'wheel', 'color'),
+        (drive, 'show_frame', 'output'),
+    ]
+    targets += [(owner, name, profiler.wrap(stage, getattr(owner, name), nested=True))
+                for owner, name, stage in shared]
+
+    # The script's own helpers, looked up as module globals at call time
+    own = [(module.strip, 'setPixelColor', 'output'), (module.strip, 'show', 'output')]
+    own += [(module, name, 'bin') for name in vars(module) if name.startswith('update_led')]
+    for name, stage in (('wheel', 'color'), ('Color', 'color'), ('show_frame', 'output')):
+        if hasattr(module, name):
+            own.append((module, name, stage))
+    if hasattr(module, 'analyzer'):
+        own.append((module.analyzer, '_analyze', 'fft'))
+    targets += [(owner, name, profiler.wrap(stage, getattr(owner, name)))
+                for owner, name, stage in own]
+
+    saved = []
+    try:
+        for owner, name, replacement in targets:
+            saved.append((owner, name, vars(owner).get(name, _MISSING)))
+            setattr(owner, name, replacement)
+        yield profiler
+    finally:
+        for owner, name, original in reversed(saved):
+            if original is _MISSING:
+                delattr(owner, name)    # was an instance's class attribute
+            else:
+                setattr(owner, name, original)
+
+_MISSING = object()
+
+# === Drivers ===
+def profile_offline(profiler, module, signal):
+    """Feed signal block by block until it ends or the window is full."""
+    from drive import feed
+
+    n = module.blocksize
+    for start in range(0, len(signal) - n + 1, n):
+        profiler.call(ROOT, lambda: feed(module, profiler.call('capture', np.array,
+                                                               signal[start:start + n])))
+        if profiler.done:
+            break
+
+def profile_live(profiler, module, device=0):
+    """Run the real input stream until the window is full."""
+    import sounddevice as sd
+    from drive import feed
+
+    def block(indata):
+        feed(module, profiler.call('capture', np.array, indata[:, 0]))
+
+    def callback(indata, frames, time, status):
+        profiler.call(ROOT, block, indata)
+
+    with sd.InputStream(device=device, channels=1, samplerate=module.samplerate,
+                        blocksize=module.blocksize, callback=callback):
+        while not profiler.done:
+            sd.sleep(100)
+
+def main():
+    from drive import HERE, load_script
+
+    if len(sys.argv) < 2 or not os.path.exists(os.path.join(HERE, f"{sys.argv[1]}.py")):
+        print(__doc__)
+        sys.exit(1)
+    name = sys.argv[1]
+    source = sys.argv[2] if len(sys.argv) > 2 else 'beats'
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 10.0
+    out = sys.argv[4] if len(sys.argv) > 4 else f"{name}.folded"
+
+    if source == 'live':
+        module = load_script(name)
+        signal = None
+    else:
+        # Offline runs use golden.py's hardware stand-ins and fixtures
+        import golden
+
+        golden.install_stand_ins()
+        module = golden.load_visualizer(name)
+        if source.lower().endswith('.wav'):
+            from offline import read_wav
+
+            signal, samplerate = read_wav(source)
+            if samplerate != module.samplerate:
+                print(f"Note: {source} is {samplerate} Hz, {name} expects {module.samplerate} Hz")
+            signal = signal[:int(seconds * samplerate)]
+        elif source in golden.FIXTURES:
+            signal = golden.make_fixture(source, module.samplerate, seconds)
+        else:
+            print(f"Unknown source {source!r}: expected 'live', a .wav file or one of "
+                  f"{', '.join(golden.FIXTURES)}")
+            sys.exit(1)
+
+    profiler = StageProfiler(seconds)
+    try:
+        with instrumented(profiler, module):
+            if signal is None:
+                print(f"Profiling {name} on the live input for {seconds:g} s...")
+                profile_live(profiler, module)
+            else:
+                with np.errstate(all='ignore'):
+                    profile_offline(profiler, module, signal)
+    except KeyboardInterrupt:
+        print("\nStopped early.")
+
+    profiler.report()
+    profiler.write(out)
+    print(f"Profile -> {out}")
+
+if __name__ == "__main__":
+    main()
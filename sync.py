@@ -0,0 +1,208 @@
+"""
+Presentation timestamps and deadline scheduling for multi-node playback.
+
+Pacing frames with time.sleep() (rainbox_cascade.py, ws2812.py) drifts
+independently on every rig, and frames sent over the network (see
+netsink.py) arrive with jitter. Instead each frame carries the time it
+should appear, and every node presents it at that deadline:
+
+  SharedClock     - the common time base: wall-clock time as kept in
+                    step by NTP/chrony, sampled once against the local
+                    monotonic clock so deadlines are slept on the
+                    monotonic clock and later clock steps don't jerk
+                    playback
+  FrameScheduler  - a per-node thread that presents queued frames at
+                    their deadlines, drops frames that are already late
+                    and keeps lateness statistics
+
+On the wire the timestamp is DDP's 32-bit timecode (16.16 fixed point
+seconds), which wraps every ~18 hours; receivers unwrap it against
+their own clock.
+
+    python sync.py [nodes] [seconds]   # sender + local receiver processes
+"""
+
+import heapq
+import itertools
+import sys
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+TIMECODE_SCALE = 1 << 16
+TIMECODE_WRAP = 1 << 32
+
+def to_timecode(t):
+    """Shared-clock seconds -> 32-bit DDP timecode."""
+    return int(round(t * TIMECODE_SCALE)) % TIMECODE_WRAP
+
+def from_timecode(timecode, near):
+    """32-bit DDP timecode -> shared-clock seconds, unwrapped around near."""
+    delta = (timecode - to_timecode(near)) % TIMECODE_WRAP
+    if delta >= TIMECODE_WRAP // 2:
+        delta -= TIMECODE_WRAP
+    return near + delta / TIMECODE_SCALE
+
+class SharedClock:
+    """Wall-clock time base read through the monotonic clock."""
+
+    def __init__(self):
+        self.resync()
+
+    def resync(self):
+        """Re-sample the wall/monotonic offset (e.g. after NTP settles)."""
+        self.offset = time.time() - time.monotonic()
+
+    def now(self):
+        return time.monotonic() + self.offset
+
+    def to_monotonic(self, t):
+        return t - self.offset
+
+class FrameScheduler:
+    """Present frames at their presentation timestamps from a thread.
+
+    present(frame) is called at each frame's deadline. Frames that are
+    already more than late_tolerance seconds late when their turn comes
+    are dropped, as are the oldest queued frames when more than
+    max_queue are waiting.
+    """
+
+    def __init__(self, present, clock=None, late_tolerance=0.005, max_queue=32,
+                 history=1000):
+        self.present = present
+        self.clock = clock or SharedClock()
+        self.late_tolerance = late_tolerance
+        self.max_queue = max_queue
+
+        self._queue = []    # heap of (pts, order, frame)
+        self._order = itertools.count()
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread = None
+
+        # Stats
+        self.presented = 0
+        self.dropped_late = 0
+        self.dropped_overflow = 0
+        self.lateness = deque(maxlen=history)   # seconds past the deadline
+
+    def submit(self, frame, pts):
+        """Queue a copy of frame for presentation at shared time pts."""
+        with self._cond:
+            heapq.heappush(self._queue, (pts, next(self._order), np.array(frame, copy=True)))
+            if len(self._queue) > self.max_queue:
+                # Drop the earliest: it is the one closest to being late
+                heapq.heappop(self._queue)
+                self.dropped_overflow += 1
+            self._cond.notify()
+
+    def _next_due(self):
+        """Block until a frame is due; returns (pts, frame) or None on stop."""
+        with self._cond:
+            while not self._stop:
+                if not self._queue:
+                    self._cond.wait()
+                    continue
+                pts = self._queue[0][0]
+                delay = pts - self.clock.now()
+                if delay <= 0:
+                    pts, _, frame = heapq.heappop(self._queue)
+                    return pts, frame
+                # Wake early if a frame with an earlier deadline arrives
+                self._cond.wait(delay)
+            return None
+
+    def _run(self):
+        while True:
+            due = self._next_due()
+            if due is None:
+                return
+            pts, frame = due
+            late = self.clock.now() - pts
+            if late > self.late_tolerance:
+                self.dropped_late += 1
+                self.lateness.append(late)
+                continue
+            self.present(frame)
+            self.presented += 1
+            self.lateness.append(late)
+
+    def start(self):
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name='scheduler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self):
+        late_ms = np.array(self.lateness) * 1000
+        stats = {'presented': self.presented, 'dropped_late': self.dropped_late,
+                 'dropped_overflow': self.dropped_overflow}
+        if len(late_ms):
+            stats.update(late_mean_ms=round(float(np.mean(late_ms)), 3),
+                         late_p95_ms=round(float(np.percentile(late_ms, 95)), 3),
+                         late_max_ms=round(float(np.max(late_ms)), 3))
+        return stats
+
+# === Demo: one sender, several receiver processes on localhost ===
+def _node(port, seconds, results):
+    from netsink import DDPReceiver
+
+    receiver = DDPReceiver(None, NUM_LEDS, host='127.0.0.1', port=port)
+    scheduler = FrameScheduler(receiver.show).start()
+    receiver.scheduler = scheduler
+    receiver.run_in_thread()
+    time.sleep(seconds)
+    receiver.close()
+    scheduler.stop()
+    results.put((port, dict(scheduler.stats(), **receiver.stats())))
+
+NUM_LEDS = 32
+FRAME_HZ = 50
+LATENCY = 0.05    # Sender stamps frames this far ahead of now
+
+def demo(nodes=3, seconds=5.0, base_port=4100):
+    import multiprocessing as mp
+    from effects import CascadeEffect
+    from netsink import DDPStrip
+
+    results = mp.Queue()
+    ports = [base_port + i for i in range(nodes)]
+    procs = [mp.Process(target=_node, args=(port, seconds + 1.0, results)) for port in ports]
+    for proc in procs:
+        proc.start()
+    time.sleep(0.5)  # Let the receivers bind
+
+    # A pre-rendered stream: frame i is due at start + i / FRAME_HZ
+    clock = SharedClock()
+    sender = DDPStrip(NUM_LEDS, [('127.0.0.1', port) for port in ports], clock=clock)
+    cascade = CascadeEffect(NUM_LEDS)
+    start = clock.now() + LATENCY
+    for i in range(int(seconds * FRAME_HZ)):
+        pts = start + i / FRAME_HZ
+        # Send each frame LATENCY ahead of its deadline
+        delay = clock.to_monotonic(pts - LATENCY) - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        sender.send(cascade.render(), pts=pts)
+    sender.close()
+
+    for _ in procs:
+        port, stats = results.get()
+        print(f"node {port}: " + " ".join(f"{k}={v}" for k, v in stats.items()))
+    for proc in procs:
+        proc.join()
+
+if __name__ == "__main__":
+    demo(int(sys.argv[1]) if len(sys.argv) > 1 else 3,
+         float(sys.argv[2]) if len(sys.argv) > 2 else 5.0)
@@ -0,0 +1,165 @@
+"""
+Headless terminal monitor for a running rig.
+
+Printing a level bar from inside the audio callback blocks the callback
+whenever a slow SSH or serial console can't keep up. TerminalView takes
+the same frames the strip gets, plus a level and dominant frequency,
+and redraws them from its own thread at a capped rate. Each redraw
+only emits the characters that changed since the previous one (cursor
+moves plus the changed runs), so a steady display costs almost nothing
+on the wire.
+"""
+
+import sys
+import threading
+
+import numpy as np
+
+BLOCKS = ' ▁▂▃▄▅▆▇█'
+LEVEL_WIDTH = 50
+RESET = '\x1b[0m'
+
+class TerminalView:
+    """Spectrum bars (one column per LED) and a status line on a terminal.
+
+    full_scale is the channel value drawn as a full bar: the effect's
+    max_brightness cap, so capped frames still fill the bars.
+    """
+
+    def __init__(self, num_leds=0, rows=4, refresh_hz=5, stream=None, color=True,
+                 full_scale=255):
+        self.num_leds = num_leds
+        self.rows = rows if num_leds else 0
+        self.full_scale = full_scale
+        self.refresh_hz = refresh_hz
+        self.stream = stream or sys.stdout
+        self.color = color
+
+        self._frame = np.zeros((num_leds, 3), dtype=np.float32)
+        self._level = None
+        self._peak_hz = None
+        self._text = ''
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._screen = []    # previous rows, as lists of one-char tokens
+        self._top = 1        # terminal row of the first line, set by start()
+        self.bytes_written = 0
+
+    def update(self, frame=None, level=None, peak_hz=None, text=None):
+        """Record new values; cheap enough to call from the audio path."""
+        with self._lock:
+            if frame is not None:
+                np.copyto(self._frame, frame, casting='unsafe')
+            if level is not None:
+                self._level = level
+            if peak_hz is not None:
+                self._peak_hz = peak_hz
+            if text is not None:
+                self._text = text
+            self._dirty = True
+
+    # === Drawing ===
+    def _compose(self):
+        with self._lock:
+            frame = self._frame.copy()
+            level, peak_hz, text = self._level, self._peak_hz, self._text
+            self._dirty = False
+
+        screen = []
+        if self.rows:
+            # Bar height from the brightest channel, hue from the color itself
+            peak = frame.max(axis=1)
+            scale = np.clip(peak / max(self.full_scale, 1), 0.0, 1.0)
+            eighths = np.rint(scale * self.rows * 8).astype(int)
+            hue = np.zeros_like(frame)
+            lit = peak > 0
+            hue[lit] = frame[lit] * (255.0 / peak[lit, None])
+            for row in range(self.rows):
+                fill = np.clip(eighths - (self.rows - 1 - row) * 8, 0, 8)
+                tokens = []
+                for i in range(self.num_leds):
+                    char = BLOCKS[fill[i]]
+                    if self.color and fill[i]:
+                        r, g, b = hue[i].astype(int)
+                        char = f"\x1b[38;2;{r};{g};{b}m{char}{RESET}"
+                    tokens.append(char)
+                screen.append(tokens)
+
+        status = ''
+        if level is not None:
+            bar = '#' * min(int(level), LEVEL_WIDTH)
+            status += f"Intensity: [{bar:<{LEVEL_WIDTH}}] {level:.2f}"
+        if peak_hz is not None:
+            status += f" | Peak Frequency: {peak_hz:6.1f} Hz"
+        if text:
+            status += f" | {text}"
+        screen.append(list(status))
+        return screen
+
+    def _diff(self, screen):
+        """Escape sequences turning the previous screen into this one."""
+        out = []
+        for row, tokens in enumerate(screen):
+            old = self._screen[row] if row < len(self._screen) else []
+            col = 0
+            width = max(len(tokens), len(old))
+            while col < width:
+                new_tok = tokens[col] if col < len(tokens) else ' '
+                old_tok = old[col] if col < len(old) else ' '
+                if new_tok == old_tok:
+                    col += 1
+                    continue
+                start = col
+                run = []
+                while col < width:
+                    new_tok = tokens[col] if col < len(tokens) else ' '
+                    old_tok = old[col] if col < len(old) else ' '
+                    if new_tok == old_tok:
+                        break
+                    run.append(new_tok)
+                    col += 1
+                out.append(f"\x1b[{self._top + row};{start + 1}H" + "".join(run))
+        self._screen = screen
+        return "".join(out)
+
+    def draw(self):
+        """Redraw whatever changed; returns the number of bytes written."""
+        if not self._dirty:
+            return 0
+        data = self._diff(self._compose())
+        if data:
+            data += f"\x1b[{self._top + len(self._screen)};1H"
+            self.stream.write(data)
+            self.stream.flush()
+            self.bytes_written += len(data)
+        return len(data)
+
+    # === Thread ===
+    def _run(self):
+        period = 1.0 / self.refresh_hz
+        while not self._stop.wait(period):
+            self.draw()
+
+    def start(self, top=1):
+        """Clear the terminal and start redrawing from row top."""
+        self._top = top
+        self._screen = []
+        self.stream.write("\x1b[2J\x1b[H")
+        self.stream.flush()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='termview', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop redrawing and leave the cursor below the view; no-op if not started."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.draw()
+        self.stream.write("\n")
+        self.stream.flush()
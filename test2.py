@@ -2,6 +2,7 @@ import sounddevice as sd
 import numpy as np
 import scipy.fftpack as fftpack
 from rpi_ws281x import Adafruit_NeoPixel, Color
+from peak import PeakTracker
 from collections import deque
 
 # === LED Setup ===
@@ -24,6 +25,9 @@ blocksize = int(samplerate * block_duration)
 # === Frequency Filter Setting ===
 FREQ_MIN = 800  # Hz, frequencies below this value will be ignored
 
+# === Peak tracking: search only bins >= FREQ_MIN, sub-bin accurate ===
+tracker = PeakTracker(blocksize, samplerate, f_min=FREQ_MIN)
+
 # === Beat Detection Parameters ===
 SENSITIVITY = 1  # Instantaneous energy must exceed average energy by this factor to register a beat
 energy_history = deque(maxlen=2)  # Store energy values for the last few blocks
@@ -40,28 +44,16 @@ def wheel(pos):
     return Color(pos * 3, 255 - pos * 3, 0)
 
 # === LED Update: Only Dominant Frequency ===
-def update_led_dominant(magnitude, freqs):
+def update_led_dominant(magnitude):
     num_leds = strip.numPixels()
     max_freq = 3000  # Hz, top frequency mapped to last LED
 
-    # Normalize the magnitude to prevent division by zero
-    if np.max(magnitude) == 0:
+    # Find the interpolated peak at or above FREQ_MIN and its intensity
+    # relative to the whole spectrum (nothing to display if silent)
+    peak = tracker.update(magnitude)
+    if peak is None:
         return
-    magnitude = magnitude / np.max(magnitude)
-
-    # Filter out frequencies below the minimum threshold
-    mask = freqs >= FREQ_MIN
-    if not np.any(mask):
-        return  # Nothing to display if all frequencies are filtered out
-
-    # Apply the mask to get filtered arrays
-    mag_filtered = magnitude[mask]
-    freqs_filtered = freqs[mask]
-
-    # Find the peak frequency within the filtered range and its intensity
-    peak_idx = np.argmax(mag_filtered)
-    peak_freq = freqs_filtered[peak_idx]
-    intensity = mag_filtered[peak_idx]
+    peak_freq, intensity = peak
 
     # Map frequency to LED index
     led_idx = int((peak_freq / max_freq) * num_leds)
@@ -98,10 +90,8 @@ def audio_callback(indata, frames, time, status):
     # Check for a beat: only proceed if the energy exceeds threshold
     if instant_energy > SENSITIVITY * avg_energy:
         fft_data = fftpack.fft(audio_data)
-        fft_freq = fftpack.fftfreq(len(audio_data), 1.0 / samplerate)
         magnitude = np.abs(fft_data[:len(fft_data) // 2])
-        freqs = fft_freq[:len(fft_freq) // 2]
-        update_led_dominant(magnitude, freqs)
+        update_led_dominant(magnitude)
     else:
         # Optionally, you could fade the LEDs here instead of doing nothing
         pass
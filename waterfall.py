@@ -0,0 +1,186 @@
+"""
+Scrolling spectrogram ("waterfall") for LED matrices.
+
+The spectrum effects only show the current block. SpectrogramHistory
+keeps the last depth rows of band levels in a fixed 2-D array used as a
+circular buffer: append overwrites the oldest row and moves the head,
+so nothing is shifted or reallocated (no np.roll copies). Readers
+address rows by age (0 = newest) through index arithmetic on the head.
+
+WaterfallEffect maps a rows x cols matrix onto that history with a
+per-LED (age, band) lookup computed once, so each frame is one gather
+from the history plus the usual colorize() pass. Bands are the same
+linear 0..max_freq bands as spectled.py, averaged with a BandEngine
+(see bands.py). Silent blocks scroll in a dark row, so the picture
+drains away during a pause instead of freezing.
+
+Run directly for the 4x8 Waveshare hat: newest spectrum on the top row,
+scrolling down.
+"""
+
+import numpy as np
+
+from bands import BandEngine
+from effects import colorize, wheel_palette
+from frame import new_frame
+
+class SpectrogramHistory:
+    """Fixed-size circular history of band levels, newest at age 0."""
+
+    def __init__(self, depth, n_bands, dtype=np.float32):
+        self.depth = depth
+        self.n_bands = n_bands
+        self.data = np.zeros((depth, n_bands), dtype=dtype)
+        self.head = -1    # row of the newest entry
+        self.count = 0    # rows written so far (saturates at depth)
+
+    def append(self, levels):
+        """Overwrite the oldest row with levels; O(n_bands)."""
+        self.head = (self.head + 1) % self.depth
+        self.data[self.head] = levels
+        self.count = min(self.count + 1, self.depth)
+
+    def rows(self, ages):
+        """Row indices into .data for the given ages (array or int)."""
+        return (self.head - np.asarray(ages)) % self.depth
+
+    def latest(self):
+        return self.data[self.head]
+
+    def ordered(self, n=None):
+        """The newest n rows, newest first (a copy)."""
+        n = self.depth if n is None else min(n, self.depth)
+        return self.data[self.rows(np.arange(n))]
+
+    def clear(self):
+        self.data.fill(0)
+        self.head = -1
+        self.count = 0
+
+def matrix_layout(rows, cols, serpentine=False):
+    """(row, col) of each LED index for a row-major matrix.
+
+    With serpentine wiring every other row runs right to left.
+    """
+    index = np.arange(rows * cols)
+    row, col = np.divmod(index, cols)
+    if serpentine:
+        odd = row % 2 == 1
+        col[odd] = cols - 1 - col[odd]
+    return row, col
+
+class WaterfallEffect:
+    """Band levels over time on a rows x cols matrix.
+
+    Columns are linear bands from 0 to max_freq, rows are history ages
+    (row 0 newest). Levels use spectled.py's scaling: band mean relative
+    to the block's peak, square-rooted and multiplied by intensity_scale.
+    Each LED is its band's palette color scaled by the level.
+    """
+
+    def __init__(self, rows, cols, freqs, max_freq=2000, intensity_scale=3.0,
+                 max_brightness=100, serpentine=False, depth=None, interpolate=False):
+        self.rows = rows
+        self.cols = cols
+        self.num_leds = rows * cols
+        self.freqs = freqs
+        self.max_freq = max_freq
+        self.intensity_scale = intensity_scale
+        self.max_brightness = max_brightness
+        self.interpolate = interpolate   # Fractional-bin bands (see bands.py)
+
+        depth = depth or rows
+        if depth < rows:
+            # Ages would wrap modulo depth and repeat newer rows further down
+            raise ValueError(f"depth ({depth}) must be at least rows ({rows})")
+        self.history = SpectrogramHistory(depth, cols)
+        self._levels = np.zeros(cols)
+        self.led_levels = np.zeros(self.num_leds)
+        self.frame = new_frame(self.num_leds)
+        self.frame_hdr = np.zeros((self.num_leds, 3))
+        self.rebuild_layout(serpentine)
+        self.rebuild_bands()
+
+    def rebuild_layout(self, serpentine=False):
+        self.led_age, self.led_band = matrix_layout(self.rows, self.cols, serpentine)
+        self.palette = wheel_palette(self.cols)[self.led_band]
+
+    def rebuild_bands(self):
+        edges = np.linspace(0, self.max_freq, self.cols + 1)
+        self.bands = BandEngine(self.freqs, edges, self.interpolate)
+
+    def reset(self):
+        """Blank the history, so rows from before a pause don't scroll in."""
+        self.history.clear()
+
+    def push(self, magnitude):
+        """Append one spectrum's band levels to the history; False if silent.
+
+        A silent block still appends a dark row, so history keeps scrolling.
+        """
+        magnitude[0] = 0  # Ignore DC offset
+        peak = np.max(magnitude)
+        if peak == 0:
+            self._levels.fill(0.0)
+            self.history.append(self._levels)
+            return False
+        magnitude = magnitude / peak
+        levels = self.bands.means(magnitude, self._levels)
+        levels **= 0.5
+        levels *= self.intensity_scale
+        np.clip(levels, 0.0, 1.0, out=levels)
+        self.history.append(levels)
+        return True
+
+    def render(self, magnitude):
+        """Scroll in one spectrum (a dark row if silent); returns the frame."""
+        self.push(magnitude)
+        rows = self.history.rows(self.led_age)
+        self.led_levels[:] = self.history.data[rows, self.led_band]
+        return colorize(self.palette, self.led_levels, self.max_brightness,
+                        self.frame_hdr, self.frame)
+
+# === Waveshare 4x8 hat ===
+MATRIX_ROWS = 4
+MATRIX_COLS = 8
+LED_COUNT = MATRIX_ROWS * MATRIX_COLS
+LED_PIN = 18
+LED_FREQ_HZ = 800000
+LED_DMA = 10
+LED_BRIGHTNESS = 50
+LED_INVERT = False
+
+samplerate = 44100
+block_duration = 0.05
+blocksize = int(samplerate * block_duration)
+
+def main():
+    import scipy.fftpack as fftpack
+    from rpi_ws281x import Adafruit_NeoPixel
+    from frame import clear, show_frame
+    from runtime import Runtime
+
+    strip = Adafruit_NeoPixel(LED_COUNT, LED_PIN, LED_FREQ_HZ,
+                              LED_DMA, LED_INVERT, LED_BRIGHTNESS)
+    strip.begin()
+
+    freqs = fftpack.fftfreq(blocksize, 1.0 / samplerate)[:blocksize // 2]
+    effect = WaterfallEffect(MATRIX_ROWS, MATRIX_COLS, freqs)
+
+    def process_block(block):
+        audio_data = block * np.hanning(len(block))
+        magnitude = np.abs(fftpack.fft(audio_data)[:len(block) // 2])
+        return effect.render(magnitude)
+
+    print("Spectrogram waterfall (0–2000 Hz, newest row on top). Ctrl+C to stop.")
+    runtime = Runtime(process_block, lambda frame: show_frame(strip, frame),
+                      samplerate, blocksize)
+    try:
+        runtime.run()
+    except KeyboardInterrupt:
+        print("\nShutting down...")
+    finally:
+        clear(strip)
+
+if __name__ == "__main__":
+    main()